@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'core',
     'rest_framework',
     'rest_framework.authtoken',
@@ -85,16 +86,41 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
 # *se define el gestor de base de datos
+# el backend de core reutiliza la conexion durante CONN_MAX_AGE segundos,
+# la comprueba antes de reutilizarla y limita las conexiones por worker
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'POOL': {
+            'PRE_PING': bool(int(os.environ.get('DB_POOL_PRE_PING', 1))),
+            'PING_INTERVAL': int(os.environ.get('DB_POOL_PING_INTERVAL', 30)),
+            'MAX_CONNECTIONS': int(
+                os.environ.get('DB_POOL_MAX_CONNECTIONS', 0)) or None,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+            'STATS_INTERVAL': int(
+                os.environ.get('DB_POOL_STATS_INTERVAL', 1000)),
+        },
     }
 }
 
+# *se escriben en la consola los contadores del pool de conexiones de cada
+# proceso (ver core/db/pool.py)
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.db': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -138,6 +164,25 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# *tamaños maximos en pixeles de las variantes de las imagenes de recetas,
+# ademas se guarda la original sin metadatos
+RECIPE_IMAGE_VARIANTS = {
+    'thumbnail': int(os.environ.get('RECIPE_IMAGE_THUMBNAIL_SIZE', 200)),
+    'medium': int(os.environ.get('RECIPE_IMAGE_MEDIUM_SIZE', 800)),
+}
+RECIPE_IMAGE_QUALITY = int(os.environ.get('RECIPE_IMAGE_QUALITY', 85))
+# segundos tras los que un trabajo de imagen en proceso se considera abandonado
+IMAGE_JOB_TIMEOUT = int(os.environ.get('IMAGE_JOB_TIMEOUT', 600))
+# intentos de un trabajo de imagen antes de darlo por fallido
+IMAGE_JOB_MAX_ATTEMPTS = int(os.environ.get('IMAGE_JOB_MAX_ATTEMPTS', 3))
+# borrar los archivos de la imagen al reemplazarla o al borrar la receta, si
+# se desactiva quedan para el comando collect_orphaned_images
+RECIPE_IMAGE_DELETE_FILES = bool(
+    int(os.environ.get('RECIPE_IMAGE_DELETE_FILES', 1)))
+# guardar las imagenes por el hash de su contenido, las recetas que suben el
+# mismo archivo comparten una sola copia en uploads/blobs
+RECIPE_IMAGE_DEDUP = bool(int(os.environ.get('RECIPE_IMAGE_DEDUP', 0)))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -149,6 +194,75 @@ AUTH_USER_MODEL = 'core.User'
 # *se define el esquema para la documentacion
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON con orjson si esta instalado, si no con el modulo json estandar
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# *se define la cache, por defecto en memoria de cada proceso. Con varios
+# workers de uWSGI y el worker de imagenes hace falta una cache compartida
+# para que la invalidacion llegue a todos, docker-compose-deploy.yml usa
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache con
+# CACHE_LOCATION=/vol/cache, un volumen que nginx no sirve
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# *se define la cache de los listados de recetas, tags e ingredientes
+RECIPE_API_CACHE = {
+    'ALIAS': os.environ.get('RECIPE_API_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.environ.get('RECIPE_API_CACHE_TIMEOUT', 300)),
+}
+
+# *se define la cache de autenticacion por token, BACKEND es un alias de
+# CACHES para compartirla entre workers, si esta vacio cada worker usa una
+# cache LRU en memoria
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': int(os.environ.get('TOKEN_AUTH_CACHE_SIZE', 1024)),
+    'TTL': int(os.environ.get('TOKEN_AUTH_CACHE_TTL', 60)),
+    'BACKEND': os.environ.get('TOKEN_AUTH_CACHE_BACKEND', ''),
+}
+
+# *se define la paginacion del listado de recetas
+RECIPE_PAGE_SIZE = int(os.environ.get('RECIPE_PAGE_SIZE', 50))
+RECIPE_MAX_PAGE_SIZE = int(os.environ.get('RECIPE_MAX_PAGE_SIZE', 200))
+# recetas que se leen por bloque al exportar, con sus tags e ingredientes
+RECIPE_EXPORT_CHUNK_SIZE = int(os.environ.get('RECIPE_EXPORT_CHUNK_SIZE', 500))
+# recetas que se insertan por transaccion al importar
+RECIPE_IMPORT_BATCH_SIZE = int(os.environ.get('RECIPE_IMPORT_BATCH_SIZE', 500))
+# configuracion de texto de Postgres para la busqueda de recetas
+RECIPE_SEARCH_CONFIG = os.environ.get('RECIPE_SEARCH_CONFIG', 'english')
+# los listados se serializan desde filas de values() en lugar de usar
+# ModelSerializer por cada objeto
+RECIPE_FAST_LIST = bool(int(os.environ.get('RECIPE_FAST_LIST', 1)))
+# el listado de recetas lee de la tabla desnormalizada de tarjetas, antes de
+# activarlo hay que llenarla con el comando rebuild_recipe_cards
+RECIPE_CARDS = bool(int(os.environ.get('RECIPE_CARDS', 0)))
+# operaciones que acepta como maximo el endpoint batch de recetas
+RECIPE_BATCH_MAX_OPERATIONS = int(
+    os.environ.get('RECIPE_BATCH_MAX_OPERATIONS', 100))
+# recetas que devuelve como maximo una peticion de detalle de varios ids
+RECIPE_RETRIEVE_MANY_MAX_IDS = int(
+    os.environ.get('RECIPE_RETRIEVE_MANY_MAX_IDS', 100))
+
+# *se define el autocompletado de tags e ingredientes, sin Postgres cada
+# worker guarda en memoria un indice de nombres para INDEX_SIZE usuarios
+RECIPE_AUTOCOMPLETE = {
+    'LIMIT': int(os.environ.get('RECIPE_AUTOCOMPLETE_LIMIT', 10)),
+    'MAX_LIMIT': int(os.environ.get('RECIPE_AUTOCOMPLETE_MAX_LIMIT', 50)),
+    'INDEX_SIZE': int(os.environ.get('RECIPE_AUTOCOMPLETE_INDEX_SIZE', 256)),
+    'INDEX_TTL': int(os.environ.get('RECIPE_AUTOCOMPLETE_INDEX_TTL', 600)),
 }
 
 # *se define para poder cargar imagenes a traves de la pagina de documentacion
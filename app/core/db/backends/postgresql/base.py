@@ -0,0 +1,10 @@
+'''
+PostgreSQL backend with pooled persistent connections
+'''
+from django.db.backends.postgresql import base
+
+from core.db.pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    '''PostgreSQL database wrapper with pre-ping and per-worker limits'''
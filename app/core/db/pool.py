@@ -0,0 +1,182 @@
+'''
+Connection reuse, health checks and limits for the database backends
+'''
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# valores por defecto de la clave POOL en settings.DATABASES
+DEFAULT_POOL = {
+    # comprobar con SELECT 1 una conexion reutilizada que lleva tiempo sin uso
+    'PRE_PING': True,
+    # segundos sin uso a partir de los que se comprueba la conexion
+    'PING_INTERVAL': 30,
+    # conexiones abiertas como maximo por proceso, None es sin limite
+    'MAX_CONNECTIONS': None,
+    # segundos que se espera por una conexion libre antes de dar error
+    'TIMEOUT': 10,
+    # cada cuantos usos de una conexion se escriben los contadores en el
+    # log, 0 no los escribe
+    'STATS_INTERVAL': 1000,
+}
+
+
+class PoolStats:
+    '''Thread safe counters of the connection pool activity'''
+
+    def __init__(self):
+        self._counters = Counter()
+        self._lock = threading.Lock()
+
+    def incr(self, alias, name):
+        '''Increment a counter and return its new value'''
+        with self._lock:
+            self._counters[(alias, name)] += 1
+            return self._counters[(alias, name)]
+
+    def snapshot(self, alias='default'):
+        '''Return the counters of a database alias'''
+        with self._lock:
+            return {
+                name: self._counters[(alias, name)]
+                for name in ('hits', 'misses', 'ping_failures', 'timeouts')
+            }
+
+    def format(self, alias='default'):
+        '''Return the counters of a database alias as text'''
+        return ' '.join(
+            f'{name}={value}' for name, value in self.snapshot(alias).items())
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+pool_stats = PoolStats()
+
+
+def log_pool_stats(alias='default'):
+    '''Write the pool counters of this process to the log'''
+    logger.info('Database pool %s: %s', alias, pool_stats.format(alias))
+
+
+def release_connections():
+    '''Return the connections to the pool outside of a request
+
+    Django does this at the start and end of each request. Long running
+    commands call it between units of work, so reused connections are
+    pinged again and broken ones, after a database restart, are replaced.
+    '''
+    for connection in connections.all():
+        # dentro de una transaccion, por ejemplo en los tests, la conexion
+        # no se puede devolver
+        if not connection.in_atomic_block:
+            connection.close_if_unusable_or_obsolete()
+
+
+# un semaforo por alias de base de datos, compartido por los hilos del worker
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(alias, max_connections):
+    '''Return the semaphore limiting the connections of alias'''
+    if not max_connections:
+        return None
+    with _limiters_lock:
+        if alias not in _limiters:
+            _limiters[alias] = threading.BoundedSemaphore(max_connections)
+        return _limiters[alias]
+
+
+class PooledConnectionMixin:
+    '''Database wrapper mixin adding pre-ping, limits and pool metrics
+
+    Django keeps one connection per thread open for CONN_MAX_AGE seconds,
+    this mixin checks reused connections before handing them out, limits how
+    many a worker process can open and counts reuses (hits) and new
+    connections (misses).
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_config = {
+            **DEFAULT_POOL, **self.settings_dict.get('POOL', {}),
+        }
+        self.pool_limiter = get_limiter(
+            self.alias, self.pool_config['MAX_CONNECTIONS'])
+        # indica si esta conexion ocupa un lugar del limite
+        self.pool_slot = False
+        # indica si la conexion ya se uso en la peticion actual
+        self.pool_checked_out = False
+        self.pool_last_used = None
+
+    def _acquire_pool_slot(self):
+        if self.pool_limiter is None or self.pool_slot:
+            return
+        if not self.pool_limiter.acquire(timeout=self.pool_config['TIMEOUT']):
+            pool_stats.incr(self.alias, 'timeouts')
+            # wrap_database_errors lo convierte en OperationalError de Django
+            raise self.Database.OperationalError(
+                'Database connection limit reached for this worker')
+        self.pool_slot = True
+
+    def _release_pool_slot(self):
+        if self.pool_slot:
+            self.pool_limiter.release()
+            self.pool_slot = False
+
+    def _needs_ping(self):
+        if not self.pool_config['PRE_PING'] or self.pool_last_used is None:
+            return False
+        idle = time.monotonic() - self.pool_last_used
+        return idle >= self.pool_config['PING_INTERVAL']
+
+    def get_new_connection(self, conn_params):
+        self._acquire_pool_slot()
+        try:
+            connection = super().get_new_connection(conn_params)
+        except Exception:
+            self._release_pool_slot()
+            raise
+        pool_stats.incr(self.alias, 'misses')
+        return connection
+
+    def ensure_connection(self):
+        if not self.pool_checked_out:
+            # se marca antes de conectar porque connect() tambien llama a
+            # ensure_connection
+            self.pool_checked_out = True
+            if self.connection is not None:
+                # primera consulta de la peticion con una conexion reutilizada,
+                # si estuvo mucho tiempo sin uso se comprueba que siga viva
+                if self._needs_ping() and not self.is_usable():
+                    pool_stats.incr(self.alias, 'ping_failures')
+                    self.close()
+                else:
+                    pool_stats.incr(self.alias, 'hits')
+            interval = self.pool_config['STATS_INTERVAL']
+            if interval and pool_stats.incr(
+                    self.alias, 'checkouts') % interval == 0:
+                log_pool_stats(self.alias)
+        super().ensure_connection()
+        self.pool_last_used = time.monotonic()
+
+    def close_if_unusable_or_obsolete(self):
+        # Django lo llama al empezar y al terminar cada peticion, a partir de
+        # aqui la conexion se considera devuelta al pool. Mientras tanto se
+        # marca como en uso para no contar las consultas de la comprobacion
+        self.pool_checked_out = True
+        super().close_if_unusable_or_obsolete()
+        self.pool_checked_out = False
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_pool_slot()
@@ -0,0 +1,51 @@
+'''
+In-process LRU cache shared by the apps
+'''
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    '''Bounded in-process LRU cache with a time to live per entry'''
+
+    def __init__(self, max_size, ttl, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        # OrderedDict mantiene el orden de uso, al principio el menos usado
+        self._entries = OrderedDict()
+        # uWSGI corre con hilos, el lock evita modificar el dict a la vez
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        '''Return the cached value for key or None'''
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            # marcamos la entrada como la mas reciente
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        '''Store value for key evicting the least recently used entry'''
+        with self._lock:
+            self._entries[key] = (value, self.clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        '''Remove key from the cache'''
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        '''Remove every entry'''
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,93 @@
+'''
+Django command to compare the JSON renderers on a large recipe list
+'''
+import timeit
+from collections import OrderedDict
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+
+
+def recipe_list(count):
+    '''Return a recipe list page shaped like the API response'''
+    # mismas claves y tipos que RecipeSerializer, el precio ya es texto
+    return OrderedDict([
+        ('next', 'http://localhost/api/recipe/recipes/?cursor=cD0xMjM0'),
+        ('previous', None),
+        ('results', [
+            OrderedDict([
+                ('id', i),
+                ('title', f'Recipe number {i} with a longer title'),
+                ('time_minutes', 5 + i % 120),
+                ('price', f'{i % 100}.{i % 100:02}'),
+                ('link', f'https://example.com/recipes/{i}.pdf'),
+                ('tags', [
+                    OrderedDict([('id', i * 3 + t), ('name', f'Tag {t}')])
+                    for t in range(3)
+                ]),
+                ('ingredients', [
+                    OrderedDict([('name', f'Ingredient {n}'),
+                                 ('id', i * 8 + n)])
+                    for n in range(8)
+                ]),
+            ])
+            for i in range(count)
+        ]),
+    ])
+
+
+class Command(BaseCommand):
+    '''Django command timing DRF's JSON renderer and parser against ours'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=1000,
+            help='Recipes in the rendered list',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Times each renderer runs, the best time is reported',
+        )
+
+    def best(self, func, repeat):
+        '''Return the best time of func in milliseconds'''
+        return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+    def report(self, name, base, fast):
+        self.stdout.write(
+            f'{name}: DRF {base:.2f} ms, fast {fast:.2f} ms, '
+            f'{base / fast:.1f}x'
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        if orjson is None:
+            self.stdout.write(
+                'orjson is not installed, both renderers use the stdlib')
+        data = recipe_list(options['recipes'])
+        repeat = options['repeat']
+        base_renderer, fast_renderer = JSONRenderer(), FastJSONRenderer()
+        content = base_renderer.render(data)
+        # los dos renderers deben producir el mismo JSON
+        fast_content = fast_renderer.render(data)
+        if JSONParser().parse(BytesIO(fast_content)) != data:
+            self.stderr.write('The renderers produce different JSON')
+            return
+        self.stdout.write(
+            f'{options["recipes"]} recipes, {len(content)} bytes')
+        self.report(
+            'render',
+            self.best(lambda: base_renderer.render(data), repeat),
+            self.best(lambda: fast_renderer.render(data), repeat),
+        )
+        self.report(
+            'parse',
+            self.best(lambda: JSONParser().parse(BytesIO(content)), repeat),
+            self.best(
+                lambda: FastJSONParser().parse(BytesIO(content)), repeat),
+        )
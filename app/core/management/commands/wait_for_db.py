@@ -4,6 +4,7 @@ Django command to wait for the database to be available
 
 import time
 from psycopg2 import OperationalError as Psycopg2Error
+from django.db import connections
 from django.db.utils import OperationalError
 from django.core.management.base import BaseCommand
 
@@ -17,13 +18,24 @@ class Command(BaseCommand):
         self.stdout.write('Waiting for database...')
         # inicialmente la base de datos no esta conectada
         db_up = False
-        # se espera por la base de datos
+        # se espera por la base de datos, la conexion se abre con el mismo
+        # backend y la misma configuracion de pool que usa la aplicacion
         while db_up is False:
             try:
                 self.check(databases=['default'])
                 db_up = True
             except (Psycopg2Error, OperationalError):
                 self.stdout.write('Database unavailable, waiting 1 second...')
+                # cerramos la conexion fallida para liberar su lugar del pool
+                connections['default'].close()
                 time.sleep(1)
         # una vez se conecta muestra el mensaje de exito
         self.stdout.write(self.style.SUCCESS('Database available!'))
+        pool = getattr(connections['default'], 'pool_config', None)
+        if pool is not None:
+            self.stdout.write(
+                f"Connection pool: max_age="
+                f"{connections['default'].settings_dict['CONN_MAX_AGE']}s "
+                f"pre_ping={pool['PRE_PING']} "
+                f"max_connections={pool['MAX_CONNECTIONS']}"
+            )
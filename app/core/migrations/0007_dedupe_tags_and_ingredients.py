@@ -0,0 +1,59 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:54
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def dedupe_attr(apps, model_name, field_name):
+    '''Merge rows of model_name sharing (user, name) into the oldest one'''
+    Model = apps.get_model('core', model_name)
+    Recipe = apps.get_model('core', 'Recipe')
+    # tabla intermedia de la relacion many to many con Recipe
+    Through = Recipe._meta.get_field(field_name).remote_field.through
+    fk = f'{model_name.lower()}_id'
+    duplicates = (
+        Model.objects.values('user_id', 'name')
+        .annotate(keep_id=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for duplicate in duplicates:
+        keep_id = duplicate['keep_id']
+        duplicate_ids = list(
+            Model.objects.filter(
+                user_id=duplicate['user_id'], name=duplicate['name'],
+            ).exclude(id=keep_id).values_list('id', flat=True)
+        )
+        # las recetas enlazadas a un duplicado pasan a enlazar la fila que se
+        # conserva, sin repetir las que ya la tenian
+        linked = set(
+            Through.objects.filter(**{fk: keep_id})
+            .values_list('recipe_id', flat=True)
+        )
+        repointed = set(
+            Through.objects.filter(**{f'{fk}__in': duplicate_ids})
+            .values_list('recipe_id', flat=True)
+        ) - linked
+        Through.objects.bulk_create([
+            Through(recipe_id=recipe_id, **{fk: keep_id})
+            for recipe_id in repointed
+        ])
+        # al borrar los duplicados se borran en cascada sus relaciones
+        Model.objects.filter(id__in=duplicate_ids).delete()
+
+
+def dedupe_tags_and_ingredients(apps, schema_editor):
+    dedupe_attr(apps, 'Tag', 'tags')
+    dedupe_attr(apps, 'Ingredient', 'ingredients')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            dedupe_tags_and_ingredients, migrations.RunPython.noop,
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    '''Existing images were processed during the upload request'''
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image='').exclude(image__isnull=True).update(
+        image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(choices=[('none', 'None'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='none', max_length=20),
+        ),
+        migrations.RunPython(
+            mark_existing_images_ready, migrations.RunPython.noop,
+        ),
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.recipe')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='imagejob',
+            index=models.Index(fields=['status', 'id'], name='imagejob_status_id_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:19
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    '''Create the GIN index and fill the vectors of existing recipes'''
+    # el tipo tsvector y los indices GIN solo existen en Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX recipe_search_vector_idx ON core_recipe '
+        'USING GIN (search_vector)'
+    )
+    schema_editor.execute(
+        '''
+        UPDATE core_recipe SET search_vector =
+            setweight(to_tsvector(%(config)s::regconfig, title), 'A')
+            || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+                SELECT string_agg(t.name, ' ') FROM core_recipe_tags rt
+                JOIN core_tag t ON t.id = rt.tag_id
+                WHERE rt.recipe_id = core_recipe.id), '')), 'B')
+            || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+                SELECT string_agg(i.name, ' ') FROM core_recipe_ingredients ri
+                JOIN core_ingredient i ON i.id = ri.ingredient_id
+                WHERE ri.recipe_id = core_recipe.id), '')), 'B')
+            || setweight(to_tsvector(%(config)s::regconfig, description), 'C')
+        ''',
+        {'config': settings.RECIPE_SEARCH_CONFIG},
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_image_blobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:02
+
+from django.contrib.postgres.operations import (
+    BtreeGinExtension, TrigramExtension,
+)
+from django.db import migrations
+
+
+TABLES = ['core_tag', 'core_ingredient']
+
+
+def create_trigram_indexes(apps, schema_editor):
+    '''Create the GIN trigram indexes used by the autocomplete'''
+    # los indices de trigramas solo existen en Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    # btree_gin permite incluir user_id en el mismo indice GIN, asi la
+    # busqueda no recorre los nombres de otros usuarios
+    for table in TABLES:
+        schema_editor.execute(
+            f'CREATE INDEX {table}_name_trgm_idx ON {table} '
+            f'USING GIN (user_id, (UPPER(name)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {table}_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        BtreeGinExtension(),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
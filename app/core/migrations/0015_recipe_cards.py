@@ -0,0 +1,64 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_card_id_indexes(apps, schema_editor):
+    '''Create the GIN indexes on the tag and ingredient ids of the cards'''
+    # el operador @> de jsonb solo usa indices GIN en Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in ('tag_ids', 'ingredient_ids'):
+        schema_editor.execute(
+            f'CREATE INDEX card_{column}_idx ON core_recipecard '
+            f'USING GIN ({column} jsonb_path_ops)'
+        )
+
+
+def drop_card_id_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for column in ('tag_ids', 'ingredient_ids'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS card_{column}_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_recipe_time_price_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='core.recipe')),
+                ('title', models.CharField(max_length=255)),
+                ('time_minutes', models.IntegerField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('link', models.CharField(blank=True, max_length=255)),
+                ('image', models.CharField(blank=True, max_length=255)),
+                ('tags', models.JSONField(default=list)),
+                ('ingredients', models.JSONField(default=list)),
+                ('tag_ids', models.JSONField(default=list)),
+                ('ingredient_ids', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(fields=['user', '-recipe'], name='card_user_recipe_desc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(fields=['user', 'time_minutes', 'recipe'], name='card_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipecard',
+            index=models.Index(fields=['user', 'price', 'recipe'], name='card_user_price_idx'),
+        ),
+        migrations.RunPython(create_card_id_indexes, drop_card_id_indexes),
+    ]
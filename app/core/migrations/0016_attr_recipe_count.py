@@ -0,0 +1,53 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:39
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    '''Fill recipe_count of the existing tags and ingredients'''
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, relation in (('Tag', 'tags'), ('Ingredient', 'ingredients')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(relation).remote_field.through
+        column = f'{model._meta.model_name}_id'
+        # un solo update con una subconsulta por objeto
+        counts = (
+            through.objects
+            .filter(**{column: OuterRef('pk')})
+            .values(column)
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        model.objects.update(recipe_count=Coalesce(
+            Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_recipe_cards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count'], name='tag_user_count_idx'),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
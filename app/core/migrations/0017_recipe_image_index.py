@@ -0,0 +1,17 @@
+# Generated by Django 3.2.25 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_attr_recipe_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image'], name='recipe_image_idx'),
+        ),
+    ]
@@ -4,6 +4,7 @@ Database models
 import uuid
 import os
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth.models import (
     AbstractBaseUser, BaseUserManager, PermissionsMixin
@@ -68,8 +69,24 @@ class User(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class RecipeManager(models.Manager):
+    '''Manager for recipes'''
+
+    def get_queryset(self):
+        # el vector de busqueda solo se usa para filtrar, no se carga en los
+        # objetos y save no lo sobrescribe con un valor antiguo
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     '''Recipe object'''
+
+    class ImageStatus(models.TextChoices):
+        NONE = 'none'
+        PENDING = 'pending'
+        READY = 'ready'
+        FAILED = 'failed'
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE,)
     title = models.CharField(max_length=255)
@@ -82,6 +99,35 @@ class Recipe(models.Model):
     # nota que en el campo imagen solo se hace una referencia a la funcion
     # no se invoca
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    # estado del procesamiento en segundo plano de la ultima imagen subida
+    image_status = models.CharField(
+        max_length=20,
+        choices=ImageStatus.choices,
+        default=ImageStatus.NONE,
+    )
+    # fecha de la ultima modificacion, tambien se actualiza cuando cambian
+    # sus tags o ingredientes (ver core/signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    # titulo, tags, ingredientes y descripcion preparados para la busqueda
+    # de texto, se calcula en recipe/search.py. El indice GIN se crea en la
+    # migracion solo si la base de datos es Postgres
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = RecipeManager()
+
+    class Meta:
+        # el listado de recetas filtra por usuario y ordena por -id, o por
+        # tiempo o precio con el id para desempatar
+        indexes = [
+            models.Index(fields=['user', '-id'],
+                         name='recipe_user_id_desc_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'],
+                         name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'price', 'id'],
+                         name='recipe_user_price_idx'),
+            # collect_orphaned_images busca por lotes de nombres de imagen
+            models.Index(fields=['image'], name='recipe_image_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -92,6 +138,22 @@ class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+    # recetas que lo usan, se mantiene con los signals de core/signals.py
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # cada usuario tiene un solo tag con el mismo nombre, el indice unico
+        # tambien sirve para buscar por (user, name) y ordenar por nombre
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                                    name='unique_tag_name_per_user'),
+        ]
+        # assigned_only filtra por recipe_count > 0
+        indexes = [
+            models.Index(fields=['user', 'recipe_count'],
+                         name='tag_user_count_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -102,6 +164,112 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+    # recetas que lo usan, se mantiene con los signals de core/signals.py
+    recipe_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'],
+                                    name='unique_ingredient_name_per_user'),
+        ]
+        # assigned_only filtra por recipe_count > 0
+        indexes = [
+            models.Index(fields=['user', 'recipe_count'],
+                         name='ingredient_user_count_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeCard(models.Model):
+    '''Denormalized copy of a recipe as shown in the recipe list'''
+    # una fila por receta, se borra con ella
+    recipe = models.OneToOneField(
+        Recipe, on_delete=models.CASCADE, primary_key=True,
+        related_name='card',
+    )
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE)
+    title = models.CharField(max_length=255)
+    time_minutes = models.IntegerField()
+    price = models.DecimalField(max_digits=5, decimal_places=2)
+    link = models.CharField(max_length=255, blank=True)
+    # nombre de la imagen en el storage, vacio si no tiene
+    image = models.CharField(max_length=255, blank=True)
+    # tags e ingredientes como listas de {id, name} y sus id para filtrar,
+    # en Postgres los id tienen un indice GIN creado en la migracion
+    tags = models.JSONField(default=list)
+    ingredients = models.JSONField(default=list)
+    tag_ids = models.JSONField(default=list)
+    ingredient_ids = models.JSONField(default=list)
+    # copia de Recipe.updated_at, la usan los validadores del GET condicional
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        # los mismos ordenes que el listado de recetas
+        indexes = [
+            models.Index(fields=['user', '-recipe'],
+                         name='card_user_recipe_desc_idx'),
+            models.Index(fields=['user', 'time_minutes', 'recipe'],
+                         name='card_user_time_idx'),
+            models.Index(fields=['user', 'price', 'recipe'],
+                         name='card_user_price_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class ImageJob(models.Model):
+    '''Queued processing of an uploaded recipe image'''
+
+    class Status(models.TextChoices):
+        PENDING = 'pending'
+        PROCESSING = 'processing'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    # nombre del archivo subido mientras espera a ser procesado
+    upload = models.CharField(max_length=255)
+    # sha256 del archivo subido cuando se guardan las imagenes por contenido
+    digest = models.CharField(max_length=64, blank=True)
+    status = models.CharField(
+        max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # los workers buscan el trabajo pendiente mas antiguo
+        indexes = [
+            models.Index(fields=['status', 'id'],
+                         name='imagejob_status_id_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.status}'
+
+
+class ImageBlob(models.Model):
+    '''Recipe image stored once under the hash of its content'''
+    digest = models.CharField(max_length=64, unique=True)
+    # nombre en el storage de la imagen, las variantes usan el mismo nombre
+    name = models.CharField(max_length=255)
+    # numero de recetas que usan la imagen, con 0 se puede borrar
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # el comando collect_orphaned_images busca las que ya no se usan
+        indexes = [
+            models.Index(fields=['refcount', 'updated_at'],
+                         name='imageblob_unused_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -0,0 +1,61 @@
+'''
+JSON renderer for the API using orjson when it is installed
+'''
+import decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    # sin orjson se usa el modulo json de la libreria estandar
+    orjson = None
+
+if orjson is not None:
+    # los errores de ListField usan el indice entero como clave y las fechas
+    # pasan por el encoder para mantener el formato de DRF
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    '''DRF JSON encoder writing decimals as exact strings'''
+
+    def default(self, obj):
+        # DRF convierte los Decimal a float y puede perder precision, los
+        # serializadores ya los devuelven como texto
+        if isinstance(obj, decimal.Decimal):
+            return str(obj)
+        return super().default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    '''JSON renderer encoding with orjson, falling back to the stdlib
+
+    The output is the same JSON as DRF's renderer: the types orjson does not
+    know, and the dates so they keep DRF's format, go through the same
+    encoder. Indented responses, like the browsable API, and values orjson
+    rejects, like integers over 64 bits, use the stdlib renderer. Unlike
+    DRF's strict mode, orjson writes NaN and Infinity floats as null.
+    '''
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(
+                accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # igual que DRF se escapan U+2028 y U+2029 para que el JSON tambien
+        # sea javascript valido
+        if b'\xe2\x80' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,152 @@
+'''
+Signal handlers keeping denormalized model data up to date
+'''
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient
+
+# recetas que se borran despues de descontarlas en bloque de sus tags e
+# ingredientes, los handlers de pre_delete no las vuelven a procesar
+_released_recipes = ContextVar('released_recipes', default=frozenset())
+
+
+@contextmanager
+def relations_released(recipe_ids):
+    '''Skip the per recipe delete handlers for recipe_ids'''
+    token = _released_recipes.set(frozenset(recipe_ids))
+    try:
+        yield
+    finally:
+        _released_recipes.reset(token)
+
+
+def touch(queryset):
+    '''Set updated_at to now for every object of queryset'''
+    # update no llama a save, por eso no se vuelven a disparar los signals
+    queryset.update(updated_at=timezone.now())
+
+
+def adjust_recipe_counts(model, deltas):
+    '''Add to the recipe_count of each object id of model its delta'''
+    by_delta = defaultdict(list)
+    for obj_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(obj_id)
+    # un update por cada valor distinto, normalmente solo +1 o -1. La suma
+    # se hace en la base de datos sobre la fila bloqueada, asi dos
+    # transacciones simultaneas no pierden cambios
+    for delta, ids in by_delta.items():
+        model.objects.filter(id__in=ids).update(
+            recipe_count=F('recipe_count') + delta)
+
+
+def _relation_models(sender):
+    '''Return the related model and its field name in Recipe'''
+    if sender is Recipe.tags.through:
+        return Tag, 'tags'
+    return Ingredient, 'ingredients'
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def touch_on_relation_change(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    '''Update the modification date of both sides of a changed relation'''
+    model, field = _relation_models(sender)
+    if action == 'pre_clear':
+        # al limpiar la relacion no se recibe pk_set, por eso se actualizan
+        # antes de borrar los objetos que estaban relacionados
+        if reverse:
+            touch(instance.recipe_set.all())
+        else:
+            touch(getattr(instance, field).all())
+    elif action in ('post_add', 'post_remove') and pk_set:
+        # reverse indica que se modifico la relacion desde el tag/ingrediente
+        if reverse:
+            touch(Recipe.objects.filter(pk__in=pk_set))
+        else:
+            touch(model.objects.filter(pk__in=pk_set))
+    else:
+        return
+    touch(type(instance).objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def count_on_relation_change(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    '''Keep the recipe_count of tags and ingredients up to date'''
+    model, _ = _relation_models(sender)
+    column = f'{model._meta.model_name}_id'
+    # reverse indica que se modifico la relacion desde el tag/ingrediente,
+    # entonces pk_set son id de recetas
+    if reverse:
+        own, other = column, 'recipe_id'
+    else:
+        own, other = 'recipe_id', column
+    if action == 'post_add' and pk_set:
+        # Django solo envia en pk_set las relaciones que no existian
+        ids = list(pk_set)
+        delta = 1
+    elif action in ('pre_remove', 'pre_clear'):
+        # remove envia los id pedidos aunque no esten relacionados, por eso
+        # se buscan las relaciones que existen antes de borrarlas, dentro de
+        # la misma transaccion que el borrado
+        links = sender.objects.filter(**{own: instance.pk})
+        if action == 'pre_remove':
+            if not pk_set:
+                return
+            links = links.filter(**{f'{other}__in': pk_set})
+        ids = list(links.values_list(other, flat=True))
+        delta = -1
+    else:
+        return
+    if reverse:
+        # desde el tag o ingrediente solo cambia su propio contador
+        deltas = {instance.pk: delta * len(ids)}
+    else:
+        deltas = dict.fromkeys(ids, delta)
+    adjust_recipe_counts(model, deltas)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_on_rename(sender, instance, created, **kwargs):
+    '''Update the recipes showing a changed tag or ingredient'''
+    if not created:
+        touch(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_recipes_on_attr_delete(sender, instance, **kwargs):
+    '''Update the recipes losing a deleted tag or ingredient'''
+    # el borrado en cascada de la tabla intermedia no dispara m2m_changed
+    touch(instance.recipe_set.all())
+
+
+@receiver(pre_delete, sender=Recipe)
+def touch_attrs_on_recipe_delete(sender, instance, **kwargs):
+    '''Update the tags and ingredients losing a deleted recipe'''
+    if instance.pk in _released_recipes.get():
+        return
+    touch(instance.tags.all())
+    touch(instance.ingredients.all())
+
+
+@receiver(pre_delete, sender=Recipe)
+def count_on_recipe_delete(sender, instance, **kwargs):
+    '''Discount a deleted recipe from its tags and ingredients'''
+    if instance.pk in _released_recipes.get():
+        return
+    # el borrado en cascada de la tabla intermedia no dispara m2m_changed
+    for model, field in ((Tag, 'tags'), (Ingredient, 'ingredients')):
+        ids = getattr(instance, field).values_list('id', flat=True)
+        adjust_recipe_counts(model, dict.fromkeys(ids, -1))
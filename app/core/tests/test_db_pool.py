@@ -0,0 +1,125 @@
+'''
+Tests for the pooled database connections
+'''
+import os
+import tempfile
+from unittest.mock import patch
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase
+
+from core.db.pool import (
+    PooledConnectionMixin, pool_stats, release_connections,
+)
+
+
+# se usa sqlite para probar el mixin sin un servidor de postgres
+class PooledSQLiteWrapper(PooledConnectionMixin, base.DatabaseWrapper):
+    pass
+
+
+def create_wrapper(name, alias, **pool):
+    '''Create and return a pooled wrapper for a SQLite database file'''
+    settings_dict = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'CONN_MAX_AGE': 60,
+        'AUTOCOMMIT': True,
+        'ATOMIC_REQUESTS': False,
+        'TIME_ZONE': None,
+        'OPTIONS': {},
+        'POOL': pool,
+    }
+    return PooledSQLiteWrapper(settings_dict, alias)
+
+
+class PooledConnectionTests(SimpleTestCase):
+    '''Test connection reuse, health checks and limits'''
+
+    def setUp(self):
+        pool_stats.reset()
+        self.wrappers = []
+        # sqlite no cierra las bases de datos en memoria, se usa un archivo
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.tmp_dir.name, 'db.sqlite3')
+
+    def tearDown(self):
+        for wrapper in self.wrappers:
+            wrapper.close()
+        self.tmp_dir.cleanup()
+
+    def wrapper(self, alias, **pool):
+        wrapper = create_wrapper(self.db_name, alias, **pool)
+        self.wrappers.append(wrapper)
+        return wrapper
+
+    def test_reused_connection_counted_as_hit(self):
+        '''Test reusing a connection across requests counts hits'''
+        db = self.wrapper('reuse')
+        db.ensure_connection()
+        # fin de la peticion, la conexion sigue abierta
+        db.close_if_unusable_or_obsolete()
+        db.ensure_connection()
+        db.ensure_connection()
+
+        stats = pool_stats.snapshot('reuse')
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_idle_connection_pinged(self):
+        '''Test an idle connection failing the ping is replaced'''
+        db = self.wrapper('ping', PING_INTERVAL=0)
+        db.ensure_connection()
+        db.close_if_unusable_or_obsolete()
+
+        with patch.object(db, 'is_usable', return_value=False):
+            db.ensure_connection()
+
+        stats = pool_stats.snapshot('ping')
+        self.assertEqual(stats['ping_failures'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertIsNotNone(db.connection)
+
+    def test_connection_limit_per_worker(self):
+        '''Test opening more connections than the limit fails'''
+        first = self.wrapper('limited', MAX_CONNECTIONS=1, TIMEOUT=0)
+        second = self.wrapper('limited', MAX_CONNECTIONS=1, TIMEOUT=0)
+        first.ensure_connection()
+
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+
+        # al cerrar la primera se libera su lugar
+        first.close()
+        second.ensure_connection()
+        self.assertEqual(pool_stats.snapshot('limited')['timeouts'], 1)
+
+    def test_stats_logged_every_interval(self):
+        '''Test the counters are written to the log every few checkouts'''
+        db = self.wrapper('logged', STATS_INTERVAL=2)
+
+        with self.assertLogs('core.db.pool', 'INFO') as logs:
+            for _ in range(4):
+                db.ensure_connection()
+                db.close_if_unusable_or_obsolete()
+
+        self.assertEqual(logs.output, [
+            'INFO:core.db.pool:Database pool logged: '
+            'hits=1 misses=1 ping_failures=0 timeouts=0',
+            'INFO:core.db.pool:Database pool logged: '
+            'hits=3 misses=1 ping_failures=0 timeouts=0',
+        ])
+
+    def test_release_connections(self):
+        '''Test long running commands return the connections to the pool'''
+        db = self.wrapper('released')
+        db.ensure_connection()
+
+        with patch('core.db.pool.connections') as connections:
+            connections.all.return_value = [db]
+            release_connections()
+        db.ensure_connection()
+
+        # la segunda vez es un nuevo uso de la conexion abierta
+        self.assertEqual(pool_stats.snapshot('released')['hits'], 1)
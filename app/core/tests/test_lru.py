@@ -0,0 +1,35 @@
+'''
+Tests for the in-process LRU cache
+'''
+from django.test import SimpleTestCase
+
+from core.lru import LRUCache
+
+
+class LRUCacheTests(SimpleTestCase):
+    '''Test the in-process LRU cache'''
+
+    def setUp(self):
+        self.now = 0
+        self.cache = LRUCache(
+            max_size=2, ttl=10, clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        '''Test entries are not returned after the time to live'''
+        self.cache.set('a', 1)
+        self.now = 9
+        self.assertEqual(self.cache.get('a'), 1)
+        self.now = 10
+        self.assertIsNone(self.cache.get('a'))
+
+    def test_least_recently_used_evicted(self):
+        '''Test the least recently used entry is evicted when full'''
+        self.cache.set('a', 1)
+        self.cache.set('b', 2)
+        # al leer 'a' pasa a ser la mas reciente y se descarta 'b'
+        self.cache.get('a')
+        self.cache.set('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(self.cache.get('c'), 3)
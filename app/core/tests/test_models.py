@@ -3,8 +3,10 @@ Test for models
 '''
 # primero se importan las librerias externas
 from unittest.mock import patch
+from datetime import timedelta
 from decimal import Decimal
 
+from django.db import IntegrityError
 from django.test import TestCase
 # para importar el modelo user se usa el metodo get_user_model
 from django.contrib.auth import get_user_model
@@ -108,6 +110,76 @@ class ModelTests(TestCase):
         # de la variable que creamos
         self.assertEqual(str(ingredient), ingredient.name)
 
+    def test_recipe_updated_when_tags_change(self):
+        '''Test adding a tag updates the recipe modification date'''
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title='Sample recipe name',
+            time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        tag = models.Tag.objects.create(user=user, name='Vegan')
+        # dejamos la fecha en el pasado para comprobar que cambia
+        past = recipe.updated_at - timedelta(days=1)
+        models.Recipe.objects.filter(id=recipe.id).update(updated_at=past)
+
+        recipe.tags.add(tag)
+
+        recipe.refresh_from_db()
+        self.assertGreater(recipe.updated_at, past)
+
+    def test_recipe_count_follows_relations(self):
+        '''Test the tag recipe counts follow every change of the relation'''
+        user = create_user()
+        r1, r2 = [
+            models.Recipe.objects.create(
+                user=user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('5.50'),
+            )
+            for i in range(2)
+        ]
+        vegan = models.Tag.objects.create(user=user, name='Vegan')
+        quick = models.Tag.objects.create(user=user, name='Quick')
+
+        def counts():
+            return {
+                tag.name: tag.recipe_count
+                for tag in models.Tag.objects.all()
+            }
+
+        r1.tags.add(vegan, quick)
+        # una relacion que ya existe no se cuenta dos veces
+        r1.tags.add(vegan)
+        vegan.recipe_set.add(r2)
+        self.assertEqual(counts(), {'Vegan': 2, 'Quick': 1})
+
+        # quitar un tag que la receta no tiene no cambia su contador
+        r2.tags.remove(vegan, quick)
+        self.assertEqual(counts(), {'Vegan': 1, 'Quick': 1})
+
+        r2.tags.set([quick])
+        r1.tags.clear()
+        self.assertEqual(counts(), {'Vegan': 0, 'Quick': 1})
+
+        r1.tags.add(quick)
+        quick.recipe_set.remove(r2)
+        self.assertEqual(counts(), {'Vegan': 0, 'Quick': 1})
+
+        r1.delete()
+        self.assertEqual(counts(), {'Vegan': 0, 'Quick': 0})
+
+    def test_tag_name_unique_per_user(self):
+        '''Test a user can not have two tags with the same name'''
+        user = create_user()
+        other_user = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='Vegan')
+        # otro usuario si puede usar el mismo nombre
+        models.Tag.objects.create(user=other_user, name='Vegan')
+
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='Vegan')
+
 
     # uuid es una libreria que genera un string aleatorio que funciona como un
     # identificador unico
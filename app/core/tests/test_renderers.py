@@ -0,0 +1,163 @@
+'''
+Tests for the JSON renderer and parser of the API
+'''
+import datetime
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from io import BytesIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.parsers import FastJSONParser
+from core.renderers import FastJSONRenderer, orjson
+
+
+# valores que el renderer de DRF sabe convertir
+SAMPLE = OrderedDict([
+    ('id', 12),
+    ('title', 'Crème brûlée\u2028with caramel'),
+    ('price', '5.25'),
+    ('ratio', 0.5),
+    ('tags', [OrderedDict([('id', 1), ('name', 'Dessert')])]),
+    ('created', datetime.datetime(
+        2024, 5, 1, 10, 30, 15, 123456, tzinfo=timezone.utc)),
+    ('date', datetime.date(2024, 5, 1)),
+    ('uuid', uuid.UUID('12345678-1234-5678-1234-567812345678')),
+    ('label', gettext_lazy('Recipe')),
+    ('errors', {0: [ErrorDetail('This field is required.', 'required')]}),
+    ('pair', (1, None)),
+    ('flags', [True, False]),
+])
+
+
+class RendererTests(SimpleTestCase):
+    '''Test the fast JSON renderer'''
+
+    def test_render_same_as_drf(self):
+        '''Test the output is the same JSON DRF writes'''
+        self.assertEqual(
+            FastJSONRenderer().render(SAMPLE), JSONRenderer().render(SAMPLE))
+
+    def test_render_stdlib_fallback(self):
+        '''Test the renderer works without orjson'''
+        with patch('core.renderers.orjson', None):
+            content = FastJSONRenderer().render(SAMPLE)
+
+        self.assertEqual(content, JSONRenderer().render(SAMPLE))
+
+    def test_render_decimal_exact(self):
+        '''Test decimals are written without losing precision'''
+        data = {'price': Decimal('12345678901234567890.12')}
+
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            b'{"price":"12345678901234567890.12"}',
+        )
+        with patch('core.renderers.orjson', None):
+            self.assertEqual(
+                FastJSONRenderer().render(data),
+                b'{"price":"12345678901234567890.12"}',
+            )
+
+    def test_render_indent(self):
+        '''Test indented output is kept for the browsable API'''
+        content = FastJSONRenderer().render(
+            {'id': 1}, 'application/json; indent=4')
+
+        self.assertEqual(content, b'{\n    "id": 1\n}')
+
+    def test_render_big_integer(self):
+        '''Test integers over 64 bits are rendered'''
+        self.assertEqual(
+            FastJSONRenderer().render({'id': 2 ** 70}),
+            b'{"id":1180591620717411303424}',
+        )
+
+    def test_render_none(self):
+        '''Test no data renders an empty body'''
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+
+@skipUnless(orjson, 'Needs orjson')
+class ApiRenderTests(TestCase):
+    '''Test orjson writes the same API responses as the stdlib'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+        res = self.client.post(reverse('recipe:recipe-list'), {
+            'title': 'Crème brûlée\u2028',
+            'time_minutes': 30,
+            'price': '5.25',
+            'link': 'https://example.com/recipe',
+            'tags': [{'name': 'Dessert'}, {'name': 'French'}],
+            'ingredients': [{'name': 'Cream'}, {'name': 'Sugar'}],
+        }, format='json')
+        self.recipe = Recipe.objects.get(id=res.data['id'])
+
+    def assertSameContent(self, url, params=None):
+        '''Assert orjson and the stdlib render url the same'''
+        content = self.client.get(url, params).content
+        with patch('core.renderers.orjson', None):
+            expected = self.client.get(url, params).content
+
+        self.assertEqual(content, expected)
+
+    def test_recipe_responses(self):
+        '''Test the recipe list and detail are rendered the same'''
+        self.assertSameContent(reverse('recipe:recipe-list'))
+        self.assertSameContent(
+            reverse('recipe:recipe-list'), {'thumbnail': 1})
+        self.assertSameContent(
+            reverse('recipe:recipe-detail', args=[self.recipe.id]))
+
+    def test_tag_and_ingredient_responses(self):
+        '''Test the tag and ingredient lists are rendered the same'''
+        for name in ('tag', 'ingredient'):
+            self.assertSameContent(reverse(f'recipe:{name}-list'))
+            self.assertSameContent(
+                reverse(f'recipe:{name}-list'), {'recipe_count': 1})
+
+
+class ParserTests(SimpleTestCase):
+    '''Test the fast JSON parser'''
+
+    def parse(self, content, **context):
+        return FastJSONParser().parse(
+            BytesIO(content), 'application/json', context)
+
+    def test_parse_same_as_drf(self):
+        '''Test the parsed data is the same DRF returns'''
+        content = JSONRenderer().render(SAMPLE)
+
+        self.assertEqual(
+            self.parse(content),
+            JSONParser().parse(BytesIO(content), 'application/json', {}),
+        )
+
+    def test_parse_invalid(self):
+        '''Test invalid JSON and NaN raise a parse error'''
+        for content in [b'{"title": ', b'{"price": NaN}']:
+            with self.assertRaises(ParseError):
+                self.parse(content)
+
+    def test_parse_other_encoding(self):
+        '''Test bodies in other encodings are decoded'''
+        content = '{"title": "Crème"}'.encode('latin-1')
+
+        self.assertEqual(
+            self.parse(content, encoding='latin-1'), {'title': 'Crème'})
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
+
+    def ready(self):
+        # se registran los signals que invalidan la cache de respuestas
+        from recipe import signals  # noqa: F401
+        # se registra la comprobacion de la cache compartida para --deploy
+        from recipe import checks  # noqa: F401
@@ -0,0 +1,112 @@
+'''
+Autocomplete of tag and ingredient names
+'''
+from bisect import bisect_left
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.functions import Upper
+
+from core.lru import LRUCache
+from recipe.cache import get_user_version
+
+
+def trigram_supported():
+    '''Return if the database has trigram indexes'''
+    return connection.vendor == 'postgresql'
+
+
+def trigram_filter(queryset, term):
+    '''Filter queryset by names containing or similar to term'''
+    term = term.upper()
+    # el indice GIN de la migracion esta definido sobre (user_id,
+    # UPPER(name)), los filtros usan la misma expresion para aprovecharlo
+    return (
+        queryset
+        .annotate(upper_name=Upper('name'))
+        .filter(
+            Q(upper_name__contains=term)
+            | Q(upper_name__trigram_similar=term)
+        )
+        .annotate(
+            # primero los nombres que empiezan por el texto, despues los
+            # mas parecidos
+            prefix=Case(
+                When(upper_name__startswith=term, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity(Upper('name'), term),
+        )
+        .order_by('prefix', '-similarity', 'name')
+    )
+
+
+class PrefixIndex:
+    '''Sorted names of a user answering prefix and substring searches'''
+
+    def __init__(self, items):
+        # se compara sin mayusculas, el nombre y el id completan el orden
+        self.entries = sorted(
+            (name.casefold(), name, obj_id) for obj_id, name in items)
+        self.keys = [entry[0] for entry in self.entries]
+
+    def search(self, term, limit):
+        '''Return up to limit ids, names starting with term first'''
+        term = term.casefold()
+        ids = []
+        # busqueda binaria del primer nombre que empieza por el texto, los
+        # siguientes estan a continuacion
+        position = bisect_left(self.keys, term)
+        while (len(ids) < limit and position < len(self.keys)
+               and self.keys[position].startswith(term)):
+            ids.append(self.entries[position][2])
+            position += 1
+        if len(ids) < limit:
+            # despues los nombres que contienen el texto en otra posicion
+            for key, _, obj_id in self.entries:
+                if term in key and not key.startswith(term):
+                    ids.append(obj_id)
+                    if len(ids) >= limit:
+                        break
+        return ids
+
+
+_indexes = LRUCache(
+    settings.RECIPE_AUTOCOMPLETE['INDEX_SIZE'],
+    settings.RECIPE_AUTOCOMPLETE['INDEX_TTL'],
+)
+
+
+def get_prefix_index(queryset, user_id, name):
+    '''Return the prefix index of the names in queryset'''
+    # la version del usuario cambia con cada escritura, un indice de una
+    # version anterior no se vuelve a usar y sale por LRU
+    key = (name, user_id, get_user_version(user_id))
+    index = _indexes.get(key)
+    if index is None:
+        index = PrefixIndex(
+            queryset.order_by().values_list('id', 'name').iterator())
+        _indexes.set(key, index)
+    return index
+
+
+def filter_autocomplete(queryset, term, limit, user_id, name):
+    '''Filter queryset by names matching term, best matches first'''
+    if trigram_supported():
+        return trigram_filter(queryset, term)
+    # sin Postgres se busca en un indice en memoria por usuario y se
+    # cargan solo los objetos encontrados
+    ids = get_prefix_index(queryset, user_id, name).search(term, limit)
+    position = Case(
+        *[When(id=obj_id, then=Value(i)) for i, obj_id in enumerate(ids)],
+        default=Value(len(ids)),
+        output_field=IntegerField(),
+    )
+    return (
+        queryset.filter(id__in=ids)
+        .annotate(position=position)
+        .order_by('position')
+    )
@@ -0,0 +1,127 @@
+'''
+Batch of create, update and delete operations on recipes
+'''
+from django.db import transaction
+from rest_framework import status
+
+from core.models import Recipe
+from recipe.bulk import create_recipes, delete_recipes, update_recipes
+from recipe.serializers import RecipeDetailSerializer
+
+
+def _validate(operations, recipes, context):
+    '''Return the result of validating each operation and its data'''
+    results = []
+    for operation in operations:
+        recipe = None
+        if operation['op'] != 'create':
+            # solo se encuentran las recetas del usuario
+            recipe = recipes.get(operation['id'])
+            if recipe is None:
+                results.append({
+                    'status': status.HTTP_404_NOT_FOUND,
+                    'errors': {'detail': 'Not found.'},
+                })
+                continue
+        if operation['op'] == 'delete':
+            results.append({'recipe': recipe})
+            continue
+        serializer = RecipeDetailSerializer(
+            recipe,
+            data=operation['data'],
+            partial=operation['op'] == 'update',
+            context=context,
+        )
+        if not serializer.is_valid():
+            results.append({
+                'status': status.HTTP_400_BAD_REQUEST,
+                'errors': serializer.errors,
+            })
+            continue
+        results.append({'recipe': recipe, 'data': serializer.validated_data})
+    return results
+
+
+def _failed(operations, results):
+    '''Return the results of a batch that was not applied'''
+    output = []
+    for operation, result in zip(operations, results):
+        if 'errors' in result:
+            output.append({
+                'op': operation['op'],
+                'status': result['status'],
+                'errors': result['errors'],
+            })
+        else:
+            # la operacion era valida pero no se aplico por culpa de otra
+            output.append({
+                'op': operation['op'],
+                'status': status.HTTP_424_FAILED_DEPENDENCY,
+            })
+    return output
+
+
+def run_batch(request, operations):
+    '''Apply operations atomically and return their results and success'''
+    user = request.user
+    context = {'request': request}
+    with transaction.atomic():
+        # una consulta con todas las recetas que se modifican o borran,
+        # bloqueadas hasta el final de la transaccion
+        recipes = (
+            Recipe.objects
+            .select_for_update()
+            .filter(user=user)
+            .in_bulk([op['id'] for op in operations if 'id' in op])
+        )
+        results = _validate(operations, recipes, context)
+        if any('errors' in result for result in results):
+            return _failed(operations, results), False
+
+        creates = [
+            result for operation, result in zip(operations, results)
+            if operation['op'] == 'create'
+        ]
+        updates = [
+            result for operation, result in zip(operations, results)
+            if operation['op'] == 'update'
+        ]
+        deletes = [
+            result['recipe'].id for operation, result
+            in zip(operations, results) if operation['op'] == 'delete'
+        ]
+        created = create_recipes(user, [result['data'] for result in creates])
+        for result, recipe in zip(creates, created):
+            result['recipe'] = recipe
+        update_recipes(
+            user, [(result['recipe'], result['data']) for result in updates])
+        delete_recipes(deletes)
+
+        # se leen de nuevo las recetas escritas con sus relaciones para la
+        # respuesta, en una consulta mas una por relacion
+        saved = (
+            Recipe.objects
+            .filter(id__in=[r['recipe'].id for r in creates + updates])
+            .prefetch_related('tags', 'ingredients')
+            .in_bulk()
+        )
+    output = []
+    for operation, result in zip(operations, results):
+        if operation['op'] == 'delete':
+            output.append({
+                'op': 'delete',
+                'id': result['recipe'].id,
+                'status': status.HTTP_204_NO_CONTENT,
+            })
+            continue
+        recipe = saved[result['recipe'].id]
+        output.append({
+            'op': operation['op'],
+            'id': recipe.id,
+            'status': (
+                status.HTTP_201_CREATED if operation['op'] == 'create'
+                else status.HTTP_200_OK
+            ),
+            'data': RecipeDetailSerializer(recipe, context=context).data,
+        })
+    return output, True
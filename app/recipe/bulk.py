@@ -0,0 +1,140 @@
+'''
+Set based writes of many recipes with their tags and ingredients
+'''
+from collections import Counter
+
+from django.db import connection
+from django.utils import timezone
+
+from core.models import Recipe, Tag, Ingredient
+from core.signals import (
+    adjust_recipe_counts, relations_released, touch,
+)
+from recipe.cache import bump_user_version
+from recipe.cards import schedule_card_refresh
+from recipe.search import schedule_search_update
+from recipe.serializers import get_or_create_attrs
+
+RELATIONS = (('tags', Tag), ('ingredients', Ingredient))
+
+
+def _scalar_fields(data):
+    return {
+        field: value for field, value in data.items()
+        if field not in dict(RELATIONS)
+    }
+
+
+def _set_relations(user, pairs, created):
+    '''Make the relations of each recipe match the items of its data'''
+    for relation, model in RELATIONS:
+        # en una actualizacion parcial sin la relacion no se modifica
+        targets = [
+            (recipe, data[relation]) for recipe, data in pairs
+            if relation in data
+        ]
+        if not targets:
+            continue
+        objs = {
+            obj.name: obj
+            for obj in get_or_create_attrs(
+                model, user, [item for _, items in targets for item in items])
+        }
+        through = Recipe._meta.get_field(relation).remote_field.through
+        column = f'{model._meta.model_name}_id'
+        desired = {
+            (recipe.id, objs[item['name']].id)
+            for recipe, items in targets for item in items
+        }
+        current = {}
+        if not created:
+            # las relaciones actuales de todas las recetas en una consulta
+            current = {
+                (recipe_id, obj_id): link_id
+                for link_id, recipe_id, obj_id in through.objects.filter(
+                    recipe_id__in=[recipe.id for recipe, _ in targets],
+                ).values_list('id', 'recipe_id', column)
+            }
+        removed = [pair for pair in current if pair not in desired]
+        added = [pair for pair in desired if pair not in current]
+        # bulk_create y delete sobre la tabla intermedia no disparan
+        # m2m_changed, las fechas de modificacion se actualizan aqui
+        if removed:
+            through.objects.filter(
+                id__in=[current[pair] for pair in removed]).delete()
+        if added:
+            through.objects.bulk_create([
+                through(recipe_id=recipe_id, **{column: obj_id})
+                for recipe_id, obj_id in added
+            ])
+        # los contadores de recetas cambian por cada relacion creada o borrada
+        deltas = Counter(obj_id for _, obj_id in added)
+        deltas.subtract(obj_id for _, obj_id in removed)
+        adjust_recipe_counts(model, deltas)
+        changed = {obj_id for _, obj_id in removed + added}
+        if changed:
+            touch(model.objects.filter(id__in=changed))
+
+
+def create_recipes(user, rows):
+    '''Insert recipes from validated rows with their relations'''
+    if not rows:
+        return []
+    recipes = [Recipe(user=user, **_scalar_fields(data)) for data in rows]
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+    else:
+        # SQLite no devuelve los id de un insert multiple y hacen falta para
+        # las relaciones
+        for recipe in recipes:
+            recipe.save()
+    _set_relations(user, list(zip(recipes, rows)), created=True)
+    # bulk_create no dispara post_save, invalidamos la cache una vez
+    bump_user_version(user.id)
+    schedule_search_update(recipe.id for recipe in recipes)
+    schedule_card_refresh(recipe.id for recipe in recipes)
+    return recipes
+
+
+def update_recipes(user, pairs):
+    '''Apply validated data to each (recipe, data) pair'''
+    if not pairs:
+        return
+    fields = {'updated_at'}
+    now = timezone.now()
+    for recipe, data in pairs:
+        for field, value in _scalar_fields(data).items():
+            setattr(recipe, field, value)
+            fields.add(field)
+        recipe.updated_at = now
+    # un solo update para todas las recetas, bulk_update no llama a save
+    Recipe.objects.bulk_update([recipe for recipe, _ in pairs], fields)
+    _set_relations(user, pairs, created=False)
+    bump_user_version(user.id)
+    schedule_search_update(recipe.id for recipe, _ in pairs)
+    schedule_card_refresh(recipe.id for recipe, _ in pairs)
+
+
+def delete_recipes(recipe_ids):
+    '''Delete recipes and discount them from their tags and ingredients'''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    for relation, model in RELATIONS:
+        through = Recipe._meta.get_field(relation).remote_field.through
+        links = through.objects.filter(recipe_id__in=recipe_ids)
+        # las relaciones de todas las recetas en una consulta, en lugar de
+        # los handlers de pre_delete que consultan cada receta
+        column = f'{model._meta.model_name}_id'
+        obj_ids = list(links.values_list(column, flat=True))
+        if not obj_ids:
+            continue
+        links.delete()
+        deltas = Counter()
+        deltas.subtract(obj_ids)
+        adjust_recipe_counts(model, deltas)
+        touch(model.objects.filter(id__in=set(obj_ids)))
+    # el borrado sigue enviando post_delete por receta para la cache y las
+    # imagenes, y borra en cascada las tarjetas y los trabajos de imagen
+    with relations_released(recipe_ids):
+        Recipe.objects.filter(id__in=recipe_ids).delete()
@@ -0,0 +1,96 @@
+'''
+Per-user response cache for the recipe API list endpoints
+'''
+import hashlib
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+
+def get_cache():
+    '''Return the cache backend used by the recipe API'''
+    return caches[settings.RECIPE_API_CACHE['ALIAS']]
+
+
+def _version_key(user_id):
+    return f'recipe-api:version:{user_id}'
+
+
+def get_user_version(user_id):
+    '''Return the current cache version of a user'''
+    cache = get_cache()
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # add no sobreescribe la version si otra peticion la creo antes
+        cache.add(_version_key(user_id), uuid.uuid4().hex, None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def bump_user_version(user_id):
+    '''Invalidate every cached response of a user'''
+    def bump():
+        # la version es aleatoria para que no se repita aunque se reutilice
+        # el id del usuario o se pierda la clave de la cache
+        get_cache().set(_version_key(user_id), uuid.uuid4().hex, None)
+
+    bump()
+    # se vuelve a invalidar al hacer commit, por si otra peticion guardo en
+    # la cache los datos anteriores mientras la transaccion estaba abierta
+    transaction.on_commit(bump)
+
+
+def _cacheable(data):
+    '''Convert serializer return types to plain picklable containers'''
+    # ReturnList y ReturnDict guardan una referencia al serializador
+    if isinstance(data, dict):
+        return OrderedDict(
+            (key, _cacheable(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [_cacheable(item) for item in data]
+    return data
+
+
+def request_params(request):
+    '''Return the query params of request in a stable order'''
+    return urlencode(sorted(request.query_params.lists()), doseq=True)
+
+
+def request_cache_key(request, kind, name):
+    '''Return a cache key for the user, version and query of request'''
+    user_id = request.user.id
+    # los parametros se ordenan para que el orden no cambie la clave, el
+    # host se incluye porque la paginacion devuelve urls absolutas
+    digest = hashlib.md5(
+        f'{request.get_host()}?{request_params(request)}'.encode()
+    ).hexdigest()
+    return (
+        f'recipe-api:{kind}:{user_id}:{get_user_version(user_id)}:'
+        f'{name}:{digest}'
+    )
+
+
+class CachedListMixin:
+    '''Viewset mixin caching list responses per user and query params'''
+
+    def get_list_cache_key(self, request):
+        '''Return the cache key of the list response for request'''
+        return request_cache_key(request, 'list', self.basename)
+
+    def list(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = self.get_list_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = super().list(request, *args, **kwargs)
+        cache.set(
+            key, _cacheable(response.data),
+            settings.RECIPE_API_CACHE['TIMEOUT'],
+        )
+        return response
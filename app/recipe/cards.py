@@ -0,0 +1,83 @@
+'''
+Denormalized recipe cards read by the recipe list
+'''
+from django.conf import settings
+from django.db import transaction
+
+from core.models import Recipe, RecipeCard
+from recipe.cache import bump_user_version
+from recipe.fast import related_rows
+
+# columnas de la receta que se copian en la tarjeta
+CARD_COLUMNS = [
+    'user_id', 'title', 'time_minutes', 'price', 'link', 'image',
+    'updated_at',
+]
+# relaciones que se copian con el id y el nombre de cada objeto
+CARD_RELATIONS = {'tags': 'tag_ids', 'ingredients': 'ingredient_ids'}
+
+
+def cards_enabled():
+    '''Return if the recipe list reads from the recipe cards'''
+    return settings.RECIPE_CARDS
+
+
+def build_cards(recipe_ids):
+    '''Return the cards of the recipes, unsaved'''
+    rows = list(Recipe.objects.filter(id__in=recipe_ids).values(
+        'id', *CARD_COLUMNS))
+    ids = [row['id'] for row in rows]
+    # una consulta por relacion para todas las recetas
+    related = {
+        relation: related_rows(Recipe, relation, ids, ['id', 'name'])
+        for relation in CARD_RELATIONS
+    }
+    cards = []
+    for row in rows:
+        card = RecipeCard(recipe_id=row.pop('id'), **row)
+        card.image = card.image or ''
+        for relation, ids_field in CARD_RELATIONS.items():
+            objects = related[relation].get(card.recipe_id, [])
+            setattr(card, relation, objects)
+            setattr(card, ids_field, [obj['id'] for obj in objects])
+        cards.append(card)
+    return cards
+
+
+def refresh_cards(recipe_ids):
+    '''Recompute the cards of the recipes'''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    cards = build_cards(recipe_ids)
+    existing = set(
+        RecipeCard.objects
+        .filter(recipe_id__in=[card.recipe_id for card in cards])
+        .values_list('recipe_id', flat=True)
+    )
+    # Django 3.2 no tiene upsert, se actualizan las que existen y se
+    # insertan las demas, ignore_conflicts cubre una insercion simultanea
+    RecipeCard.objects.bulk_update(
+        [card for card in cards if card.recipe_id in existing],
+        [field for field in CARD_COLUMNS if field != 'user_id']
+        + list(CARD_RELATIONS) + list(CARD_RELATIONS.values()),
+    )
+    RecipeCard.objects.bulk_create(
+        [card for card in cards if card.recipe_id not in existing],
+        ignore_conflicts=True,
+    )
+    # la version de la cache se cambia otra vez con las tarjetas ya
+    # escritas, un listado leido entre el commit y este momento guardo las
+    # tarjetas anteriores con la version nueva
+    for user_id in {card.user_id for card in cards}:
+        bump_user_version(user_id)
+
+
+def schedule_card_refresh(recipe_ids):
+    '''Refresh the cards once the transaction commits'''
+    if not cards_enabled():
+        return
+    recipe_ids = set(recipe_ids)
+    if recipe_ids:
+        # al hacer commit las relaciones y updated_at ya estan guardados
+        transaction.on_commit(lambda: refresh_cards(recipe_ids))
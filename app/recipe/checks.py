@@ -0,0 +1,29 @@
+'''
+System checks for the recipe app
+'''
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# backends de cache que guardan los datos en la memoria de cada proceso
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_response_cache(app_configs, **kwargs):
+    '''Warn when the response cache is not shared between processes'''
+    alias = settings.RECIPE_API_CACHE['ALIAS']
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend not in PER_PROCESS_CACHES:
+        return []
+    # bump_user_version solo invalida la cache del proceso que escribe, el
+    # resto de workers de uWSGI y el worker de imagenes no se enteran
+    return [Warning(
+        f'The recipe API cache "{alias}" uses {backend}, which is not '
+        f'shared between processes.',
+        hint='Set CACHE_BACKEND and CACHE_LOCATION to a shared backend, '
+             'for example the file based cache on a shared volume.',
+        id='recipe.W001',
+    )]
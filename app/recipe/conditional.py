@@ -0,0 +1,107 @@
+'''
+Conditional GET support for the recipe API
+'''
+import functools
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from recipe.cache import get_cache, request_cache_key, request_params
+
+
+class ConditionalGetMixin:
+    '''Answer If-None-Match and If-Modified-Since with 304 Not Modified
+
+    The validators come from a single aggregate query (count and latest
+    updated_at) and are cached until the user's data changes. Lists only
+    send an ETag, a deleted row changes the count but not the latest date,
+    so Last-Modified is only sent for detail responses. An empty queryset
+    has no validators, so a missing recipe is still a 404.
+    '''
+
+    def get_validators(self, request, queryset, name):
+        '''Return the ETag and last modification timestamp of queryset
+
+        Both are None when queryset is empty.
+        '''
+        cache = get_cache()
+        key = request_cache_key(request, 'validators', name)
+        validators = cache.get(key)
+        if validators is None:
+            # una sola consulta, sin ordenar ni cargar relaciones
+            result = queryset.order_by().aggregate(
+                total=Count('id', distinct=True),
+                last_modified=Max('updated_at'),
+            )
+            last_modified = result['last_modified']
+            if not result['total']:
+                # sin filas no hay nada que validar, If-None-Match: * no
+                # puede responder 304 para una receta que no existe
+                validators = (None, None)
+                cache.set(
+                    key, validators, settings.RECIPE_API_CACHE['TIMEOUT'])
+                return validators
+            state = (
+                f'{name}:{request.user.id}:{request_params(request)}:'
+                f'{result["total"]}:{last_modified}'
+            )
+            validators = (
+                quote_etag(hashlib.md5(state.encode()).hexdigest()),
+                int(last_modified.timestamp()),
+            )
+            cache.set(key, validators, settings.RECIPE_API_CACHE['TIMEOUT'])
+        return validators
+
+    def conditional_response(self, request, queryset, name, view,
+                             use_last_modified):
+        '''Return 304 if the client copy is current or call view'''
+        etag, last_modified = self.get_validators(request, queryset, name)
+        if etag is None:
+            return view()
+        if not use_last_modified:
+            last_modified = None
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+        response = view()
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request,
+            self.filter_queryset(self.get_queryset()),
+            self.basename,
+            functools.partial(super().list, request, *args, **kwargs),
+            use_last_modified=False,
+        )
+
+
+class ConditionalRetrieveMixin(ConditionalGetMixin):
+    '''Conditional GET for list and detail responses'''
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        # como get_object_or_404 de DRF, un id que no es valido para el
+        # campo es un 404 y no un error del servidor
+        try:
+            queryset = self.get_queryset().filter(
+                **{self.lookup_field: lookup})
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        return self.conditional_response(
+            request,
+            queryset,
+            f'{self.basename}-detail-{lookup}',
+            functools.partial(super().retrieve, request, *args, **kwargs),
+            use_last_modified=True,
+        )
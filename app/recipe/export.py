@@ -0,0 +1,95 @@
+'''
+Streaming export of recipes as NDJSON or CSV
+'''
+import csv
+import json
+
+from django.conf import settings
+from django.db.models import prefetch_related_objects
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+# columnas de la exportacion, en el CSV los tags e ingredientes van en una
+# sola columna con los nombres separados por LIST_SEPARATOR
+CSV_COLUMNS = [
+    'id', 'title', 'description', 'time_minutes', 'price', 'link',
+    'tags', 'ingredients',
+]
+LIST_SEPARATOR = '|'
+
+
+def iter_recipes(queryset, chunk_size=None):
+    '''Yield the recipes of queryset with their tags and ingredients'''
+    chunk_size = chunk_size or settings.RECIPE_EXPORT_CHUNK_SIZE
+    # iterator usa un cursor del lado del servidor en Postgres y no guarda
+    # los resultados en la queryset, pero ignora prefetch_related, por eso
+    # las relaciones se cargan por bloques de chunk_size recetas
+    recipes = queryset.prefetch_related(None).iterator(chunk_size=chunk_size)
+    chunk = []
+    for recipe in recipes:
+        chunk.append(recipe)
+        if len(chunk) >= chunk_size:
+            yield from _with_relations(chunk)
+            chunk = []
+    if chunk:
+        yield from _with_relations(chunk)
+
+
+def _with_relations(chunk):
+    prefetch_related_objects(chunk, 'tags', 'ingredients')
+    return chunk
+
+
+def recipe_record(recipe):
+    '''Return the exported representation of a recipe'''
+    return {
+        'id': recipe.id,
+        'title': recipe.title,
+        'description': recipe.description,
+        'time_minutes': recipe.time_minutes,
+        # el precio se exporta como texto para no perder precision
+        'price': str(recipe.price),
+        'link': recipe.link,
+        'tags': [
+            {'id': tag.id, 'name': tag.name} for tag in recipe.tags.all()],
+        'ingredients': [
+            {'id': ingredient.id, 'name': ingredient.name}
+            for ingredient in recipe.ingredients.all()
+        ],
+    }
+
+
+def ndjson_lines(recipes):
+    '''Yield one JSON document per recipe'''
+    for recipe in recipes:
+        yield json.dumps(recipe_record(recipe)) + '\n'
+
+
+class _Echo:
+    '''File like object returning what is written to it'''
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(recipes):
+    '''Yield the CSV header and one row per recipe'''
+    # el writer devuelve cada fila ya escapada en lugar de guardarla
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for recipe in recipes:
+        record = recipe_record(recipe)
+        for relation in ('tags', 'ingredients'):
+            record[relation] = LIST_SEPARATOR.join(
+                item['name'] for item in record[relation])
+        yield writer.writerow([record[column] for column in CSV_COLUMNS])
+
+
+def export_lines(queryset, export_format, chunk_size=None):
+    '''Yield the lines of the export of queryset in export_format'''
+    recipes = iter_recipes(queryset, chunk_size)
+    if export_format == 'csv':
+        return csv_lines(recipes)
+    return ndjson_lines(recipes)
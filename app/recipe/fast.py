@@ -0,0 +1,120 @@
+'''
+Read-only list serializers building responses from values() rows
+'''
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+# campos cuyo valor de la base de datos ya es el de la respuesta
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+)
+
+
+def related_rows(model, relation, ids, fields):
+    '''Return the objects related to each id as dicts with fields'''
+    field = model._meta.get_field(relation)
+    through = field.remote_field.through
+    source = field.m2m_field_name()
+    target = field.m2m_reverse_field_name()
+    # una consulta sobre la tabla intermedia con el nombre del objeto
+    # relacionado, sin construir instancias de ninguno de los dos modelos
+    lookups = [
+        f'{target}_id' if name == 'id' else f'{target}__{name}'
+        for name in fields
+    ]
+    rows = (
+        through.objects
+        .filter(**{f'{source}_id__in': ids})
+        .order_by('id')
+        .values_list(f'{source}_id', *lookups)
+    )
+    related = defaultdict(list)
+    for row in rows:
+        related[row[0]].append(dict(zip(fields, row[1:])))
+    return related
+
+
+def _stored_relation(source, keys):
+    '''Return a getter of the related objects already stored in a row'''
+    def getter(row):
+        return [{key: obj[key] for key in keys} for obj in row[source]]
+    return getter
+
+
+class FastListSerializer(serializers.ListSerializer):
+    '''Read-only list serializer for rows returned by values()
+
+    The output has the same keys and values as the child serializer: plain
+    columns are copied, other fields use the child's to_representation,
+    many to many nested serializers are filled with one query per relation,
+    unless the rows already hold them as lists of dicts, and method fields
+    call the child's <method>_from_row.
+    '''
+
+    def to_representation(self, data):
+        rows = list(data)
+        fields = self.child.fields
+        ids = [row['id'] for row in rows]
+        # valor de cada campo a partir de la fila, se decide una vez por
+        # campo y no por cada fila
+        getters = []
+        for name, field in fields.items():
+            if isinstance(field, serializers.ListSerializer):
+                keys = field.child.Meta.fields
+                if rows and field.source in rows[0]:
+                    # la fila ya trae la relacion, por ejemplo desde las
+                    # tarjetas de recetas, solo se ordenan las claves
+                    getters.append((
+                        name, _stored_relation(field.source, keys)))
+                    continue
+                related = related_rows(
+                    self.child.Meta.model, field.source, ids, keys)
+                getters.append((
+                    name,
+                    lambda row, related=related: related.get(row['id'], []),
+                ))
+            elif isinstance(field, serializers.SerializerMethodField):
+                getters.append((name, getattr(
+                    self.child, f'{field.method_name}_from_row')))
+            elif isinstance(field, serializers.Serializer):
+                raise ImproperlyConfigured(
+                    f'{type(self.child).__name__}.{name} can not be '
+                    f'serialized from values() rows.'
+                )
+            elif isinstance(field, PLAIN_FIELDS):
+                getters.append((
+                    name, lambda row, source=field.source: row[source]))
+            else:
+                getters.append((name, lambda row, field=field: (
+                    None if row[field.source] is None
+                    else field.to_representation(row[field.source])
+                )))
+        return [
+            {name: getter(row) for name, getter in getters}
+            for row in rows
+        ]
+
+
+class FastListMixin:
+    '''Viewset mixin using FastListSerializer for list responses
+
+    The list queryset must return values() rows, see use_fast_list.
+    '''
+
+    def use_fast_list(self):
+        '''Return if the list is serialized from values() rows'''
+        return self.action == 'list' and settings.RECIPE_FAST_LIST
+
+    def get_serializer(self, *args, **kwargs):
+        if not (kwargs.get('many') and self.use_fast_list()):
+            return super().get_serializer(*args, **kwargs)
+        kwargs.pop('many')
+        context = kwargs.setdefault('context', self.get_serializer_context())
+        # el hijo solo se usa para conocer los campos y su formato
+        child = self.get_serializer_class()(**kwargs)
+        return FastListSerializer(*args, child=child, context=context)
@@ -0,0 +1,83 @@
+'''
+Content addressed storage for recipe images shared between recipes
+'''
+import hashlib
+import os
+
+from django.core.files.base import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import ImageBlob
+from recipe.images import (
+    create_image_variants, image_extension, replace_file, verify_image,
+)
+
+# carpeta de las imagenes guardadas por contenido, nunca cambian una vez
+# escritas y nginx las sirve con cache inmutable
+BLOB_DIR = os.path.join('uploads', 'blobs')
+
+
+class HashingFile(File):
+    '''File computing the sha256 of its content while it is read'''
+
+    def __init__(self, file, name=None):
+        super().__init__(file, name)
+        self.hash = hashlib.sha256()
+
+    def chunks(self, chunk_size=None):
+        # el storage guarda el archivo por partes, el hash se calcula con
+        # esas mismas partes sin volver a leer el archivo
+        for chunk in super().chunks(chunk_size):
+            self.hash.update(chunk)
+            yield chunk
+
+    @property
+    def digest(self):
+        return self.hash.hexdigest()
+
+
+def blob_name(digest, ext):
+    '''Return the storage name of the image with the given digest'''
+    # dos niveles evitan directorios con millones de archivos
+    return os.path.join(BLOB_DIR, digest[:2], f'{digest}{ext.lower()}')
+
+
+def is_blob(name):
+    '''Return if the image name belongs to the content addressed store'''
+    return name.startswith(BLOB_DIR + os.sep)
+
+
+def acquire_blob(storage, upload_name, digest):
+    '''Return the shared image for the upload adding a reference to it'''
+    with transaction.atomic():
+        blob = (
+            ImageBlob.objects
+            .select_for_update()
+            .filter(digest=digest)
+            .first()
+        )
+        if blob is None:
+            name = blob_name(
+                digest, image_extension(verify_image(storage, upload_name)))
+            # si otro worker escribe la misma imagen a la vez el contenido
+            # es el mismo, por eso se puede sobrescribir
+            with storage.open(upload_name) as upload:
+                replace_file(storage, name, upload)
+            create_image_variants(storage, name)
+            blob, _ = ImageBlob.objects.get_or_create(
+                digest=digest, defaults={'name': name})
+        ImageBlob.objects.filter(id=blob.id).update(
+            refcount=F('refcount') + 1, updated_at=timezone.now())
+    return blob.name
+
+
+def release_blob(name):
+    '''Remove a reference to the shared image stored in name'''
+    digest = os.path.splitext(os.path.basename(name))[0]
+    # con 0 referencias los archivos se mantienen hasta que los borra el
+    # comando collect_orphaned_images, asi una subida de la misma imagen
+    # mientras tanto los puede volver a usar
+    ImageBlob.objects.filter(digest=digest, refcount__gt=0).update(
+        refcount=F('refcount') - 1, updated_at=timezone.now())
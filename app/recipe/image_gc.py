@@ -0,0 +1,186 @@
+'''
+Garbage collection of recipe image files no longer referenced
+'''
+import os
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ImageBlob, ImageJob, Recipe
+from recipe.image_jobs import INCOMING_DIR, get_storage
+from recipe.images import variant_name, variant_names
+
+# carpeta donde se guardan las imagenes ya procesadas
+RECIPE_DIR = os.path.join('uploads', 'recipe')
+
+
+@dataclass
+class GCReport:
+    '''Summary of a garbage collection pass'''
+    scanned: int = 0
+    referenced: int = 0
+    recent: int = 0
+    orphaned: int = 0
+    freed_bytes: int = 0
+
+
+def base_image_name(name):
+    '''Return the image name a variant file name belongs to'''
+    root, ext = os.path.splitext(name)
+    for variant in variant_names():
+        suffix = f'_{variant}'
+        # los nombres generados son uuid con guiones, por lo que el sufijo
+        # de la variante no puede confundirse con parte del nombre
+        if root.endswith(suffix):
+            return root[:-len(suffix)] + ext
+    return name
+
+
+def iter_files(storage, directory):
+    '''Yield the storage name, size and mtime of files in directory'''
+    path = storage.path(directory)
+    if not os.path.isdir(path):
+        return
+    # scandir lee el directorio por partes y devuelve el stat en la misma
+    # llamada, no se construye la lista completa de archivos en memoria
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            yield (
+                os.path.join(directory, entry.name),
+                stat.st_size,
+                stat.st_mtime,
+            )
+
+
+def referenced_images(names):
+    '''Return which of the image names are used by a recipe'''
+    return set(
+        Recipe.objects
+        .filter(image__in=names)
+        .values_list('image', flat=True)
+    )
+
+
+def referenced_uploads(names):
+    '''Return which of the staged uploads still have a job to process'''
+    return set(
+        ImageJob.objects
+        .filter(
+            upload__in=names,
+            status__in=[ImageJob.Status.PENDING, ImageJob.Status.PROCESSING],
+        )
+        .values_list('upload', flat=True)
+    )
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _collect(storage, directory, owner_name, lookup, report, options):
+    '''Delete the files of directory whose owner is not referenced'''
+    limit = time.time() - options['min_age']
+    batches = _batches(iter_files(storage, directory), options['batch_size'])
+    for batch in batches:
+        report.scanned += len(batch)
+        # una sola consulta por lote con los nombres de sus archivos
+        used = lookup({owner_name(name) for name, _, _ in batch})
+        for name, size, mtime in batch:
+            if owner_name(name) in used:
+                report.referenced += 1
+                continue
+            # un archivo reciente puede pertenecer a un trabajo que aun no
+            # ha guardado la referencia en la receta
+            if mtime > limit:
+                report.recent += 1
+                continue
+            report.orphaned += 1
+            report.freed_bytes += size
+            if options['on_orphan'] is not None:
+                options['on_orphan'](name, size)
+            if not options['dry_run']:
+                storage.delete(name)
+
+
+def _delete_blob_files(storage, name, report, options):
+    '''Delete the files of a shared image and count them as orphaned'''
+    for variant in variant_names():
+        file_name = variant_name(name, variant)
+        if not storage.exists(file_name):
+            continue
+        size = storage.size(file_name)
+        report.orphaned += 1
+        report.freed_bytes += size
+        if options['on_orphan'] is not None:
+            options['on_orphan'](file_name, size)
+        if not options['dry_run']:
+            storage.delete(file_name)
+
+
+def _collect_blobs(storage, report, options):
+    '''Delete the shared images no recipe references anymore'''
+    limit = timezone.now() - timedelta(seconds=options['min_age'])
+    unused = ImageBlob.objects.filter(refcount=0, updated_at__lt=limit)
+    if options['dry_run']:
+        for name in unused.values_list('name', flat=True).iterator():
+            _delete_blob_files(storage, name, report, options)
+        return
+    while True:
+        with transaction.atomic():
+            # el bloqueo impide que una subida vuelva a usar la imagen
+            # mientras se borra, skip_locked deja pasar a la que ya la usa
+            batch = list(
+                unused
+                .select_for_update(skip_locked=True)
+                .order_by('id')
+                .values_list('id', 'name')[:options['batch_size']]
+            )
+            # los archivos se borran con las filas todavia bloqueadas, una
+            # subida de la misma imagen espera al commit, ya no encuentra la
+            # fila y vuelve a crear los archivos sin que se borren despues
+            for _, name in batch:
+                _delete_blob_files(storage, name, report, options)
+            ImageBlob.objects.filter(
+                id__in=[blob_id for blob_id, _ in batch]).delete()
+        if len(batch) < options['batch_size']:
+            break
+
+
+def collect_orphaned_images(min_age=3600, batch_size=1000, dry_run=False,
+                            on_orphan=None):
+    '''Delete image files not referenced by any recipe, job or blob'''
+    storage = get_storage()
+    report = GCReport()
+    # on_orphan recibe cada archivo huerfano en lugar de acumularlos en una
+    # lista, asi la memoria no crece con el numero de archivos
+    options = {
+        'min_age': min_age,
+        'batch_size': batch_size,
+        'dry_run': dry_run,
+        'on_orphan': on_orphan,
+    }
+    _collect(
+        storage, RECIPE_DIR, base_image_name, referenced_images,
+        report, options,
+    )
+    # los archivos subidos que ya no tienen un trabajo pendiente quedaron
+    # de un worker que se detuvo o de una receta borrada
+    _collect(
+        storage, INCOMING_DIR, lambda name: name, referenced_uploads,
+        report, options,
+    )
+    _collect_blobs(storage, report, options)
+    return report
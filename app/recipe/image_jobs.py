@@ -0,0 +1,198 @@
+'''
+Background queue for processing uploaded recipe images
+'''
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import ImageJob, Recipe, recipe_image_file_path
+from recipe.cache import bump_user_version
+from recipe.cards import schedule_card_refresh
+from recipe.image_blobs import (
+    HashingFile, acquire_blob, is_blob, release_blob,
+)
+from recipe.images import (
+    create_image_variants, delete_image_files, image_extension, verify_image,
+)
+
+# carpeta donde esperan los archivos subidos hasta que un worker los procesa
+INCOMING_DIR = os.path.join('uploads', 'incoming')
+
+
+def get_storage():
+    '''Return the storage used for recipe images'''
+    return Recipe._meta.get_field('image').storage
+
+
+def enqueue_image(recipe, upload):
+    '''Store an uploaded file and queue it to become the recipe image'''
+    ext = os.path.splitext(upload.name)[1]
+    digest = ''
+    if settings.RECIPE_IMAGE_DEDUP:
+        upload = HashingFile(upload, upload.name)
+    # el storage guarda el archivo por partes, sin decodificar la imagen
+    name = get_storage().save(
+        os.path.join(INCOMING_DIR, f'{uuid.uuid4()}{ext}'), upload)
+    if settings.RECIPE_IMAGE_DEDUP:
+        digest = upload.digest
+    with transaction.atomic():
+        job = ImageJob.objects.create(
+            recipe=recipe, upload=name, digest=digest)
+        recipe.image_status = Recipe.ImageStatus.PENDING
+        recipe.save(update_fields=['image_status', 'updated_at'])
+    return job
+
+
+def claim_next_job():
+    '''Mark the oldest pending job as processing and return it'''
+    # un trabajo que lleva demasiado tiempo en proceso se considera
+    # abandonado por un worker que se detuvo y se vuelve a procesar
+    stale = timezone.now() - timedelta(seconds=settings.IMAGE_JOB_TIMEOUT)
+    while True:
+        with transaction.atomic():
+            job = (
+                ImageJob.objects
+                # skip_locked permite que varios workers reclamen trabajos
+                # distintos al mismo tiempo sin esperar unos por otros
+                .select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=ImageJob.Status.PENDING) |
+                    Q(status=ImageJob.Status.PROCESSING, updated_at__lt=stale)
+                )
+                .order_by('id')
+                .first()
+            )
+            if job is None:
+                return None
+            if job.attempts >= settings.IMAGE_JOB_MAX_ATTEMPTS:
+                # los intentos anteriores no terminaron, por ejemplo porque
+                # el worker se detuvo con esta imagen, no se vuelve a probar
+                fail_job(job, 'Too many attempts')
+                continue
+            job.status = ImageJob.Status.PROCESSING
+            job.attempts += 1
+            job.save(update_fields=['status', 'attempts', 'updated_at'])
+        return job
+
+
+def _save_job(job, status, error=''):
+    '''Store the result of job'''
+    job.status = status
+    job.error = error
+    # update en lugar de save, si la receta se borro el trabajo tambien
+    ImageJob.objects.filter(pk=job.pk).update(
+        status=status, error=error, updated_at=timezone.now())
+
+
+def _update_recipe(recipe, queryset=None, **fields):
+    '''Update fields of recipe, return if it still matched queryset'''
+    queryset = queryset if queryset is not None else Recipe.objects
+    updated = queryset.filter(pk=recipe.pk).update(
+        updated_at=timezone.now(), **fields)
+    if updated:
+        # update no envia post_save, se invalida la cache y la tarjeta
+        bump_user_version(recipe.user_id)
+        schedule_card_refresh([recipe.pk])
+    return bool(updated)
+
+
+def fail_job(job, error):
+    '''Mark job and the image of its recipe as failed'''
+    _save_job(job, ImageJob.Status.FAILED, error)
+    recipe = Recipe.objects.filter(pk=job.recipe_id).first()
+    if recipe is not None:
+        _update_recipe(recipe, image_status=Recipe.ImageStatus.FAILED)
+    storage = get_storage()
+    transaction.on_commit(lambda: storage.delete(job.upload))
+
+
+def retry_job(job, error):
+    '''Queue job again after an unexpected error, or fail it'''
+    if job.attempts >= settings.IMAGE_JOB_MAX_ATTEMPTS:
+        fail_job(job, error)
+    else:
+        _save_job(job, ImageJob.Status.PENDING, error)
+
+
+def store_image(storage, recipe, upload_name):
+    '''Store the upload as a new image of recipe and return its name'''
+    # la extension sale del formato de la imagen y no del nombre que envio
+    # el cliente, asi el archivo se sirve con el tipo correcto
+    ext = image_extension(verify_image(storage, upload_name))
+    with storage.open(upload_name) as upload:
+        name = storage.save(recipe_image_file_path(
+            recipe, os.path.splitext(upload_name)[0] + ext), upload)
+    create_image_variants(storage, name)
+    return name
+
+
+def release_image(storage, name):
+    '''Free the files of an image a recipe no longer uses'''
+    if is_blob(name):
+        release_blob(name)
+    elif settings.RECIPE_IMAGE_DELETE_FILES:
+        # si la transaccion se revierte la receta sigue usando los archivos
+        transaction.on_commit(lambda: delete_image_files(storage, name))
+
+
+def process_job(job):
+    '''Validate, resize and attach the image of job to its recipe'''
+    storage = get_storage()
+    recipe = Recipe.objects.filter(pk=job.recipe_id).first()
+    if recipe is None:
+        # la receta se borro despues de reclamar el trabajo, el trabajo se
+        # borro con ella y solo queda el archivo subido
+        storage.delete(job.upload)
+        return job
+    old_name = recipe.image.name or ''
+    try:
+        if job.digest:
+            # la imagen se comparte con las recetas que subieron el mismo
+            # archivo y solo se procesa la primera vez
+            name = acquire_blob(storage, job.upload, job.digest)
+        else:
+            name = store_image(storage, recipe, job.upload)
+    except Exception as error:
+        _update_recipe(recipe, image_status=Recipe.ImageStatus.FAILED)
+        _save_job(job, ImageJob.Status.FAILED, str(error))
+    else:
+        # la imagen solo se cambia si la receta sigue existiendo y sigue
+        # teniendo la imagen que se leyo, si otro trabajo la cambio antes
+        # el resultado de este ya no se usa
+        current = Q(image=old_name)
+        if not old_name:
+            current |= Q(image__isnull=True)
+        if _update_recipe(
+                recipe, Recipe.objects.filter(current),
+                image=name, image_status=Recipe.ImageStatus.READY):
+            # la imagen anterior y sus variantes ya no se usan
+            if old_name:
+                release_image(storage, old_name)
+        else:
+            release_image(storage, name)
+        _save_job(job, ImageJob.Status.DONE)
+    finally:
+        storage.delete(job.upload)
+    return job
+
+
+def process_pending_jobs(max_jobs=None):
+    '''Process queued jobs until there are none left or max_jobs'''
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        try:
+            process_job(job)
+        except Exception as error:
+            # un error inesperado no detiene el worker, el trabajo se vuelve
+            # a intentar hasta IMAGE_JOB_MAX_ATTEMPTS veces
+            retry_job(job, str(error))
+        processed += 1
+    return processed
@@ -0,0 +1,117 @@
+'''
+Resized variants for recipe images
+'''
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# formatos que se conservan al volver a codificar, el resto pasa a JPEG
+KEEP_FORMATS = ('JPEG', 'PNG', 'WEBP')
+# extension con la que se guarda cada formato de salida
+FORMAT_EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+def variant_names():
+    '''Return the names of the image variants, original included'''
+    return list(settings.RECIPE_IMAGE_VARIANTS) + ['original']
+
+
+def variant_name(name, variant):
+    '''Return the storage name of a variant of the image name'''
+    if variant == 'original':
+        return name
+    root, ext = os.path.splitext(name)
+    return f'{root}_{variant}{ext}'
+
+
+def image_url(storage, name, request=None):
+    '''Return the URL of a stored file, absolute if there is a request'''
+    url = storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def variant_urls(image_field, request=None):
+    '''Return the URL of every variant of an image field'''
+    if not image_field:
+        return None
+    return {
+        variant: image_url(
+            image_field.storage,
+            variant_name(image_field.name, variant),
+            request,
+        )
+        for variant in variant_names()
+    }
+
+
+def verify_image(storage, name):
+    '''Check the file stored in name is an image and return its format'''
+    # verify comprueba el archivo sin decodificar toda la imagen
+    with storage.open(name) as image_file:
+        image = Image.open(image_file)
+        image.verify()
+    return image.format
+
+
+def output_format(image_format):
+    '''Return the format an image in image_format is re-encoded to'''
+    return image_format if image_format in KEEP_FORMATS else 'JPEG'
+
+
+def image_extension(image_format):
+    '''Return the file extension of an image in image_format once stored'''
+    # un GIF o BMP se guarda como JPEG y necesita la extension .jpg
+    return FORMAT_EXTENSIONS[output_format(image_format)]
+
+
+def _encode(image, image_format):
+    '''Encode image without metadata and return it as a file'''
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    options = {}
+    if image_format in ('JPEG', 'WEBP'):
+        options = {'quality': settings.RECIPE_IMAGE_QUALITY, 'optimize': True}
+    buffer = BytesIO()
+    # al no pasar exif ni icc_profile la imagen se guarda sin metadatos
+    image.save(buffer, format=image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def replace_file(storage, name, content):
+    '''Store content under name, overwriting a previous file'''
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, content)
+
+
+def create_image_variants(storage, name):
+    '''Re-encode the image stored in name and save its resized variants'''
+    with storage.open(name) as image_file:
+        image = Image.open(image_file)
+        image.load()
+    image_format = output_format(image.format)
+    # se aplica la orientacion de la camara antes de quitar los metadatos
+    image = ImageOps.exif_transpose(image)
+    replace_file(storage, name, _encode(image, image_format))
+    for variant, size in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = image.copy()
+        # thumbnail mantiene la proporcion y nunca agranda la imagen
+        resized.thumbnail((size, size), Image.LANCZOS)
+        replace_file(
+            storage,
+            variant_name(name, variant),
+            _encode(resized, image_format),
+        )
+
+
+def delete_image_files(storage, name):
+    '''Delete an image and all its variants'''
+    for variant in variant_names():
+        file_name = variant_name(name, variant)
+        if storage.exists(file_name):
+            storage.delete(file_name)
@@ -0,0 +1,156 @@
+'''
+Bulk import of recipes from NDJSON or CSV
+'''
+import csv
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+
+from recipe.bulk import RELATIONS, create_recipes
+from recipe.export import EXPORT_FORMATS, LIST_SEPARATOR
+from recipe.serializers import RecipeDetailSerializer
+
+# se importan los mismos formatos que se exportan
+IMPORT_FORMATS = {
+    content_type: name for name, content_type in EXPORT_FORMATS.items()
+}
+INVALID_UTF8 = 'The line is not valid UTF-8.'
+
+
+class InvalidLine(str):
+    '''Line of the body that is not valid UTF-8, decoded with replacements'''
+
+
+def decode_lines(body):
+    '''Yield the lines of a binary file decoded as UTF-8'''
+    # cada linea se decodifica por separado, en UTF-8 un salto de linea no
+    # puede ser parte de otro caracter. Una linea invalida no corta la
+    # respuesta, su fila se devuelve con un error
+    for line in body:
+        try:
+            yield line.decode('utf-8')
+        except UnicodeDecodeError:
+            yield InvalidLine(line.decode('utf-8', 'replace'))
+
+
+def spool_lines(stream, max_memory=1024 * 1024):
+    '''Copy stream to a temporary file and return its lines as text'''
+    # el cuerpo se guarda antes de responder, los datos grandes pasan a
+    # disco y no se mantienen en memoria
+    body = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    if stream is not None:
+        shutil.copyfileobj(stream, body)
+    body.seek(0)
+    return decode_lines(body)
+
+
+def import_format(content_type):
+    '''Return the import format of a Content-Type header or None'''
+    # se comparan solo el tipo y subtipo, sin parametros como charset
+    media_type = content_type.split(';', 1)[0].strip().lower()
+    return IMPORT_FORMATS.get(media_type)
+
+
+def _csv_rows(lines):
+    invalid = set()
+
+    def track(lines):
+        for number, line in enumerate(lines, 1):
+            if isinstance(line, InvalidLine):
+                invalid.add(number)
+            yield line
+
+    reader = csv.DictReader(track(lines))
+    last_line = reader.line_num
+    for row in reader:
+        # una fila puede ocupar varias lineas si tiene saltos entre comillas
+        first_line, last_line = last_line + 1, reader.line_num
+        if invalid.intersection(range(first_line, last_line + 1)):
+            yield last_line, None, INVALID_UTF8
+            continue
+        # se ignoran el id de una exportacion y las columnas sin nombre
+        data = {
+            column: value for column, value in row.items()
+            if column is not None and column != 'id'
+        }
+        for relation, _ in RELATIONS:
+            names = data.get(relation) or ''
+            data[relation] = [
+                {'name': name} for name in names.split(LIST_SEPARATOR)
+                if name
+            ]
+        yield reader.line_num, data, None
+
+
+def _ndjson_rows(lines):
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        if isinstance(line, InvalidLine):
+            yield number, None, INVALID_UTF8
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as error:
+            yield number, None, f'Invalid JSON: {error}'
+            continue
+        if not isinstance(data, dict):
+            yield number, None, 'Expected a JSON object.'
+            continue
+        yield number, data, None
+
+
+def parse_rows(lines, import_format):
+    '''Yield the line number, data and parse error of each row'''
+    if import_format == 'csv':
+        return _csv_rows(lines)
+    return _ndjson_rows(lines)
+
+
+def _error(number, errors):
+    return {'line': number, 'status': 'error', 'errors': errors}
+
+
+def _insert_batch(user, batch):
+    '''Insert a batch of validated rows and yield their results'''
+    try:
+        # cada lote va en su propia transaccion, si falla no se guarda
+        # ninguna de sus filas y los lotes anteriores se mantienen
+        with transaction.atomic():
+            recipes = create_recipes(user, [data for _, data in batch])
+    except DatabaseError as error:
+        for number, _ in batch:
+            yield _error(number, {'non_field_errors': [str(error)]})
+        return
+    for (number, _), recipe in zip(batch, recipes):
+        yield {'line': number, 'status': 'created', 'id': recipe.id}
+
+
+def import_recipes(user, rows, batch_size=None):
+    '''Validate and insert rows yielding the result of each one'''
+    batch_size = batch_size or settings.RECIPE_IMPORT_BATCH_SIZE
+    batch = []
+    for number, data, error in rows:
+        if error is not None:
+            yield _error(number, {'non_field_errors': [error]})
+            continue
+        # la validacion es la misma que al crear una receta por la API
+        serializer = RecipeDetailSerializer(data=data)
+        if not serializer.is_valid():
+            yield _error(number, serializer.errors)
+            continue
+        batch.append((number, serializer.validated_data))
+        if len(batch) >= batch_size:
+            yield from _insert_batch(user, batch)
+            batch = []
+    if batch:
+        yield from _insert_batch(user, batch)
+
+
+def result_lines(results):
+    '''Yield each import result as a JSON line'''
+    for result in results:
+        yield json.dumps(result) + '\n'
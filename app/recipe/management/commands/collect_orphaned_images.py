@@ -0,0 +1,47 @@
+'''
+Django command to delete recipe image files no longer referenced
+'''
+from django.core.management.base import BaseCommand
+
+from recipe.image_gc import collect_orphaned_images
+
+
+class Command(BaseCommand):
+    '''Django command removing orphaned recipe images from the media volume'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the orphaned files without deleting them',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='Only delete files older than this many seconds',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of files checked against the database per query',
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        on_orphan = None
+        # con --verbosity 2 se lista cada archivo huerfano
+        if options['verbosity'] > 1:
+            def on_orphan(name, size):
+                self.stdout.write(f'{name} ({size} bytes)')
+        report = collect_orphaned_images(
+            min_age=options['min_age'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            on_orphan=on_orphan,
+        )
+        action = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(
+            f'Scanned {report.scanned} files: {report.referenced} in use, '
+            f'{report.recent} too recent, {report.orphaned} orphaned'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} {report.orphaned} files '
+            f'({report.freed_bytes} bytes)'
+        ))
@@ -0,0 +1,47 @@
+'''
+Django command to export the recipes of a user as NDJSON or CSV
+'''
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe.export import EXPORT_FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    '''Django command streaming the recipes of a user to a file'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the recipes owner')
+        parser.add_argument(
+            '--format', dest='export_format', default='ndjson',
+            choices=list(EXPORT_FORMATS),
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output', default=None,
+            help='File to write, the standard output by default',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=None,
+            help='Recipes loaded per block with their relations',
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist")
+        lines = export_lines(
+            Recipe.objects.filter(user=user).order_by('id'),
+            options['export_format'],
+            options['chunk_size'],
+        )
+        if options['output'] is None:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        # newline='' evita que el modulo csv duplique los saltos de linea
+        with open(options['output'], 'w', newline='') as output:
+            output.writelines(lines)
@@ -0,0 +1,65 @@
+'''
+Django command to import recipes for a user from NDJSON or CSV
+'''
+import json
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.export import EXPORT_FORMATS
+from recipe.importer import decode_lines, import_recipes, parse_rows
+
+
+class Command(BaseCommand):
+    '''Django command creating recipes in bulk from a file'''
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email of the recipes owner')
+        parser.add_argument(
+            'path', help='File to import, - reads the standard input')
+        parser.add_argument(
+            '--format', dest='import_format', default=None,
+            choices=list(EXPORT_FORMATS),
+            help='Input format, by default taken from the file extension',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Recipes inserted per transaction',
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['email']} does not exist")
+        path = options['path']
+        import_format = options['import_format']
+        if import_format is None:
+            import_format = 'csv' if path.endswith('.csv') else 'ndjson'
+        if path == '-':
+            self._import(
+                user, decode_lines(sys.stdin.buffer), import_format, options)
+            return
+        # se lee en binario, sin traducir saltos de linea para que el modulo
+        # csv lea los que hay dentro de los campos, y una linea con UTF-8
+        # invalido se devuelve como error de su fila
+        with open(path, 'rb') as body:
+            self._import(user, decode_lines(body), import_format, options)
+
+    def _import(self, user, lines, import_format, options):
+        '''Import lines writing the result of each row'''
+        results = import_recipes(
+            user, parse_rows(lines, import_format), options['batch_size'])
+        counts = {'created': 0, 'error': 0}
+        for result in results:
+            counts[result['status']] += 1
+            # con --verbosity 0 solo se muestra el resumen
+            if options['verbosity'] > 0:
+                self.stdout.write(json.dumps(result))
+        style = self.style.WARNING if counts['error'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f"Imported {counts['created']} recipes, "
+            f"{counts['error']} rows with errors"
+        ))
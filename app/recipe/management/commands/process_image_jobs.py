@@ -0,0 +1,50 @@
+'''
+Django command to process the queued recipe image uploads
+'''
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.db.pool import pool_stats, release_connections
+from recipe.image_jobs import process_pending_jobs
+
+
+class Command(BaseCommand):
+    '''Django command running the image processing worker'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Process the pending jobs and exit',
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--max-jobs', type=int, default=None,
+            help='Maximum number of jobs to process in one pass',
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        while True:
+            # como al empezar una peticion, la conexion que lleva tiempo sin
+            # uso se comprueba y una rota tras un reinicio se reemplaza
+            release_connections()
+            try:
+                processed = process_pending_jobs(options['max_jobs'])
+            except Exception as error:
+                # por ejemplo la base de datos reiniciandose, el worker
+                # espera y vuelve a intentarlo en lugar de terminar
+                self.stderr.write(f'Image jobs failed: {error}')
+                processed = 0
+            if processed:
+                self.stdout.write(
+                    f'Processed {processed} image jobs '
+                    f'(database pool: {pool_stats.format()})')
+            if options['once']:
+                break
+            # si la cola esta vacia se espera antes de volver a consultar
+            if not processed:
+                time.sleep(options['sleep'])
@@ -0,0 +1,35 @@
+'''
+Django command to recompute the denormalized recipe cards
+'''
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.cards import refresh_cards
+
+
+class Command(BaseCommand):
+    '''Django command rebuilding the recipe cards read by the list'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Recipes refreshed per batch',
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        batch_size = options['batch_size']
+        ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+        batch = []
+        total = 0
+        # cada parte crea las tarjetas que faltan y corrige las demas
+        for recipe_id in ids.iterator(chunk_size=batch_size):
+            batch.append(recipe_id)
+            if len(batch) >= batch_size:
+                refresh_cards(batch)
+                total += len(batch)
+                batch = []
+        refresh_cards(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the card of {total} recipes'))
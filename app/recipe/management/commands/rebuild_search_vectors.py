@@ -0,0 +1,40 @@
+'''
+Django command to recompute the full text search vectors of recipes
+'''
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from recipe.search import search_supported, update_search_vectors
+
+
+class Command(BaseCommand):
+    '''Django command rebuilding the stored recipe search vectors'''
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Recipes updated per query',
+        )
+
+    def handle(self, *args, **options):
+        '''Entry point for command'''
+        if not search_supported():
+            self.stdout.write(
+                'The database has no full text search, nothing to do')
+            return
+        batch_size = options['batch_size']
+        ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+        batch = []
+        total = 0
+        # se recorren los id por partes para no bloquear toda la tabla en
+        # una sola consulta
+        for recipe_id in ids.iterator(chunk_size=batch_size):
+            batch.append(recipe_id)
+            if len(batch) >= batch_size:
+                update_search_vectors(batch)
+                total += len(batch)
+                batch = []
+        update_search_vectors(batch)
+        total += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the search vector of {total} recipes'))
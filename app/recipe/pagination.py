@@ -0,0 +1,63 @@
+'''
+Pagination classes for the recipe API
+'''
+from django.conf import settings
+from rest_framework.pagination import BasePagination, CursorPagination
+from rest_framework.response import Response
+
+
+class RecipeCursorPagination(CursorPagination):
+    '''Keyset pagination for recipes ordered by newest first'''
+    # la paginacion por cursor filtra por id en lugar de usar OFFSET,
+    # por tanto cada pagina cuesta lo mismo sin importar su profundidad
+    ordering = '-id'
+    page_size = settings.RECIPE_PAGE_SIZE
+    # el cliente puede pedir otro tamaño de pagina hasta el maximo definido
+    page_size_query_param = 'page_size'
+    max_page_size = settings.RECIPE_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        # la vista puede cambiar el orden, por ejemplo por relevancia cuando
+        # se hace una busqueda, el primer campo define la posicion del cursor
+        get_ordering = getattr(view, 'get_ordering', None)
+        if get_ordering is not None:
+            return tuple(get_ordering())
+        return super().get_ordering(request, queryset, view)
+
+
+class AutocompletePagination(BasePagination):
+    '''Return only the best results of an autocomplete search'''
+    # sin el parametro q el listado completo se devuelve sin paginar
+    search_query_param = 'q'
+    limit_query_param = 'limit'
+
+    def get_limit(self, request):
+        '''Return the number of results requested, within the maximum'''
+        config = settings.RECIPE_AUTOCOMPLETE
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return config['LIMIT']
+        if limit <= 0:
+            return config['LIMIT']
+        return min(limit, config['MAX_LIMIT'])
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not request.query_params.get(self.search_query_param, '').strip():
+            return None
+        return list(queryset[:self.get_limit(request)])
+
+    def get_paginated_response(self, data):
+        return Response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.limit_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Maximum number of results of a q search',
+            'schema': {'type': 'integer'},
+        }]
@@ -0,0 +1,103 @@
+'''
+Full text search of recipes
+'''
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from core.models import Recipe
+from recipe.cache import bump_user_version
+
+
+def search_supported():
+    '''Return if the database has full text search'''
+    return connection.vendor == 'postgresql'
+
+
+def _relation_names(relation, column):
+    '''Subquery with the names of the related objects of a recipe'''
+    through = Recipe._meta.get_field(relation).remote_field.through
+    names = (
+        through.objects
+        .filter(recipe_id=OuterRef('pk'))
+        .values('recipe_id')
+        .annotate(names=StringAgg(f'{column}__name', ' '))
+        .values('names')
+    )
+    return Coalesce(Subquery(names), Value(''))
+
+
+def search_vector():
+    '''Return the expression computing the search vector of a recipe'''
+    config = settings.RECIPE_SEARCH_CONFIG
+    # el peso define la relevancia: titulo, tags e ingredientes y por
+    # ultimo la descripcion
+    return (
+        SearchVector('title', weight='A', config=config)
+        + SearchVector(_relation_names('tags', 'tag'), weight='B',
+                       config=config)
+        + SearchVector(_relation_names('ingredients', 'ingredient'),
+                       weight='B', config=config)
+        + SearchVector('description', weight='C', config=config)
+    )
+
+
+def update_search_vectors(recipe_ids):
+    '''Recompute the stored search vector of the recipes'''
+    if not recipe_ids or not search_supported():
+        return
+    # una sola consulta para todas las recetas, los nombres de tags e
+    # ingredientes se agregan con subconsultas
+    recipes = Recipe.objects.filter(id__in=list(recipe_ids))
+    recipes.update(search_vector=search_vector())
+    # como con las tarjetas, los listados con busqueda guardados entre el
+    # commit y la actualizacion de los vectores quedan invalidados
+    users = recipes.order_by().values_list('user_id', flat=True).distinct()
+    for user_id in users:
+        bump_user_version(user_id)
+
+
+def schedule_search_update(recipe_ids):
+    '''Update the search vectors once the transaction commits'''
+    if not search_supported():
+        return
+    recipe_ids = set(recipe_ids)
+    if recipe_ids:
+        # al hacer commit los tags e ingredientes ya estan guardados
+        transaction.on_commit(lambda: update_search_vectors(recipe_ids))
+
+
+def filter_search(queryset, term):
+    '''Filter queryset by term returning it and if it is ranked'''
+    if search_supported():
+        query = SearchQuery(
+            term, search_type='websearch',
+            config=settings.RECIPE_SEARCH_CONFIG,
+        )
+        # el filtro usa el indice GIN sobre search_vector
+        queryset = queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query))
+        return queryset, True
+    # sin Postgres cada palabra debe aparecer en el titulo, la descripcion
+    # o el nombre de un tag o ingrediente
+    conditions = []
+    for word in term.split():
+        conditions.append(
+            Q(title__icontains=word)
+            | Q(description__icontains=word)
+            | Q(Exists(Recipe.tags.through.objects.filter(
+                recipe_id=OuterRef('pk'), tag__name__icontains=word)))
+            | Q(Exists(Recipe.ingredients.through.objects.filter(
+                recipe_id=OuterRef('pk'), ingredient__name__icontains=word)))
+        )
+    if conditions:
+        queryset = queryset.filter(reduce(and_, conditions))
+    return queryset, False
@@ -2,13 +2,34 @@
 Serializers for recipe API
 '''
 
+from django.conf import settings
+from django.core.validators import validate_image_file_extension
 from rest_framework import serializers
 from core.models import Recipe, Tag, Ingredient
+from recipe.image_jobs import enqueue_image
+from recipe.images import image_url, variant_name, variant_urls
 
 
 # *SE DEFINEN PRIMERO LOS SERIALIZADORES QUE NO CONTIENEN OTROS
 
-class IngredientSerializer(serializers.ModelSerializer):
+class RecipeAttrSerializer(serializers.ModelSerializer):
+    '''Base serializer for tags and ingredients'''
+
+    def validate_name(self, value):
+        '''Check the name is not used by another object of the user'''
+        # solo se comprueba al editar un objeto existente, cuando se usa como
+        # nested serializer en una receta el nombre existente se reutiliza
+        if self.instance is not None:
+            duplicate = type(self.instance).objects.filter(
+                user=self.instance.user, name=value,
+            ).exclude(id=self.instance.id)
+            if duplicate.exists():
+                raise serializers.ValidationError(
+                    'An item with this name already exists.')
+        return value
+
+
+class IngredientSerializer(RecipeAttrSerializer):
     '''Serializer for ingredients'''
 
     class Meta:
@@ -17,7 +38,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(RecipeAttrSerializer):
     '''Serializer for tags'''
 
     class Meta:
@@ -26,9 +47,70 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields =['id']
 
 
+class IngredientCountSerializer(IngredientSerializer):
+    '''Serializer for ingredients with the number of recipes using them'''
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = IngredientSerializer.Meta.read_only_fields + [
+            'recipe_count',
+        ]
+
+
+class TagCountSerializer(TagSerializer):
+    '''Serializer for tags with the number of recipes using them'''
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+        read_only_fields = TagSerializer.Meta.read_only_fields + [
+            'recipe_count',
+        ]
+
+
+def get_or_create_attrs(model, user, items):
+    '''Return the user objects of model for items, creating the missing'''
+    # tomamos los nombres sin repetir y manteniendo el orden del payload
+    names = list(dict.fromkeys(item['name'] for item in items))
+    if not names:
+        return []
+    # buscamos en una sola consulta los objetos que ya existen
+    existing = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in existing]
+    if missing:
+        # creamos los que faltan en un solo insert, ignore_conflicts evita
+        # el error si otra peticion los creo al mismo tiempo
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        # con ignore_conflicts la base de datos no devuelve los id, por eso
+        # los volvemos a consultar
+        existing.update(
+            (obj.name, obj)
+            for obj in model.objects.filter(user=user, name__in=missing)
+        )
+    return [existing[name] for name in names]
+
+
+class SparseFieldsMixin:
+    '''Serializer mixin keeping only the fields passed in fields'''
+
+    def __init__(self, *args, **kwargs):
+        # con many=True DRF crea el hijo con los mismos argumentos, asi cada
+        # receta de la lista usa solo los campos pedidos
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 # *SE DEFINEN LOS SERIALIZADORES QUE DEPENDEN DE OTROS DEFINIDOS PREVIAMENTE
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     '''Serializer for recipes'''
     # definimos el nested serializer
     tags = TagSerializer(many=True, required=False)
@@ -39,35 +121,25 @@ class RecipeSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients']
         read_only_fields = ['id']
 
-    # este metodo va a ser usado por los metodos create y update cuando sean 
-    # modificados para los campos many to many 
-    def _get_or_create_tags(self, tags, recipe):
-        '''Handle getting or creating tags as needed'''
+    # este metodo va a ser usado por los metodos create y update cuando sean
+    # modificados para los campos many to many
+    def _get_or_create_attrs(self, model, items):
+        '''Return the user objects of model for items, creating the missing'''
         # obtenemos el usuario autenticado, como estamos en el serializador y no
         # en la vista tenemos que usar este metodo
         auth_user = self.context['request'].user
-        # creamos cada tag y la adicionamos a la receta
-        for tag in tags:
-            # se usa el metodo get_or_create porque si existe el tag previamente
-            # no lo duplica
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,
-            )
-            # adicionamos el tag a la receta
-            recipe.tags.add(tag_obj)
+        return get_or_create_attrs(model, auth_user, items)
 
+    def _get_or_create_tags(self, tags, recipe):
+        '''Handle getting or creating tags as needed'''
+        # add solo inserta en la tabla intermedia las relaciones que no
+        # existen, todas en un solo insert
+        recipe.tags.add(*self._get_or_create_attrs(Tag, tags))
 
     def _get_or_create_ingredients(self, ingredients, recipe):
         '''Handle getting or create ingredients as needed'''
-        auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
-
+        recipe.ingredients.add(
+            *self._get_or_create_attrs(Ingredient, ingredients))
 
     # los nested serializer son por defecto campos read-only para cambiar eso
     # es necesario modificar la funcion
@@ -84,48 +156,126 @@ class RecipeSerializer(serializers.ModelSerializer):
         # devolvemos la receta
         return recipe
 
-
     # hay que modificar el metodo update para que admita los nested serializer
     def update(self, instance, validated_data):
         '''Update recipe'''
         # tomamos las tags y las borramos de validated_data
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        # chequeamos si los tags y los ingredients existen
+        # chequeamos si los tags y los ingredients existen, set compara las
+        # relaciones actuales con las nuevas y solo borra o inserta las
+        # diferencias, si no hay cambios no escribe nada
         if tags is not None:
-            instance.tags.clear()
-            # creamos las tags
-            self._get_or_create_tags(tags, instance)
+            instance.tags.set(self._get_or_create_attrs(Tag, tags))
         if ingredients is not None:
-            instance.ingredients.clear()
-            # creamos los ingredients
-            self._get_or_create_ingredients(ingredients, instance)
+            instance.ingredients.set(
+                self._get_or_create_attrs(Ingredient, ingredients))
         # creamos el resto del objeto recipe
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
-        # guardamos el objeto
-        instance.save()
-        
+        # guardamos solo los campos editados, la imagen y su estado los
+        # cambia el worker de imagenes y una copia leida antes no los pisa
+        update_fields = [
+            field for field in validated_data
+            if field not in ('image', 'image_status')
+        ]
+        instance.save(update_fields=update_fields + ['updated_at'])
+
         return instance
 
+
+class RecipeThumbnailSerializer(RecipeSerializer):
+    '''Serializer for recipes including the image thumbnail URL'''
+    thumbnail = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ['thumbnail']
+
+    def get_thumbnail(self, recipe):
+        urls = variant_urls(recipe.image, self.context.get('request'))
+        return urls['thumbnail'] if urls else None
+
+    def get_thumbnail_from_row(self, row):
+        '''Return the thumbnail URL of a values() row'''
+        if not row['image']:
+            return None
+        return image_url(
+            Recipe._meta.get_field('image').storage,
+            variant_name(row['image'], 'thumbnail'),
+            self.context.get('request'),
+        )
+
+
 class RecipeDetailSerializer(RecipeSerializer):
     '''Serializer for recipe detail view'''
+    # urls de la miniatura, la version mediana y la original
+    image_variants = serializers.SerializerMethodField()
 
     class Meta(RecipeSerializer.Meta):
         # se pone image solo si existiera ese campo
-        fields = RecipeSerializer.Meta.fields + ['description', 'image']
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_variants', 'image_status',
+        ]
+        read_only_fields = RecipeSerializer.Meta.read_only_fields + [
+            'image', 'image_status',
+        ]
+
+    def get_image_variants(self, recipe):
+        return variant_urls(recipe.image, self.context.get('request'))
 
 
 # se crea un serializador aparte porque es una buena practica solamente
-# actualizar un tipo de datos en un API, en este caso usamos un API 
+# actualizar un tipo de datos en un API, en este caso usamos un API
 # para las imagenes
 class RecipeImageSerializer(serializers.ModelSerializer):
     '''Serializer for uploading images to recipes'''
+    # se recibe como archivo, la validacion de la imagen la hace el worker
+    # en segundo plano para no decodificarla durante la peticion, aqui solo
+    # se comprueba la extension como hacia el ImageField del modelo
+    image = serializers.FileField(
+        validators=[validate_image_file_extension])
 
     class Meta:
         model = Recipe
-        fields = ['id', 'image']
-        read_only_fields = ['id']
-        # se pone required porque si no hay una imagen no tiene sentido usar el
-        # serializador
-        extra_kwargs = {'image': {'required': 'True'}}
\ No newline at end of file
+        fields = ['id', 'image', 'image_status']
+        read_only_fields = ['id', 'image_status']
+
+    def update(self, instance, validated_data):
+        '''Queue the uploaded image for processing'''
+        # la imagen actual se mantiene hasta que termine el procesamiento
+        enqueue_image(instance, validated_data['image'])
+        return instance
+
+
+class RecipeBatchOperationSerializer(serializers.Serializer):
+    '''Serializer for one operation of a recipe batch'''
+    op = serializers.ChoiceField(choices=['create', 'update', 'delete'])
+    id = serializers.IntegerField(required=False)
+    # los datos se validan despues con RecipeDetailSerializer
+    data = serializers.DictField(required=False)
+
+    def validate(self, attrs):
+        if attrs['op'] != 'create' and 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id': 'This field is required.'})
+        if attrs['op'] != 'delete' and 'data' not in attrs:
+            raise serializers.ValidationError(
+                {'data': 'This field is required.'})
+        return attrs
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    '''Serializer for a batch of recipe operations'''
+    operations = RecipeBatchOperationSerializer(many=True, allow_empty=False)
+
+    def validate_operations(self, operations):
+        if len(operations) > settings.RECIPE_BATCH_MAX_OPERATIONS:
+            raise serializers.ValidationError(
+                'Ensure this field has no more than '
+                f'{settings.RECIPE_BATCH_MAX_OPERATIONS} elements.')
+        ids = [op['id'] for op in operations if 'id' in op]
+        # cada receta solo puede aparecer en una operacion del lote
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Each recipe can only appear once per batch.')
+        return operations
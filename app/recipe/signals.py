@@ -0,0 +1,120 @@
+'''
+Signal handlers for the recipe app
+'''
+from django.contrib.auth import get_user_model
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import bump_user_version
+from recipe.cards import schedule_card_refresh
+from recipe.image_jobs import release_image
+from recipe.search import schedule_search_update
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_user_cache(sender, instance, **kwargs):
+    '''Invalidate the cached responses of the owner of instance'''
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_user_cache_on_relations(sender, instance, action, **kwargs):
+    '''Invalidate the cached responses when recipe relations change'''
+    # instance puede ser la receta o el tag/ingrediente segun el lado de la
+    # relacion que se modifique, los dos tienen usuario
+    if action.startswith('post_'):
+        bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def init_user_cache(sender, instance, created, **kwargs):
+    '''Start new users with a fresh cache version'''
+    if created:
+        bump_user_version(instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_image(sender, instance, **kwargs):
+    '''Release the image files of a deleted recipe'''
+    if instance.image:
+        release_image(instance.image.storage, instance.image.name)
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search(sender, instance, update_fields, **kwargs):
+    '''Update the search vector when the recipe text changes'''
+    # guardar solo otros campos, por ejemplo la imagen, no cambia el texto
+    if update_fields and not {'title', 'description'} & set(update_fields):
+        return
+    schedule_search_update([instance.id])
+
+
+def _relation_change_recipes(instance, action, reverse, pk_set):
+    '''Return the ids of the recipes whose relations change'''
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            return [instance.id]
+    elif action in ('post_add', 'post_remove'):
+        # desde el tag o ingrediente pk_set son los id de las recetas
+        return pk_set
+    elif action == 'pre_clear':
+        return instance.recipe_set.values_list('id', flat=True)
+    return []
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_search_on_relations(sender, instance, action, reverse, pk_set,
+                               **kwargs):
+    '''Update the search vector of recipes whose relations change'''
+    schedule_search_update(
+        _relation_change_recipes(instance, action, reverse, pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def update_search_on_attr_change(sender, instance, **kwargs):
+    '''Update the recipes using a renamed or deleted tag or ingredient'''
+    if kwargs.get('created'):
+        return
+    # la actualizacion se hace al terminar la transaccion, cuando el nombre
+    # ya cambio o las relaciones ya se borraron
+    schedule_search_update(instance.recipe_set.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_card(sender, instance, **kwargs):
+    '''Refresh the card of a saved recipe'''
+    # tambien cuando solo cambia image_status, la tarjeta copia updated_at
+    schedule_card_refresh([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def update_cards_on_relations(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    '''Refresh the cards of recipes whose relations change'''
+    schedule_card_refresh(
+        _relation_change_recipes(instance, action, reverse, pk_set))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def update_cards_on_attr_change(sender, instance, **kwargs):
+    '''Refresh the cards using a renamed or deleted tag or ingredient'''
+    if kwargs.get('created'):
+        return
+    schedule_card_refresh(instance.recipe_set.values_list('id', flat=True))
@@ -0,0 +1,134 @@
+'''
+Tests for the tag and ingredient autocomplete
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.autocomplete import PrefixIndex
+
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+class PrefixIndexTests(TestCase):
+    '''Test the in-process index used without Postgres'''
+
+    def test_prefix_before_substring(self):
+        '''Test names starting with the text come before the rest'''
+        index = PrefixIndex([(1, 'Lemon'), (2, 'Salt'), (3, 'Melon'),
+                             (4, 'Lime'), (5, 'melba')])
+
+        self.assertEqual(index.search('mel', 10), [5, 3])
+        self.assertEqual(index.search('L', 10), [1, 4, 5, 3, 2])
+        self.assertEqual(index.search('lemon', 10), [1])
+
+    def test_limit(self):
+        '''Test the search stops at the limit'''
+        index = PrefixIndex([(i, f'Item {i:02}') for i in range(20)])
+
+        self.assertEqual(index.search('item', 3), [0, 1, 2])
+        self.assertEqual(index.search('9', 5), [9, 19])
+
+
+class AutocompleteApiTests(TestCase):
+    '''Test the q parameter of the tags and ingredients lists'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def names(self, url, params):
+        res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in res.data]
+
+    def test_prefix_matches_first(self):
+        '''Test names starting with the text are returned first'''
+        for name in ['Sweet potato', 'Potato', 'Tomato', 'Pot roast']:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        names = self.names(INGREDIENTS_URL, {'q': 'pot'})
+
+        self.assertEqual(names[:2], ['Pot roast', 'Potato'])
+        self.assertIn('Sweet potato', names)
+        self.assertNotIn('Tomato', names[:3])
+
+    def test_limit(self):
+        '''Test only limit results are returned'''
+        for i in range(15):
+            Tag.objects.create(user=self.user, name=f'Dinner {i:02}')
+
+        self.assertEqual(len(self.names(TAGS_URL, {'q': 'din'})), 10)
+        self.assertEqual(
+            self.names(TAGS_URL, {'q': 'din', 'limit': 2}),
+            ['Dinner 00', 'Dinner 01'],
+        )
+
+    @override_settings(RECIPE_AUTOCOMPLETE={
+        'LIMIT': 10, 'MAX_LIMIT': 5, 'INDEX_SIZE': 8, 'INDEX_TTL': 60})
+    def test_limit_maximum(self):
+        '''Test the limit can't exceed the maximum'''
+        for i in range(8):
+            Tag.objects.create(user=self.user, name=f'Lunch {i}')
+
+        self.assertEqual(
+            len(self.names(TAGS_URL, {'q': 'lunch', 'limit': 100})), 5)
+
+    def test_without_q_lists_everything(self):
+        '''Test the list is unchanged without the q parameter'''
+        Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Vegan')
+
+        self.assertEqual(
+            self.names(TAGS_URL, {'limit': 1}), ['Vegan', 'Breakfast'])
+
+    def test_other_users_excluded(self):
+        '''Test only the names of the user are returned'''
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        Tag.objects.create(user=other, name='Vegan')
+        Tag.objects.create(user=self.user, name='Vegetarian')
+
+        self.assertEqual(self.names(TAGS_URL, {'q': 'veg'}), ['Vegetarian'])
+
+    def test_assigned_only(self):
+        '''Test the search can be combined with assigned_only'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=10,
+            price=Decimal('2.00'))
+        carrot = Ingredient.objects.create(user=self.user, name='Carrot')
+        Ingredient.objects.create(user=self.user, name='Caramel')
+        recipe.ingredients.add(carrot)
+
+        self.assertEqual(
+            self.names(INGREDIENTS_URL, {'q': 'car', 'assigned_only': 1}),
+            ['Carrot'],
+        )
+        self.assertEqual(
+            self.names(INGREDIENTS_URL, {'q': 'car'}), ['Caramel', 'Carrot'])
+
+    def test_new_names_found(self):
+        '''Test names created after a search are found by the next one'''
+        Tag.objects.create(user=self.user, name='Brunch')
+        self.assertEqual(self.names(TAGS_URL, {'q': 'br'}), ['Brunch'])
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[Tag.objects.get().id]),
+            {'name': 'Breakfast'},
+        )
+        Tag.objects.create(user=self.user, name='Bread')
+
+        self.assertEqual(
+            self.names(TAGS_URL, {'q': 'br'}), ['Bread', 'Breakfast'])
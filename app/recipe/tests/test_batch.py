@@ -0,0 +1,216 @@
+'''
+Tests for the recipe batch API
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+BATCH_URL = reverse('recipe:recipe-batch')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, title='Sample recipe', tags=()):
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+    for name in tags:
+        recipe.tags.add(Tag.objects.get_or_create(user=user, name=name)[0])
+    return recipe
+
+
+class BatchApiTests(TestCase):
+    '''Test applying batches of recipe operations'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, operations):
+        return self.client.post(
+            BATCH_URL, {'operations': operations}, format='json')
+
+    def test_batch_requires_auth(self):
+        '''Test authentication is required'''
+        res = APIClient().post(BATCH_URL, {'operations': []}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_batch_operations(self):
+        '''Test creating, updating and deleting in one request'''
+        updated = create_recipe(self.user, 'Old title', tags=['Old'])
+        deleted = create_recipe(self.user, 'Deleted')
+        operations = [
+            {'op': 'create', 'data': {
+                'title': 'New', 'time_minutes': 5, 'price': '2.00',
+                'tags': [{'name': 'Quick'}],
+            }},
+            {'op': 'update', 'id': updated.id, 'data': {
+                'title': 'New title', 'tags': [{'name': 'Quick'}],
+            }},
+            {'op': 'delete', 'id': deleted.id},
+        ]
+
+        res = self.post(operations)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data['results']
+        self.assertEqual(
+            [r['status'] for r in results], [201, 200, 204])
+        created = Recipe.objects.get(id=results[0]['id'])
+        self.assertEqual(created.user, self.user)
+        self.assertEqual(results[0]['data']['title'], 'New')
+        updated.refresh_from_db()
+        self.assertEqual(updated.title, 'New title')
+        self.assertEqual(
+            list(updated.tags.values_list('name', flat=True)), ['Quick'])
+        self.assertEqual(results[1]['data']['tags'][0]['name'], 'Quick')
+        self.assertFalse(Recipe.objects.filter(id=deleted.id).exists())
+        # el tag se comparte entre la receta nueva y la actualizada
+        self.assertEqual(
+            Tag.objects.filter(user=self.user, name='Quick').count(), 1)
+
+    def test_partial_update_keeps_relations(self):
+        '''Test updating without tags does not change them'''
+        recipe = create_recipe(self.user, tags=['Vegan'])
+
+        res = self.post([
+            {'op': 'update', 'id': recipe.id, 'data': {'time_minutes': 45}},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.time_minutes, 45)
+        self.assertEqual(recipe.tags.get().name, 'Vegan')
+
+    def test_batch_updates_recipe_counts(self):
+        '''Test the tag recipe counts follow the batch writes'''
+        updated = create_recipe(self.user, tags=['Vegan', 'Old'])
+        deleted = create_recipe(self.user, tags=['Vegan'])
+
+        res = self.post([
+            {'op': 'create', 'data': {
+                'title': 'Salad', 'time_minutes': 5, 'price': '3.00',
+                'tags': [{'name': 'Vegan'}, {'name': 'Quick'}],
+            }},
+            {'op': 'update', 'id': updated.id,
+             'data': {'tags': [{'name': 'Quick'}]}},
+            {'op': 'delete', 'id': deleted.id},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'recipe_count')),
+            {'Vegan': 1, 'Old': 0, 'Quick': 2},
+        )
+
+    def test_invalid_operation_rolls_back_batch(self):
+        '''Test no operation is applied when one is invalid'''
+        recipe = create_recipe(self.user)
+
+        res = self.post([
+            {'op': 'create', 'data': {
+                'title': 'New', 'time_minutes': 5, 'price': '2.00'}},
+            {'op': 'update', 'id': recipe.id, 'data': {'price': 'abc'}},
+            {'op': 'delete', 'id': recipe.id + 1000},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        results = res.data['results']
+        self.assertEqual([r['status'] for r in results], [424, 400, 404])
+        self.assertIn('price', results[1]['errors'])
+        self.assertEqual(Recipe.objects.count(), 1)
+
+    def test_other_user_recipe_not_found(self):
+        '''Test recipes of other users can not be changed'''
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        recipe = create_recipe(other)
+
+        res = self.post([{'op': 'delete', 'id': recipe.id}])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['results'][0]['status'], 404)
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+    def test_duplicate_recipe_rejected(self):
+        '''Test a recipe can only appear once in a batch'''
+        recipe = create_recipe(self.user)
+
+        res = self.post([
+            {'op': 'update', 'id': recipe.id, 'data': {'title': 'New'}},
+            {'op': 'delete', 'id': recipe.id},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('operations', res.data)
+
+    @override_settings(RECIPE_BATCH_MAX_OPERATIONS=2)
+    def test_batch_size_limit(self):
+        '''Test batches larger than the limit are rejected'''
+        res = self.post([{'op': 'delete', 'id': i} for i in range(3)])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_batch_invalidates_list_cache(self):
+        '''Test the cached recipe list reflects the batch'''
+        self.client.get(RECIPES_URL)
+
+        self.post([{'op': 'create', 'data': {
+            'title': 'New', 'time_minutes': 5, 'price': '2.00'}}])
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_update_queries_do_not_grow(self):
+        '''Test updates are applied with set based queries'''
+        def count_queries(recipes):
+            operations = [
+                {'op': 'update', 'id': recipe.id, 'data': {
+                    'title': 'Changed', 'tags': [{'name': 'Changed'}]}}
+                for recipe in recipes
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.post(operations)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        # el tag ya existe para que las dos peticiones hagan lo mismo
+        Tag.objects.create(user=self.user, name='Changed')
+        few = [create_recipe(self.user, tags=['Old']) for _ in range(2)]
+        many = [create_recipe(self.user, tags=['Old']) for _ in range(8)]
+
+        self.assertEqual(count_queries(few), count_queries(many))
+
+    def test_delete_queries_do_not_grow(self):
+        '''Test deletes are applied with set based queries'''
+        def count_queries(recipes):
+            operations = [
+                {'op': 'delete', 'id': recipe.id} for recipe in recipes]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.post(operations)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        few = [create_recipe(self.user, tags=['Old']) for _ in range(2)]
+        many = [create_recipe(self.user, tags=['Old']) for _ in range(8)]
+
+        self.assertEqual(count_queries(few), count_queries(many))
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(Tag.objects.get().recipe_count, 0)
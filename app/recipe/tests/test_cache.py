@@ -0,0 +1,122 @@
+'''
+Tests for the recipe API response cache
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.checks import check_shared_response_cache
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def create_recipe(user, **params):
+    '''Create and return a sample recipe'''
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ResponseCacheTests(TestCase):
+    '''Test cached list responses are invalidated on writes'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_create_through_api_invalidates_list(self):
+        '''Test creating a recipe shows it in the cached list'''
+        self.client.get(RECIPES_URL)
+        payload = {
+            'title': 'New recipe',
+            'time_minutes': 5,
+            'price': Decimal('1.00'),
+        }
+        self.client.post(RECIPES_URL, payload)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_relation_change_invalidates_list(self):
+        '''Test adding a tag to a recipe refreshes the cached list'''
+        recipe = create_recipe(self.user)
+        self.client.get(RECIPES_URL)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'][0]['tags'][0]['name'], 'Vegan')
+
+    def test_tag_update_invalidates_list(self):
+        '''Test renaming a tag refreshes the cached tag list'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        self.client.get(TAGS_URL)
+        url = reverse('recipe:tag-detail', args=[tag.id])
+        self.client.patch(url, {'name': 'Vegetarian'})
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.data[0]['name'], 'Vegetarian')
+
+    def test_cache_keyed_by_query_params(self):
+        '''Test different filters are cached separately'''
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        create_recipe(self.user).tags.add(tag)
+        create_recipe(self.user)
+
+        res_all = self.client.get(RECIPES_URL)
+        res_tag = self.client.get(RECIPES_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(len(res_all.data['results']), 2)
+        self.assertEqual(len(res_tag.data['results']), 1)
+
+    def test_cache_limited_to_user(self):
+        '''Test a user never receives another user's cached list'''
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'testpass123',
+        )
+        create_recipe(other_user)
+        self.client.force_authenticate(other_user)
+        self.client.get(RECIPES_URL)
+        self.client.force_authenticate(self.user)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+
+class SharedCacheCheckTests(TestCase):
+    '''Test the deploy check for the response cache backend'''
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_per_process_cache_warns(self):
+        '''Test a per process cache is reported'''
+        errors = check_shared_response_cache(None)
+
+        self.assertEqual([error.id for error in errors], ['recipe.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': '/tmp/recipe-cache',
+    }})
+    def test_shared_cache_passes(self):
+        '''Test a shared cache backend is accepted'''
+        self.assertEqual(check_shared_response_cache(None), [])
@@ -0,0 +1,184 @@
+'''
+Tests for the denormalized recipe cards
+'''
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, RecipeCard, Tag, Ingredient
+from recipe.cache import get_cache, get_user_version
+from recipe.cards import refresh_cards
+from recipe.tests.test_fast import normalize
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@override_settings(RECIPE_CARDS=True)
+class RecipeCardTests(TestCase):
+    '''Test the cards follow the recipes and serve the list'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+
+    def create(self, title='Curry', tags=(), ingredients=(), **params):
+        '''Create a recipe through the API and return it'''
+        payload = {
+            'title': title,
+            'time_minutes': 30,
+            'price': '5.50',
+            'tags': [{'name': name} for name in tags],
+            'ingredients': [{'name': name} for name in ingredients],
+            **params,
+        }
+        # las tarjetas se actualizan al hacer commit
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(RECIPES_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return Recipe.objects.get(id=res.data['id'])
+
+    def test_card_created_with_recipe(self):
+        '''Test creating a recipe stores its card'''
+        recipe = self.create(tags=['Dinner'], ingredients=['Rice', 'Tofu'])
+
+        card = RecipeCard.objects.get(recipe=recipe)
+        self.assertEqual(card.title, 'Curry')
+        self.assertEqual(card.price, Decimal('5.50'))
+        self.assertEqual(card.updated_at, recipe.updated_at)
+        self.assertEqual(card.tag_ids, [recipe.tags.get().id])
+        self.assertEqual(
+            sorted(obj['name'] for obj in card.ingredients), ['Rice', 'Tofu'])
+
+    def test_card_follows_updates(self):
+        '''Test updating a recipe and its relations refreshes its card'''
+        recipe = self.create(tags=['Dinner'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                detail_url(recipe.id),
+                {'title': 'Green curry', 'tags': [{'name': 'Lunch'}]},
+                format='json',
+            )
+
+        card = RecipeCard.objects.get(recipe=recipe)
+        self.assertEqual(card.title, 'Green curry')
+        self.assertEqual([obj['name'] for obj in card.tags], ['Lunch'])
+
+    def test_refresh_invalidates_cache(self):
+        '''Test writing the cards changes the cache version again'''
+        recipe = self.create()
+        # un listado leido antes de refrescar la tarjeta usa esta version
+        version = get_user_version(self.user.id)
+
+        refresh_cards([recipe.id])
+
+        self.assertNotEqual(get_user_version(self.user.id), version)
+
+    def test_card_follows_tag_rename_and_delete(self):
+        '''Test renaming or deleting a tag refreshes the cards using it'''
+        recipe = self.create(tags=['Dinner'])
+        tag = recipe.tags.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Supper'
+            tag.save()
+        self.assertEqual(
+            RecipeCard.objects.get(recipe=recipe).tags,
+            [{'id': tag.id, 'name': 'Supper'}],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.delete()
+        card = RecipeCard.objects.get(recipe=recipe)
+        self.assertEqual((card.tags, card.tag_ids), ([], []))
+
+    def test_card_deleted_with_recipe(self):
+        '''Test deleting a recipe deletes its card'''
+        recipe = self.create()
+
+        self.client.delete(detail_url(recipe.id))
+
+        self.assertFalse(RecipeCard.objects.exists())
+
+    def test_list_single_table(self):
+        '''Test the list reads only the cards table'''
+        for i in range(3):
+            self.create(f'Recipe {i}', tags=['Dinner'], ingredients=['Rice'])
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 3)
+        # validadores del GET condicional y las tarjetas
+        self.assertEqual(len(queries), 2)
+        self.assertIn('core_recipecard', queries[-1]['sql'])
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+
+    def test_list_same_as_recipes(self):
+        '''Test the list from the cards matches the list from the recipes'''
+        r1 = self.create('Curry', tags=['Dinner', 'Vegan'],
+                         ingredients=['Rice'], time_minutes=40)
+        self.create('Salad', tags=['Vegan'], price='3.25', time_minutes=10)
+        self.create('Toast', ingredients=['Bread'], price='1.00')
+        dinner, vegan = r1.tags.order_by('name')
+        for params in [
+            {},
+            {'thumbnail': 1},
+            {'compact': 1},
+            {'expand': 'tags', 'ordering': 'price'},
+            {'tags': f'{dinner.id},{vegan.id}'},
+            {'tags': f'{dinner.id},{vegan.id}', 'tags_mode': 'all'},
+            {'ingredients': str(r1.ingredients.get().id)},
+            {'time_minutes__lte': 30, 'ordering': '-time_minutes'},
+            {'search': 'salad'},
+        ]:
+            with self.subTest(params=params):
+                results = []
+                for cards in (False, True):
+                    get_cache().clear()
+                    with override_settings(RECIPE_CARDS=cards):
+                        res = self.client.get(RECIPES_URL, params)
+                    self.assertEqual(res.status_code, status.HTTP_200_OK)
+                    results.append(normalize(res.json()))
+                self.assertEqual(results[1], results[0])
+                self.assertTrue(results[0]['results'])
+
+    def test_rebuild_command(self):
+        '''Test the rebuild command creates missing and fixes stale cards'''
+        recipe = self.create(tags=['Dinner'])
+        other = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('2.00'),
+        )
+        other.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Leek'))
+        RecipeCard.objects.filter(recipe=recipe).update(title='Stale')
+        Tag.objects.filter(recipe=recipe).update(name='Renamed')
+
+        out = StringIO()
+        call_command('rebuild_recipe_cards', '--batch-size', '1', stdout=out)
+
+        self.assertIn('2 recipes', out.getvalue())
+        card = RecipeCard.objects.get(recipe=recipe)
+        self.assertEqual(card.title, 'Curry')
+        self.assertEqual(card.tags[0]['name'], 'Renamed')
+        self.assertEqual(
+            RecipeCard.objects.get(recipe=other).ingredients[0]['name'],
+            'Leek',
+        )
@@ -0,0 +1,120 @@
+'''
+Tests for conditional GET requests on the recipe API
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def detail_url(recipe_id):
+    '''Create and return a recipe detail URL'''
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    '''Create and return a sample recipe'''
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.00'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ConditionalGetTests(TestCase):
+    '''Test 304 responses for unchanged recipe data'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_not_modified(self):
+        '''Test listing with a current ETag returns 304'''
+        create_recipe(self.user)
+        res = self.client.get(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_list_modified_after_delete(self):
+        '''Test deleting a recipe changes the list ETag'''
+        recipe = create_recipe(self.user)
+        create_recipe(self.user)
+        etag = self.client.get(RECIPES_URL)['ETag']
+        recipe.delete()
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_detail_not_modified_since(self):
+        '''Test retrieving with If-Modified-Since returns 304'''
+        recipe = create_recipe(self.user)
+        res = self.client.get(detail_url(recipe.id))
+
+        res = self.client.get(
+            detail_url(recipe.id),
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_modified_by_tag_rename(self):
+        '''Test renaming a tag of the recipe changes its ETag'''
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Vegan')
+        recipe.tags.add(tag)
+        etag = self.client.get(detail_url(recipe.id))['ETag']
+        tag.name = 'Vegetarian'
+        tag.save()
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegetarian')
+
+    def test_detail_invalid_id_not_found(self):
+        '''Test a detail URL with an id that is not a number returns 404'''
+        res = self.client.get(detail_url('abc'))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_missing_not_modified_any(self):
+        '''Test If-None-Match: * on a missing recipe returns 404'''
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        recipe = create_recipe(other)
+
+        for recipe_id in (recipe.id, recipe.id + 1):
+            res = self.client.get(
+                detail_url(recipe_id), HTTP_IF_NONE_MATCH='*')
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tag_list_not_modified(self):
+        '''Test listing tags with a current ETag returns 304'''
+        Tag.objects.create(user=self.user, name='Vegan')
+        res = self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
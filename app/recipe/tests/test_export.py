@@ -0,0 +1,148 @@
+'''
+Tests for the recipe export
+'''
+import csv
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.export import export_lines
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    '''Create a recipe with tags and ingredients by name'''
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=10,
+        price=Decimal('5.25'),
+    )
+    for name in tags:
+        recipe.tags.add(Tag.objects.get_or_create(user=user, name=name)[0])
+    for name in ingredients:
+        recipe.ingredients.add(
+            Ingredient.objects.get_or_create(user=user, name=name)[0])
+    return recipe
+
+
+def content(res):
+    return b''.join(res.streaming_content).decode()
+
+
+class ExportApiTests(TestCase):
+    '''Test exporting recipes through the API'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_export_requires_auth(self):
+        '''Test authentication is required to export'''
+        res = APIClient().get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_ndjson(self):
+        '''Test exporting one JSON document per recipe'''
+        r1 = create_recipe(self.user, 'Curry', ['Vegan'], ['Rice', 'Lentils'])
+        r2 = create_recipe(self.user, 'Soup')
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        create_recipe(other, 'Other recipe')
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in content(res).splitlines()]
+        self.assertEqual([r['id'] for r in records], [r1.id, r2.id])
+        self.assertEqual(records[0]['price'], '5.25')
+        self.assertEqual(
+            sorted(i['name'] for i in records[0]['ingredients']),
+            ['Lentils', 'Rice'],
+        )
+        self.assertEqual(records[0]['tags'][0]['name'], 'Vegan')
+        self.assertEqual(records[1]['tags'], [])
+
+    def test_export_csv(self):
+        '''Test exporting recipes as CSV rows'''
+        create_recipe(self.user, 'Curry, spicy', ['Vegan', 'Dinner'])
+
+        res = self.client.get(EXPORT_URL, {'export_format': 'csv'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(content(res))))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Curry, spicy')
+        self.assertEqual(
+            sorted(rows[0]['tags'].split('|')), ['Dinner', 'Vegan'])
+
+    def test_export_filtered_by_tags(self):
+        '''Test the export uses the list filters'''
+        recipe = create_recipe(self.user, 'Curry', ['Vegan'])
+        create_recipe(self.user, 'Steak', ['Meat'])
+        tag = recipe.tags.get()
+
+        res = self.client.get(EXPORT_URL, {'tags': str(tag.id)})
+
+        records = [json.loads(line) for line in content(res).splitlines()]
+        self.assertEqual([r['title'] for r in records], ['Curry'])
+
+    def test_export_invalid_format(self):
+        '''Test an unknown format returns an error'''
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_loads_relations_per_chunk(self):
+        '''Test relations are loaded with two queries per chunk'''
+        for i in range(5):
+            create_recipe(self.user, f'Recipe {i}', [f'Tag {i}'])
+        queryset = Recipe.objects.filter(user=self.user).order_by('id')
+
+        # recetas, y tags e ingredientes de cada uno de los 3 bloques
+        with self.assertNumQueries(1 + 2 * 3):
+            lines = list(export_lines(queryset, 'ndjson', chunk_size=2))
+
+        self.assertEqual(len(lines), 5)
+
+
+class ExportCommandTests(TestCase):
+    '''Test the export_recipes command'''
+
+    def test_export_to_file(self):
+        '''Test the command writes the recipes of the user to a file'''
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        create_recipe(user, 'Curry', ['Vegan'])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'recipes.csv')
+
+            call_command(
+                'export_recipes', 'user@example.com',
+                '--format', 'csv', '--output', path,
+            )
+
+            with open(path, newline='') as export_file:
+                rows = list(csv.DictReader(export_file))
+        self.assertEqual(rows[0]['title'], 'Curry')
+        self.assertEqual(rows[0]['tags'], 'Vegan')
@@ -0,0 +1,137 @@
+'''
+Tests for the read-only list serializers built from values() rows
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.cache import get_cache
+from recipe.fast import FastListSerializer
+from recipe.serializers import RecipeSerializer
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def normalize(data):
+    '''Sort the nested lists, the relations have no defined order'''
+    if isinstance(data, dict):
+        return {key: normalize(value) for key, value in data.items()}
+    if isinstance(data, list):
+        items = [normalize(item) for item in data]
+        if items and all(isinstance(item, dict) for item in items):
+            if all('id' in item and 'title' not in item for item in items):
+                return sorted(items, key=lambda item: item['id'])
+        return items
+    return data
+
+
+class FastListSerializerTests(TestCase):
+    '''Test the fast serializer output matches the model serializers'''
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+
+    def test_recipe_rows_same_as_serializer(self):
+        '''Test values() rows serialize like the recipe instances'''
+        recipe = Recipe.objects.create(
+            user=self.user, title='Curry', time_minutes=30,
+            price=Decimal('7'), link='',
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Dinner'))
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'),
+            Ingredient.objects.create(user=self.user, name='Curry paste'),
+        )
+        Recipe.objects.create(
+            user=self.user, title='Toast', time_minutes=2,
+            price=Decimal('0.50'),
+        )
+        queryset = Recipe.objects.order_by('id')
+        # las relaciones no se piden a values, las carga el serializador
+        columns = ['id', 'title', 'time_minutes', 'price', 'link']
+
+        expected = RecipeSerializer(
+            queryset.prefetch_related('tags', 'ingredients'), many=True).data
+        rows = FastListSerializer(
+            queryset.values(*columns), child=RecipeSerializer()).data
+
+        self.assertEqual(normalize(rows), normalize(expected))
+        # las claves anidadas siguen el orden de cada serializador
+        self.assertEqual(list(rows[0]['ingredients'][0]), ['name', 'id'])
+        self.assertEqual(rows[0]['price'], '7.00')
+
+
+class FastListApiTests(TestCase):
+    '''Test the list endpoints return the same data with the fast path'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        self.client.force_authenticate(self.user)
+        dinner = Tag.objects.create(user=self.user, name='Dinner')
+        vegan = Tag.objects.create(user=self.user, name='Vegan')
+        Tag.objects.create(user=self.user, name='Unused')
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Rice dish {i}', time_minutes=10 + i,
+                price=Decimal(f'{i}.5'), description='With rice',
+            )
+            recipe.tags.add(dinner)
+            if i % 2:
+                recipe.tags.add(vegan)
+            recipe.ingredients.add(rice)
+        Recipe.objects.filter(title='Rice dish 3').update(
+            image='uploads/recipe/dish.jpg')
+
+    def get(self, url, params):
+        '''Return the response data with the fast list on and off'''
+        results = []
+        for fast in (False, True):
+            # la respuesta anterior esta en la cache del listado
+            get_cache().clear()
+            with override_settings(RECIPE_FAST_LIST=fast):
+                res = self.client.get(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            results.append(normalize(res.json()))
+        return results
+
+    def test_recipe_list_equivalent(self):
+        '''Test the recipe list variants match the model serializers'''
+        for params in [
+            {},
+            {'thumbnail': 1},
+            {'fields': 'id,title,tags', 'thumbnail': 1},
+            {'expand': 'ingredients'},
+            {'compact': 1},
+            {'ordering': '-price', 'page_size': 2},
+            {'search': 'rice', 'tags': '1'},
+        ]:
+            with self.subTest(params=params):
+                model, fast = self.get(RECIPES_URL, params)
+                self.assertEqual(fast, model)
+                self.assertTrue(fast['results'])
+
+    def test_attr_lists_equivalent(self):
+        '''Test the tag and ingredient lists match the model serializers'''
+        for url, params in [
+            (TAGS_URL, {}),
+            (TAGS_URL, {'assigned_only': 1}),
+            (TAGS_URL, {'q': 'din'}),
+            (INGREDIENTS_URL, {}),
+        ]:
+            with self.subTest(url=url, params=params):
+                model, fast = self.get(url, params)
+                self.assertEqual(fast, model)
+                self.assertTrue(fast)
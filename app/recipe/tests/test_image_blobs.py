@@ -0,0 +1,172 @@
+'''
+Tests for the content addressed recipe image store
+'''
+import hashlib
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Recipe
+from recipe.image_blobs import HashingFile, is_blob
+from recipe.image_gc import collect_orphaned_images
+from recipe.images import variant_name, variant_names
+
+
+def image_upload_url(recipe_id):
+    '''Create and return and image upload URL'''
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def image_bytes(color='red'):
+    '''Return the content of a small JPEG image'''
+    buffer = BytesIO()
+    Image.new('RGB', (10, 10), color).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def create_recipe(user, title='Sample recipe'):
+    return Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=5,
+        price=Decimal('5.00'),
+    )
+
+
+class HashingFileTests(TestCase):
+    '''Test hashing an upload while it is stored'''
+
+    def test_digest_matches_content(self):
+        '''Test the digest is the sha256 of the stored content'''
+        content = b'x' * 200000
+        upload = HashingFile(ContentFile(content), 'file.jpg')
+
+        stored = b''.join(upload.chunks(chunk_size=65536))
+
+        self.assertEqual(stored, content)
+        self.assertEqual(upload.digest, hashlib.sha256(content).hexdigest())
+
+
+@override_settings(RECIPE_IMAGE_DEDUP=True)
+class ImageDedupTests(TestCase):
+    '''Test recipes uploading the same image share its files'''
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'password123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, recipe, content):
+        '''Upload content as the recipe image and run the worker'''
+        image_file = ContentFile(content, name='photo.jpg')
+        res = self.client.post(
+            image_upload_url(recipe.id), {'image': image_file},
+            format='multipart',
+        )
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        call_command('process_image_jobs', '--once', stdout=StringIO())
+        recipe.refresh_from_db()
+
+    def test_same_image_shared(self):
+        '''Test the same upload is stored once under its hash'''
+        content = image_bytes()
+        recipe1 = create_recipe(self.user)
+        recipe2 = create_recipe(self.user, title='Another recipe')
+
+        self.upload(recipe1, content)
+        self.upload(recipe2, content)
+
+        digest = hashlib.sha256(content).hexdigest()
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.digest, digest)
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(recipe1.image.name, blob.name)
+        self.assertEqual(recipe2.image.name, blob.name)
+        self.assertTrue(is_blob(blob.name))
+        self.assertIn(digest, blob.name)
+        storage = recipe1.image.storage
+        for variant in variant_names():
+            self.assertTrue(storage.exists(variant_name(blob.name, variant)))
+        # no queda ninguna copia con otro nombre
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(storage.path(blob.name)))),
+            len(variant_names()),
+        )
+
+    def test_replace_releases_blob(self):
+        '''Test replacing the image releases the previous shared image'''
+        recipe = create_recipe(self.user)
+        self.upload(recipe, image_bytes('red'))
+        self.upload(recipe, image_bytes('blue'))
+
+        blobs = dict(ImageBlob.objects.values_list('name', 'refcount'))
+        self.assertEqual(blobs[recipe.image.name], 1)
+        self.assertEqual(sorted(blobs.values()), [0, 1])
+
+    def test_unused_blob_collected(self):
+        '''Test shared images without references are deleted by the GC'''
+        recipe1 = create_recipe(self.user)
+        recipe2 = create_recipe(self.user, title='Another recipe')
+        content = image_bytes()
+        self.upload(recipe1, content)
+        self.upload(recipe2, content)
+        storage = recipe1.image.storage
+        name = recipe1.image.name
+
+        recipe1.delete()
+        # todavia la usa la otra receta
+        collect_orphaned_images(min_age=0)
+        self.assertTrue(storage.exists(name))
+
+        recipe2.delete()
+        self.assertEqual(ImageBlob.objects.get().refcount, 0)
+        report = collect_orphaned_images(min_age=0)
+
+        self.assertEqual(report.orphaned, len(variant_names()))
+        self.assertFalse(ImageBlob.objects.exists())
+        for variant in variant_names():
+            self.assertFalse(storage.exists(variant_name(name, variant)))
+
+    def test_blob_files_deleted_before_row(self):
+        '''Test the GC deletes the files while the blob row is locked'''
+        recipe = create_recipe(self.user)
+        self.upload(recipe, image_bytes())
+        storage = recipe.image.storage
+        recipe.delete()
+        delete = storage.delete
+        rows = []
+
+        def delete_and_check(name):
+            # la fila sigue existiendo, una subida de la misma imagen espera
+            rows.append(ImageBlob.objects.exists())
+            delete(name)
+
+        with patch.object(storage, 'delete', delete_and_check):
+            collect_orphaned_images(min_age=0)
+
+        self.assertEqual(rows, [True] * len(variant_names()))
+        self.assertFalse(ImageBlob.objects.exists())
@@ -0,0 +1,142 @@
+'''
+Tests for the orphaned recipe image garbage collector
+'''
+import os
+import shutil
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import ImageJob, Recipe
+from recipe.image_gc import base_image_name, collect_orphaned_images
+from recipe.image_jobs import get_storage
+
+
+OLD = time.time() - 2 * 3600
+
+
+def store_file(name, mtime=OLD):
+    '''Save a file in the image storage with the given modification time'''
+    storage = get_storage()
+    name = storage.save(name, ContentFile(b'data'))
+    os.utime(storage.path(name), (mtime, mtime))
+    return name
+
+
+class ImageGCTests(TestCase):
+    '''Test orphaned image files are removed'''
+
+    def setUp(self):
+        # cada test usa una carpeta de media propia
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.storage = get_storage()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.recipe = Recipe.objects.create(
+            user=self.user,
+            title='Sample recipe',
+            time_minutes=5,
+            price=Decimal('5.00'),
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_base_image_name(self):
+        '''Test variant file names map to their original image'''
+        self.assertEqual(
+            base_image_name('uploads/recipe/a-b_thumbnail.jpg'),
+            'uploads/recipe/a-b.jpg',
+        )
+        self.assertEqual(
+            base_image_name('uploads/recipe/a-b.jpg'),
+            'uploads/recipe/a-b.jpg',
+        )
+
+    def test_orphaned_images_deleted(self):
+        '''Test only old files not used by a recipe are deleted'''
+        used = store_file('uploads/recipe/used.jpg')
+        used_variant = store_file('uploads/recipe/used_thumbnail.jpg')
+        orphan = store_file('uploads/recipe/orphan.jpg')
+        orphan_variant = store_file('uploads/recipe/orphan_medium.jpg')
+        # puede ser de un trabajo que aun no termino
+        recent = store_file('uploads/recipe/recent.jpg', mtime=time.time())
+        Recipe.objects.filter(id=self.recipe.id).update(image=used)
+
+        report = collect_orphaned_images(batch_size=2)
+
+        self.assertEqual(report.scanned, 5)
+        self.assertEqual(report.referenced, 2)
+        self.assertEqual(report.recent, 1)
+        self.assertEqual(report.orphaned, 2)
+        self.assertEqual(report.freed_bytes, 8)
+        for name in (used, used_variant, recent):
+            self.assertTrue(self.storage.exists(name))
+        for name in (orphan, orphan_variant):
+            self.assertFalse(self.storage.exists(name))
+
+    def test_dry_run_keeps_files(self):
+        '''Test a dry run reports orphans without deleting them'''
+        orphan = store_file('uploads/recipe/orphan.jpg')
+        out = StringIO()
+
+        call_command(
+            'collect_orphaned_images', '--dry-run', verbosity=2, stdout=out)
+
+        self.assertTrue(self.storage.exists(orphan))
+        self.assertIn(orphan, out.getvalue())
+        self.assertIn('Would delete 1 files', out.getvalue())
+
+    def test_staged_uploads_without_job_deleted(self):
+        '''Test staged uploads are kept only while their job is queued'''
+        queued = store_file('uploads/incoming/queued.jpg')
+        abandoned = store_file('uploads/incoming/abandoned.jpg')
+        ImageJob.objects.create(recipe=self.recipe, upload=queued)
+        ImageJob.objects.create(
+            recipe=self.recipe,
+            upload=abandoned,
+            status=ImageJob.Status.DONE,
+        )
+
+        report = collect_orphaned_images()
+
+        self.assertEqual(report.orphaned, 1)
+        self.assertTrue(self.storage.exists(queued))
+        self.assertFalse(self.storage.exists(abandoned))
+
+    def test_recipe_delete_removes_files(self):
+        '''Test deleting a recipe deletes its image and variants'''
+        image = store_file('uploads/recipe/image.jpg')
+        variant = store_file('uploads/recipe/image_thumbnail.jpg')
+        Recipe.objects.filter(id=self.recipe.id).update(image=image)
+        self.recipe.refresh_from_db()
+
+        # los archivos se borran cuando la transaccion hace commit
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+
+        self.assertFalse(self.storage.exists(image))
+        self.assertFalse(self.storage.exists(variant))
+
+    @override_settings(RECIPE_IMAGE_DELETE_FILES=False)
+    def test_recipe_delete_keeps_files_when_disabled(self):
+        '''Test the delete hook can be turned off'''
+        image = store_file('uploads/recipe/image.jpg')
+        Recipe.objects.filter(id=self.recipe.id).update(image=image)
+        self.recipe.refresh_from_db()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+
+        self.assertTrue(self.storage.exists(image))
@@ -0,0 +1,246 @@
+'''
+Tests for the recipe bulk import
+'''
+import json
+import os
+import tempfile
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+from recipe.importer import INVALID_UTF8, import_recipes, parse_rows
+
+
+IMPORT_URL = reverse('recipe:recipe-import-recipes')
+EXPORT_URL = reverse('recipe:recipe-export')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def ndjson(*records):
+    return ''.join(json.dumps(record) + '\n' for record in records)
+
+
+def results(res):
+    '''Return the parsed result lines of a streamed response'''
+    body = b''.join(res.streaming_content).decode()
+    return [json.loads(line) for line in body.splitlines()]
+
+
+class ImportApiTests(TestCase):
+    '''Test importing recipes through the API'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def post(self, body, content_type='application/x-ndjson'):
+        return self.client.post(IMPORT_URL, body, content_type=content_type)
+
+    def test_import_ndjson(self):
+        '''Test importing recipes with new and existing tags'''
+        Tag.objects.create(user=self.user, name='Vegan')
+        body = ndjson(
+            {
+                'title': 'Curry',
+                'time_minutes': 30,
+                'price': '7.50',
+                'tags': [{'name': 'Vegan'}, {'name': 'Dinner'}],
+                'ingredients': [{'name': 'Rice'}],
+            },
+            {'title': 'Soup', 'time_minutes': 10, 'price': '2.00'},
+        )
+
+        res = self.post(body)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = results(res)
+        self.assertEqual([r['status'] for r in lines], ['created'] * 2)
+        self.assertEqual([r['line'] for r in lines], [1, 2])
+        curry = Recipe.objects.get(id=lines[0]['id'])
+        self.assertEqual(curry.user, self.user)
+        self.assertEqual(curry.price, Decimal('7.50'))
+        self.assertEqual(
+            sorted(curry.tags.values_list('name', flat=True)),
+            ['Dinner', 'Vegan'],
+        )
+        self.assertEqual(curry.ingredients.get().name, 'Rice')
+        # el tag existente se reutiliza
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_import_reports_invalid_rows(self):
+        '''Test invalid rows are reported and valid rows are created'''
+        body = (
+            '{not json}\n'
+            + ndjson({'time_minutes': 5, 'price': '1.00'})
+            + ndjson({'title': 'Toast', 'time_minutes': 5, 'price': '1.00'})
+        )
+
+        res = self.post(body)
+
+        lines = sorted(results(res), key=lambda r: r['line'])
+        self.assertEqual(
+            [r['status'] for r in lines], ['error', 'error', 'created'])
+        self.assertIn('title', lines[1]['errors'])
+        self.assertEqual(
+            list(Recipe.objects.values_list('title', flat=True)), ['Toast'])
+
+    def test_import_csv(self):
+        '''Test importing recipes from CSV'''
+        body = (
+            'title,time_minutes,price,tags,ingredients\n'
+            '"Rice, fried",15,3.00,Asian|Quick,Rice\n'
+        )
+
+        res = self.post(body, content_type='text/csv')
+
+        self.assertEqual(results(res)[0]['status'], 'created')
+        recipe = Recipe.objects.get()
+        self.assertEqual(recipe.title, 'Rice, fried')
+        self.assertEqual(
+            sorted(recipe.tags.values_list('name', flat=True)),
+            ['Asian', 'Quick'],
+        )
+
+    def test_import_invalid_utf8(self):
+        '''Test a line with invalid UTF-8 is reported as an error row'''
+        body = (
+            ndjson({'title': 'Curry', 'time_minutes': 5, 'price': '1.00'})
+            .encode()
+            + b'{"title": "Caf\xe9", "time_minutes": 5, "price": "1.00"}\n'
+            + ndjson({'title': 'Toast', 'time_minutes': 5, 'price': '1.00'})
+            .encode()
+        )
+
+        res = self.post(body)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = sorted(results(res), key=lambda r: r['line'])
+        self.assertEqual(
+            [r['status'] for r in lines], ['created', 'error', 'created'])
+        self.assertEqual(
+            lines[1]['errors'], {'non_field_errors': [INVALID_UTF8]})
+
+    def test_import_invalid_utf8_csv(self):
+        '''Test a CSV row with invalid UTF-8 is reported as an error row'''
+        body = (
+            b'title,time_minutes,price\n'
+            b'Caf\xe9,5,1.00\n'
+            b'"Toast\nwith jam",5,1.00\n'
+        )
+
+        res = self.post(body, content_type='text/csv')
+
+        lines = sorted(results(res), key=lambda r: r['line'])
+        self.assertEqual(
+            [(r['line'], r['status']) for r in lines],
+            [(2, 'error'), (4, 'created')],
+        )
+
+    def test_import_content_type_parameters(self):
+        '''Test the Content-Type is matched without its parameters'''
+        body = ndjson({'title': 'Toast', 'time_minutes': 5, 'price': '1.00'})
+
+        res = self.post(
+            body, content_type='application/x-ndjson; charset=utf-8')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(results(res)[0]['status'], 'created')
+
+    def test_import_unsupported_media_type(self):
+        '''Test other content types are rejected'''
+        res = self.post('<recipes/>', content_type='application/xml')
+
+        self.assertEqual(
+            res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_import_invalidates_list_cache(self):
+        '''Test imported recipes appear in a previously cached list'''
+        self.client.get(RECIPES_URL)
+
+        results(self.post(ndjson(
+            {'title': 'Toast', 'time_minutes': 5, 'price': '1.00'})))
+
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_export_import_round_trip(self):
+        '''Test an export of a user can be imported by another one'''
+        for export_format, content_type in (
+                ('ndjson', 'application/x-ndjson'), ('csv', 'text/csv')):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Curry {export_format}',
+                time_minutes=30, price=Decimal('7.50'),
+            )
+            recipe.ingredients.add(Ingredient.objects.get_or_create(
+                user=self.user, name='Rice')[0])
+            res = self.client.get(
+                EXPORT_URL, {'export_format': export_format})
+            body = b''.join(res.streaming_content).decode()
+            recipe.delete()
+            other = get_user_model().objects.create_user(
+                f'{export_format}@example.com', 'testpass123')
+            self.client.force_authenticate(other)
+
+            res = self.post(body, content_type=content_type)
+
+            self.assertEqual(results(res)[0]['status'], 'created')
+            imported = Recipe.objects.get(user=other)
+            self.assertEqual(imported.title, f'Curry {export_format}')
+            self.assertEqual(imported.ingredients.get().user, other)
+            self.client.force_authenticate(self.user)
+
+
+class ImportBatchTests(TestCase):
+    '''Test rows are inserted in batches'''
+
+    def test_batches(self):
+        '''Test every row is inserted whatever the batch size'''
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        lines = [
+            json.dumps({
+                'title': f'Recipe {i}', 'time_minutes': 5, 'price': '1.00',
+                'tags': [{'name': f'Tag {i % 2}'}],
+            })
+            for i in range(5)
+        ]
+
+        created = list(import_recipes(
+            user, parse_rows(lines, 'ndjson'), batch_size=2))
+
+        self.assertEqual(len(created), 5)
+        self.assertEqual(Recipe.objects.filter(user=user).count(), 5)
+        self.assertEqual(Tag.objects.filter(user=user).count(), 2)
+        self.assertEqual(
+            Recipe.tags.through.objects.filter(recipe__user=user).count(), 5)
+
+
+class ImportCommandTests(TestCase):
+    '''Test the import_recipes command'''
+
+    def test_import_file(self):
+        '''Test the command imports a file for the user'''
+        user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123')
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'recipes.csv')
+            with open(path, 'w', newline='') as import_file:
+                import_file.write('title,time_minutes,price\nToast,5,1.00\n')
+
+            call_command('import_recipes', user.email, path, stdout=out)
+
+        self.assertEqual(Recipe.objects.get(user=user).title, 'Toast')
+        self.assertIn('Imported 1 recipes, 0 rows with errors', out.getvalue())
@@ -0,0 +1,180 @@
+'''
+Tests for the number of database queries made by the recipe APIs
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+MANY_URL = reverse('recipe:recipe-retrieve-many')
+
+# *numero de consultas esperadas por endpoint, si un cambio en las vistas
+# o los serializadores modifica estos valores hay que revisarlo aqui
+EXPECTED_QUERIES = {
+    # validadores del GET condicional (un aggregate), recetas, tags e
+    # ingredientes (una consulta por relacion)
+    'recipe-list': 4,
+    # validadores y las columnas pedidas, sin cargar relaciones
+    'recipe-list-compact': 2,
+    # validadores, recetas y tags
+    'recipe-list-tags-only': 3,
+    'recipe-detail': 4,
+    # validadores, las recetas pedidas, tags e ingredientes
+    'recipe-many': 4,
+    'tag-list': 2,
+    'ingredient-list': 2,
+    # insert de la receta, por relacion: nombres existentes, insert de los
+    # nuevos, consulta de los nuevos, relaciones existentes, insert de las
+    # relaciones, updated_at de los dos lados y el contador de recetas, y la
+    # lectura de las relaciones para la respuesta
+    'recipe-create': 19,
+    # la receta con sus relaciones, el tag existente, las relaciones actuales,
+    # el update de la receta y la lectura de las relaciones para la respuesta
+    'recipe-update': 8,
+}
+
+
+def detail_url(recipe_id):
+    '''Create and return a recipe detail URL'''
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipes(user, count):
+    '''Create recipes with a tag and an ingredient each'''
+    recipes = []
+    for i in range(count):
+        recipe = Recipe.objects.create(
+            user=user,
+            title=f'Recipe {i}',
+            time_minutes=10,
+            price=Decimal('5.00'),
+        )
+        tag, _ = Tag.objects.get_or_create(user=user, name=f'Tag {i}')
+        ingredient, _ = Ingredient.objects.get_or_create(
+            user=user, name=f'Ingredient {i}')
+        recipe.tags.add(tag)
+        recipe.ingredients.add(ingredient)
+        recipes.append(recipe)
+    return recipes
+
+
+class QueryCountTests(TestCase):
+    '''Test the recipe API endpoints make a fixed number of queries'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertEndpointQueries(self, endpoint, url, params=None):
+        '''Assert the endpoint makes the expected number of queries'''
+        with self.assertNumQueries(EXPECTED_QUERIES[endpoint]):
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res
+
+    def test_recipe_list_queries_do_not_grow(self):
+        '''Test listing recipes does not make a query per recipe'''
+        create_recipes(self.user, 1)
+        self.assertEndpointQueries('recipe-list', RECIPES_URL)
+        # con mas recetas el numero de consultas debe ser el mismo
+        create_recipes(self.user, 10)
+        self.assertEndpointQueries('recipe-list', RECIPES_URL)
+
+    def test_recipe_list_compact_queries(self):
+        '''Test the compact list only selects the id and title'''
+        create_recipes(self.user, 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.assertEndpointQueries(
+                'recipe-list-compact', RECIPES_URL, {'compact': 1})
+
+        self.assertEqual(len(res.data['results']), 5)
+        self.assertNotIn('description', queries[-1]['sql'])
+        self.assertNotIn('price', queries[-1]['sql'])
+
+    def test_recipe_list_expand_queries(self):
+        '''Test relations left out of expand are not loaded'''
+        create_recipes(self.user, 5)
+
+        self.assertEndpointQueries(
+            'recipe-list-tags-only', RECIPES_URL, {'expand': 'tags'})
+
+    def test_recipe_detail_queries(self):
+        '''Test retrieving a recipe loads relations in fixed queries'''
+        recipe = create_recipes(self.user, 1)[0]
+        self.assertEndpointQueries('recipe-detail', detail_url(recipe.id))
+
+    def test_recipe_many_queries_do_not_grow(self):
+        '''Test retrieving several recipes does not make a query per recipe'''
+        recipes = create_recipes(self.user, 10)
+        for count in (1, 10):
+            ids = ','.join(str(recipe.id) for recipe in recipes[:count])
+            res = self.assertEndpointQueries(
+                'recipe-many', MANY_URL, {'ids': ids})
+            self.assertEqual(len(res.data['results']), count)
+
+    def test_tag_list_queries(self):
+        '''Test listing tags makes a single query'''
+        create_recipes(self.user, 5)
+        self.assertEndpointQueries('tag-list', TAGS_URL)
+
+    def test_ingredient_list_queries(self):
+        '''Test listing ingredients makes a single query'''
+        create_recipes(self.user, 5)
+        self.assertEndpointQueries('ingredient-list', INGREDIENTS_URL)
+
+    def test_recipe_create_queries_do_not_grow(self):
+        '''Test nested tags and ingredients are written in bulk'''
+        for count in (2, 40):
+            payload = {
+                'title': f'Recipe with {count} ingredients',
+                'time_minutes': 30,
+                'price': Decimal('5.00'),
+                'tags': [{'name': f'Tag {i}'} for i in range(count)],
+                'ingredients': [
+                    {'name': f'Ingredient {i}'} for i in range(count)],
+            }
+            with self.assertNumQueries(EXPECTED_QUERIES['recipe-create']):
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(len(res.data['ingredients']), count)
+
+    def test_recipe_update_unchanged_tags_does_not_write(self):
+        '''Test updating with the same tags does not rewrite relations'''
+        recipe = create_recipes(self.user, 1)[0]
+        tag = recipe.tags.get()
+        payload = {'tags': [{'name': tag.name}]}
+
+        # no se borra ni se inserta ninguna relacion
+        with self.assertNumQueries(EXPECTED_QUERIES['recipe-update']):
+            res = self.client.patch(
+                detail_url(recipe.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe.tags.all()), [tag])
+
+    def test_recipe_list_cached(self):
+        '''Test a repeated list request is served from the cache'''
+        create_recipes(self.user, 2)
+        self.client.get(RECIPES_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.data['results']), 2)
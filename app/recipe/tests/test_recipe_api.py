@@ -1,20 +1,29 @@
 '''
 Tests for recipe APIs
 '''
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 import tempfile
 import os
+from unittest.mock import patch
 from PIL import Image
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageJob, Recipe, Tag, Ingredient
 
+from recipe import image_jobs
+from recipe.images import delete_image_files, variant_name
+from recipe.pagination import RecipeCursorPagination
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 # *definimos las urls a las que se van a hacer las peticiones
@@ -32,6 +41,13 @@ def image_upload_url(recipe_id):
     return reverse('recipe:recipe-upload-image', args=[recipe_id])
 
 
+def process_image_jobs():
+    '''Process the queued image uploads like the worker does'''
+    # la imagen anterior se borra cuando la transaccion hace commit
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        call_command('process_image_jobs', '--once', stdout=StringIO())
+
+
 # *definimos el metodo para crear la receta
 def create_recipe(user, **params):
     '''Create and return a sample recipe'''
@@ -102,7 +118,7 @@ class PrivateRecipeApiTests(TestCase):
         # comprobamos la ejecucion de la peticion HTTP
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         # comparamos los resultados de las dos consultas
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_list_limit_to_user(self):
         '''Test list of recipes is limited to authenticated user'''
@@ -123,7 +139,7 @@ class PrivateRecipeApiTests(TestCase):
         # comprobamos la peticion
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         # comprobamos que las consultas den el mismo resultado
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_get_recipe_detail(self):
         '''Test get recipe detail'''
@@ -553,9 +569,9 @@ class PrivateRecipeApiTests(TestCase):
         # chequeamos que en los datos que devuelve la peticion esten contenidos los datos
         # de la primera y la segunda recetas y no los de la tercera que es la que no tiene
         # las etiquetas
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
 
     def test_filter_by_ingredients(self):
         '''Tests filtering recipes by ingredients'''
@@ -582,9 +598,217 @@ class PrivateRecipeApiTests(TestCase):
         # chequeamos que en los datos que devuelve la peticion esten contenidos los datos
         # de la primera y la segunda recetas y no los de la tercera que es la que no tiene
         # los ingredientes
-        self.assertIn(s1.data, res.data)
-        self.assertIn(s2.data, res.data)
-        self.assertNotIn(s3.data, res.data)
+        self.assertIn(s1.data, res.data['results'])
+        self.assertIn(s2.data, res.data['results'])
+        self.assertNotIn(s3.data, res.data['results'])
+
+    def test_filter_by_tags_match_all(self):
+        '''Test filtering recipes having all the given tags'''
+        r1 = create_recipe(user=self.user, title='Vegan Curry')
+        r2 = create_recipe(user=self.user, title='Vegan Salad')
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        r1.tags.add(tag1, tag2)
+        r2.tags.add(tag1)
+        params = {'tags': f'{tag1.id},{tag2.id}', 'tags_mode': 'all'}
+
+        res = self.client.get(RECIPES_URL, params)
+
+        # solo la receta que tiene las dos etiquetas coincide
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_by_tags_and_ingredients_unique(self):
+        '''Test a recipe matching several filters is listed once'''
+        recipe = create_recipe(user=self.user)
+        tag1 = Tag.objects.create(user=self.user, name='Vegan')
+        tag2 = Tag.objects.create(user=self.user, name='Spicy')
+        ingredient = Ingredient.objects.create(user=self.user, name='Rice')
+        recipe.tags.add(tag1, tag2)
+        recipe.ingredients.add(ingredient)
+        params = {
+            'tags': f'{tag1.id},{tag2.id}',
+            'ingredients': f'{ingredient.id}',
+        }
+
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+    def test_filter_invalid_mode_error(self):
+        '''Test an unknown filter mode returns an error'''
+        params = {'tags': '1', 'tags_mode': 'some'}
+
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_recipe_list_paginated_by_cursor(self):
+        '''Test recipes are listed in pages using a cursor'''
+        recipes = [
+            create_recipe(user=self.user, title=f'Recipe {i}')
+            for i in range(5)
+        ]
+        # pedimos la primera pagina con dos recetas
+        res = self.client.get(RECIPES_URL, {'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipes[4].id, recipes[3].id])
+        self.assertIsNone(res.data['previous'])
+        # seguimos el cursor hasta la siguiente pagina
+        res = self.client.get(res.data['next'])
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [recipes[2].id, recipes[1].id])
+
+    def test_recipe_list_page_size_limited(self):
+        '''Test the requested page size is capped to the maximum'''
+        for i in range(3):
+            create_recipe(user=self.user, title=f'Recipe {i}')
+
+        with patch.object(RecipeCursorPagination, 'max_page_size', 2):
+            res = self.client.get(RECIPES_URL, {'page_size': 100})
+
+        self.assertEqual(len(res.data['results']), 2)
+        self.assertIsNotNone(res.data['next'])
+
+    def test_filter_by_time_and_price_range(self):
+        '''Test filtering recipes by maximum time and price'''
+        quick = create_recipe(
+            user=self.user, time_minutes=20, price=Decimal('8.00'))
+        create_recipe(user=self.user, time_minutes=45, price=Decimal('8.00'))
+        create_recipe(user=self.user, time_minutes=20, price=Decimal('12.50'))
+        params = {'time_minutes__lte': 30, 'price__lte': '10'}
+
+        res = self.client.get(RECIPES_URL, params)
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [quick.id])
+
+    def test_filter_by_range_and_tags(self):
+        '''Test the range filters can be combined with the tags filter'''
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        r1 = create_recipe(user=self.user, time_minutes=60)
+        r2 = create_recipe(user=self.user, time_minutes=10)
+        create_recipe(user=self.user, time_minutes=90)
+        r1.tags.add(tag)
+        r2.tags.add(tag)
+
+        res = self.client.get(
+            RECIPES_URL, {'tags': str(tag.id), 'time_minutes__gte': 30})
+
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r1.id])
+
+    def test_filter_invalid_range_error(self):
+        '''Test a range limit that is not a number returns an error'''
+        for params in [{'time_minutes__lte': 'soon'}, {'price__gte': 'NaN'}]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering_by_price(self):
+        '''Test sorting recipes by price with the id breaking ties'''
+        r1 = create_recipe(user=self.user, price=Decimal('9.00'))
+        r2 = create_recipe(user=self.user, price=Decimal('3.50'))
+        r3 = create_recipe(user=self.user, price=Decimal('9.00'))
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'price'})
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r2.id, r1.id, r3.id])
+
+        res = self.client.get(RECIPES_URL, {'ordering': '-price'})
+        ids = [recipe['id'] for recipe in res.data['results']]
+        self.assertEqual(ids, [r3.id, r1.id, r2.id])
+
+    def test_ordering_by_time_paginated(self):
+        '''Test the cursor follows the requested ordering'''
+        recipes = [
+            create_recipe(user=self.user, time_minutes=minutes)
+            for minutes in [40, 10, 30, 10, 20]
+        ]
+        expected = [r.id for r in sorted(
+            recipes, key=lambda r: (r.time_minutes, r.id))]
+
+        ids = []
+        url, params = RECIPES_URL, {'ordering': 'time_minutes', 'page_size': 2}
+        while url:
+            res = self.client.get(url, params)
+            ids += [recipe['id'] for recipe in res.data['results']]
+            url, params = res.data['next'], None
+
+        self.assertEqual(ids, expected)
+
+    def test_list_sparse_fields(self):
+        '''Test the list returns only the requested fields'''
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+        res = self.client.get(RECIPES_URL, {'fields': 'title,tags,id'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{
+            'id': recipe.id,
+            'title': recipe.title,
+            'tags': [{'id': recipe.tags.get().id, 'name': 'Vegan'}],
+        }])
+
+    def test_list_expand_relations(self):
+        '''Test relations not in expand are left out of the list'''
+        recipe = create_recipe(user=self.user)
+        recipe.ingredients.add(
+            Ingredient.objects.create(user=self.user, name='Rice'))
+
+        res = self.client.get(RECIPES_URL, {'expand': 'ingredients'})
+
+        result = res.data['results'][0]
+        self.assertNotIn('tags', result)
+        self.assertEqual(result['ingredients'][0]['name'], 'Rice')
+        self.assertEqual(result['price'], str(recipe.price))
+
+        res = self.client.get(RECIPES_URL, {'expand': ''})
+
+        self.assertNotIn('ingredients', res.data['results'][0])
+
+    def test_list_compact(self):
+        '''Test the compact list returns only ids and titles'''
+        r1 = create_recipe(user=self.user, title='Soup', price=Decimal('3'))
+        r2 = create_recipe(user=self.user, title='Curry', price=Decimal('9'))
+
+        res = self.client.get(
+            RECIPES_URL, {'compact': 1, 'ordering': '-price', 'page_size': 1})
+
+        self.assertEqual(
+            res.data['results'], [{'id': r2.id, 'title': 'Curry'}])
+        # el cursor funciona aunque el precio no se devuelva
+        res = self.client.get(res.data['next'])
+        self.assertEqual(res.data['results'], [{'id': r1.id, 'title': 'Soup'}])
+
+    def test_list_compact_flag_values(self):
+        '''Test compact accepts true/false and rejects other values'''
+        recipe = create_recipe(user=self.user, title='Soup')
+
+        res = self.client.get(RECIPES_URL, {'compact': 'true'})
+        self.assertEqual(
+            res.data['results'], [{'id': recipe.id, 'title': 'Soup'}])
+        res = self.client.get(RECIPES_URL, {'compact': 'false'})
+        self.assertIn('price', res.data['results'][0])
+        res = self.client.get(RECIPES_URL, {'compact': 'yes'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_unknown_fields_error(self):
+        '''Test asking for unknown fields or relations returns an error'''
+        for params in [{'fields': 'title,user'}, {'expand': 'image'}]:
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering_unknown_field_error(self):
+        '''Test sorting by a field not in the whitelist returns an error'''
+        for ordering in ['title', '--price', 'user']:
+            res = self.client.get(RECIPES_URL, {'ordering': ordering})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
 
 class ImageUploadTests(TestCase):
@@ -605,7 +829,10 @@ class ImageUploadTests(TestCase):
     # ejecuta antes. se pone para asegurarse que la imagen se borra
     # despues de cada test
     def tearDown(self):
-        self.recipe.image.delete()
+        # se borran tambien las variantes de la imagen
+        if self.recipe.image:
+            delete_image_files(
+                self.recipe.image.storage, self.recipe.image.name)
 
     def test_upload_image(self):
         '''Test uploading a image to a recipe'''
@@ -624,12 +851,16 @@ class ImageUploadTests(TestCase):
             # se realiza la peticion, especificando formulario 'multipart'
             # que es la forma recomendada para subir imagenes
             res = self.client.post(url, payload, format='multipart')
-        # refrescamos la base de datos
-        self.recipe.refresh_from_db()
-        # comprobamos la peticion
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # comprobamos la peticion, la imagen queda en cola para procesarse
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
         # chequeamos que hay un campo 'image' en la respuesta de la peticion
         self.assertIn('image', res.data)
+        self.assertEqual(res.data['image_status'], 'pending')
+        # procesamos la cola como lo haria el worker
+        process_image_jobs()
+        # refrescamos la base de datos
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'ready')
         # chequeamos que hay un atributo 'path' en la consulta a la base de datos
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
@@ -641,3 +872,213 @@ class ImageUploadTests(TestCase):
         res = self.client.post(url, payload, format='multipart')
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_image_bad_extension(self):
+        '''Test an image with an extension that is not of images fails'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.html') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='PNG')
+            image_file.seek(0)
+            res = self.client.post(
+                url, {'image': image_file}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageJob.objects.exists())
+
+    def test_image_name_from_format(self):
+        '''Test the stored image takes the extension of its format'''
+        url = image_upload_url(self.recipe.id)
+        # el contenido es JPEG aunque el nombre diga PNG
+        with tempfile.NamedTemporaryFile(suffix='.png') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+        process_image_jobs()
+
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith('.jpg'))
+
+    def test_converted_image_stored_as_jpeg(self):
+        '''Test a GIF is re-encoded as JPEG and named .jpg'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.gif') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='GIF')
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+        process_image_jobs()
+
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+        self.assertTrue(name.endswith('.jpg'))
+        for variant in ('original', 'thumbnail'):
+            with self.recipe.image.storage.open(
+                    variant_name(name, variant)) as f:
+                self.assertEqual(Image.open(f).format, 'JPEG')
+
+    def test_upload_image_creates_variants(self):
+        '''Test uploading an image stores resized variants without EXIF'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            img = Image.new('RGB', (1200, 600))
+            # agregamos metadatos EXIF para comprobar que se eliminan
+            exif = Image.Exif()
+            exif[0x010e] = 'Secret description'
+            img.save(image_file, format='JPEG', exif=exif.tobytes())
+            image_file.seek(0)
+            res = self.client.post(
+                url, {'image': image_file}, format='multipart')
+        process_image_jobs()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        name = self.recipe.image.name
+        storage = self.recipe.image.storage
+        with storage.open(variant_name(name, 'thumbnail')) as f:
+            thumbnail = Image.open(f)
+            self.assertEqual(thumbnail.size, (200, 100))
+        with storage.open(name) as f:
+            original = Image.open(f)
+            self.assertEqual(original.size, (1200, 600))
+            self.assertNotIn('exif', original.info)
+
+    def test_image_variant_urls_in_responses(self):
+        '''Test the detail and list responses include variant URLs'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(url, {'image': image_file}, format='multipart')
+        process_image_jobs()
+        self.recipe.refresh_from_db()
+
+        res = self.client.get(detail_url(self.recipe.id))
+        variants = res.data['image_variants']
+        self.assertEqual(set(variants), {'thumbnail', 'medium', 'original'})
+        self.assertTrue(variants['thumbnail'].endswith(
+            variant_name(self.recipe.image.name, 'thumbnail')))
+
+        res = self.client.get(RECIPES_URL, {'thumbnail': 1})
+        self.assertEqual(res.data['results'][0]['thumbnail'],
+                         variants['thumbnail'])
+        res = self.client.get(RECIPES_URL)
+        self.assertNotIn('thumbnail', res.data['results'][0])
+        res = self.client.get(RECIPES_URL, {'thumbnail': 'true'})
+        self.assertIn('thumbnail', res.data['results'][0])
+        res = self.client.get(RECIPES_URL, {'thumbnail': 'yes'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_invalid_image_fails_in_worker(self):
+        '''Test a file that is not an image is marked as failed'''
+        url = image_upload_url(self.recipe.id)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            image_file.write(b'not an image')
+            image_file.seek(0)
+            res = self.client.post(
+                url, {'image': image_file}, format='multipart')
+        process_image_jobs()
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
+        self.assertFalse(self.recipe.image)
+        job = ImageJob.objects.get(recipe=self.recipe)
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+        self.assertFalse(
+            self.recipe.image.storage.exists(job.upload))
+
+    def test_replacing_image_deletes_previous_files(self):
+        '''Test processing a new image removes the previous one'''
+        url = image_upload_url(self.recipe.id)
+        names = []
+        for _ in range(2):
+            with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+                Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+                image_file.seek(0)
+                self.client.post(
+                    url, {'image': image_file}, format='multipart')
+            process_image_jobs()
+            self.recipe.refresh_from_db()
+            names.append(self.recipe.image.name)
+
+        storage = self.recipe.image.storage
+        self.assertFalse(storage.exists(names[0]))
+        self.assertFalse(storage.exists(variant_name(names[0], 'thumbnail')))
+        self.assertTrue(storage.exists(names[1]))
+
+    def upload_image(self):
+        '''Queue a valid image for the recipe'''
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as image_file:
+            Image.new('RGB', (10, 10)).save(image_file, format='JPEG')
+            image_file.seek(0)
+            self.client.post(
+                image_upload_url(self.recipe.id), {'image': image_file},
+                format='multipart')
+
+    def test_update_does_not_overwrite_processed_image(self):
+        '''Test saving a recipe read before the worker keeps the image'''
+        stale = Recipe.objects.get(id=self.recipe.id)
+        self.upload_image()
+        process_image_jobs()
+
+        serializer = RecipeDetailSerializer(
+            stale, data={'title': 'New title'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.title, 'New title')
+        self.assertEqual(self.recipe.image_status, 'ready')
+        self.assertTrue(self.recipe.image.storage.exists(
+            self.recipe.image.name))
+
+    def test_recipe_deleted_while_processing(self):
+        '''Test a recipe deleted during its job does not stop the worker'''
+        self.upload_image()
+        store_image = image_jobs.store_image
+        stored = []
+
+        def store_and_delete(storage, recipe, upload_name):
+            stored.append(store_image(storage, recipe, upload_name))
+            Recipe.objects.filter(id=recipe.id).delete()
+            return stored[0]
+
+        with patch('recipe.image_jobs.store_image', store_and_delete):
+            process_image_jobs()
+
+        storage = Recipe._meta.get_field('image').storage
+        self.assertFalse(storage.exists(stored[0]))
+        self.assertFalse(ImageJob.objects.exists())
+        self.recipe.image = None
+
+    def test_crashing_job_retried_then_failed(self):
+        '''Test an unexpected error is retried up to the maximum attempts'''
+        self.upload_image()
+
+        with patch('recipe.image_jobs.process_job',
+                   side_effect=RuntimeError('crash')) as process_job:
+            process_image_jobs()
+
+        self.assertEqual(
+            process_job.call_count, settings.IMAGE_JOB_MAX_ATTEMPTS)
+        job = ImageJob.objects.get(recipe=self.recipe)
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+        self.assertEqual(job.error, 'crash')
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
+
+    def test_stale_job_failed_after_max_attempts(self):
+        '''Test an abandoned job is not claimed again without limit'''
+        self.upload_image()
+        ImageJob.objects.update(
+            status=ImageJob.Status.PROCESSING,
+            attempts=settings.IMAGE_JOB_MAX_ATTEMPTS,
+            updated_at=timezone.now() - timedelta(
+                seconds=settings.IMAGE_JOB_TIMEOUT + 1),
+        )
+
+        self.assertIsNone(image_jobs.claim_next_job())
+
+        job = ImageJob.objects.get(recipe=self.recipe)
+        self.assertEqual(job.status, ImageJob.Status.FAILED)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, 'failed')
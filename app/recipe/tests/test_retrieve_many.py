@@ -0,0 +1,117 @@
+'''
+Tests for retrieving the detail of several recipes in one request
+'''
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from recipe.serializers import RecipeDetailSerializer
+
+
+MANY_URL = reverse('recipe:recipe-retrieve-many')
+
+
+def create_recipe(user, title='Sample recipe', tags=()):
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+    for name in tags:
+        recipe.tags.add(Tag.objects.get_or_create(user=user, name=name)[0])
+    return recipe
+
+
+class RetrieveManyApiTests(TestCase):
+    '''Test retrieving recipes by a list of ids'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_auth_required(self):
+        '''Test auth is required to retrieve recipes'''
+        res = APIClient().get(MANY_URL, {'ids': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_retrieve_many_in_requested_order(self):
+        '''Test the recipes are returned in detail in the requested order'''
+        first = create_recipe(self.user, 'First', tags=['Dinner'])
+        second = create_recipe(self.user, 'Second')
+
+        res = self.client.get(MANY_URL, {'ids': f'{second.id},{first.id}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        serializer = RecipeDetailSerializer([second, first], many=True)
+        self.assertEqual(res.data['results'], serializer.data)
+        self.assertEqual(res.data['missing'], [])
+
+    def test_retrieve_many_ranges(self):
+        '''Test ranges of ids are expanded and repeated ids ignored'''
+        recipes = [create_recipe(self.user, f'Recipe {i}') for i in range(4)]
+        ids = [recipe.id for recipe in recipes]
+
+        res = self.client.get(
+            MANY_URL, {'ids': f'{ids[3]},{ids[0]}-{ids[2]},{ids[0]}'})
+
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']],
+            [ids[3], ids[0], ids[1], ids[2]],
+        )
+
+    def test_retrieve_many_limited_to_user(self):
+        '''Test recipes of other users are reported as missing'''
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        own = create_recipe(self.user)
+        foreign = create_recipe(other)
+
+        res = self.client.get(
+            MANY_URL, {'ids': f'{own.id},{foreign.id},{foreign.id + 100}'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [recipe['id'] for recipe in res.data['results']], [own.id])
+        self.assertEqual(
+            res.data['missing'], [foreign.id, foreign.id + 100])
+
+    def test_retrieve_many_invalid_ids(self):
+        '''Test missing, malformed and reversed ids are rejected'''
+        for ids in ('', 'abc', '5-2', '1-x'):
+            res = self.client.get(MANY_URL, {'ids': ids})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('ids', res.data)
+
+    @override_settings(RECIPE_RETRIEVE_MANY_MAX_IDS=3)
+    def test_retrieve_many_max_ids(self):
+        '''Test requests for too many ids are rejected'''
+        for ids in ('1,2,3,4', '1-4', '1-1000000000'):
+            res = self.client.get(MANY_URL, {'ids': ids})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.get(MANY_URL, {'ids': '1-3'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_many_not_modified(self):
+        '''Test an unchanged set of recipes answers 304'''
+        recipe = create_recipe(self.user)
+        res = self.client.get(MANY_URL, {'ids': str(recipe.id)})
+
+        res = self.client.get(
+            MANY_URL, {'ids': str(recipe.id)},
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
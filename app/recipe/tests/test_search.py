@@ -0,0 +1,124 @@
+'''
+Tests for the recipe full text search
+'''
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def create_recipe(user, title, description='', tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        user=user,
+        title=title,
+        description=description,
+        time_minutes=10,
+        price=Decimal('5.00'),
+    )
+    for name in tags:
+        recipe.tags.add(Tag.objects.get_or_create(user=user, name=name)[0])
+    for name in ingredients:
+        recipe.ingredients.add(
+            Ingredient.objects.get_or_create(user=user, name=name)[0])
+    return recipe
+
+
+class SearchApiTests(TestCase):
+    '''Test searching recipes by text'''
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com',
+            'testpass123',
+        )
+        self.client.force_authenticate(self.user)
+
+    def search(self, term):
+        '''Search recipes and return the titles found'''
+        res = self.client.get(RECIPES_URL, {'search': term})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['title'] for recipe in res.data['results']]
+
+    def create(self, *args, **kwargs):
+        # los vectores de busqueda se actualizan al hacer commit
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_recipe(self.user, *args, **kwargs)
+
+    def test_search_title_and_description(self):
+        '''Test the search matches the title and the description'''
+        self.create('Chicken curry')
+        self.create('Soup', description='A spicy chicken broth')
+        self.create('Chocolate cake')
+
+        self.assertEqual(
+            sorted(self.search('chicken')), ['Chicken curry', 'Soup'])
+
+    def test_search_tags_and_ingredients(self):
+        '''Test the search matches tag and ingredient names'''
+        self.create('Curry', tags=['Vegan'])
+        self.create('Rice bowl', ingredients=['Tofu'])
+        self.create('Steak')
+
+        self.assertEqual(self.search('vegan'), ['Curry'])
+        self.assertEqual(self.search('tofu'), ['Rice bowl'])
+
+    def test_search_all_words(self):
+        '''Test every word of the search must match'''
+        self.create('Chicken curry')
+        self.create('Chicken soup')
+
+        self.assertEqual(self.search('chicken curry'), ['Chicken curry'])
+
+    def test_search_other_users_excluded(self):
+        '''Test only the recipes of the user are found'''
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'testpass123')
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(other, 'Chicken curry')
+
+        self.assertEqual(self.search('chicken'), [])
+
+    def test_search_with_tag_filter(self):
+        '''Test the search can be combined with the tags filter'''
+        curry = self.create('Chicken curry', tags=['Dinner'])
+        self.create('Chicken salad', tags=['Lunch'])
+        tag = curry.tags.get()
+
+        res = self.client.get(
+            RECIPES_URL, {'search': 'chicken', 'tags': str(tag.id)})
+
+        self.assertEqual(
+            [r['title'] for r in res.data['results']], ['Chicken curry'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+    def test_search_ranked(self):
+        '''Test title matches are ranked before description matches'''
+        self.create('Soup', description='Served with curry bread')
+        self.create('Curry')
+
+        self.assertEqual(self.search('curry'), ['Curry', 'Soup'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Needs PostgreSQL')
+    def test_search_after_tag_rename(self):
+        '''Test renaming a tag updates the recipes search vectors'''
+        recipe = self.create('Curry', tags=['Vegan'])
+        tag = recipe.tags.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tag.name = 'Spicy'
+            tag.save()
+
+        self.assertEqual(self.search('spicy'), ['Curry'])
+        self.assertEqual(self.search('vegan'), [])
@@ -103,6 +103,17 @@ class PrivateTagsApiTests(TestCase):
         # comprobamos que la consulta a la base de datos coincida con la informacion
         self.assertEqual(tag.name, payload['name'])
 
+    def test_update_tag_duplicate_name_error(self):
+        '''Test renaming a tag to an existing name returns an error'''
+        Tag.objects.create(user=self.user, name='Dessert')
+        tag = Tag.objects.create(user=self.user, name='After Dinner')
+        url = detail_url(tag.id)
+        res = self.client.patch(url, {'name': 'Dessert'})
+        # comprobamos que no se permite repetir el nombre
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'After Dinner')
+
     def test_delete_tag(self):
         '''Test deleting a tag'''
         # creamos una tag
@@ -155,3 +166,32 @@ class PrivateTagsApiTests(TestCase):
         # comprobamos que la respuesta solo contenga un ingrediente, a pesar de que este asignado a varias
         # recetas
         self.assertEqual(len(res.data), 1)
+
+    def test_tags_recipe_count(self):
+        '''Test the number of recipes is included when requested'''
+        tag1 = Tag.objects.create(user=self.user, name='Breakfast')
+        Tag.objects.create(user=self.user, name='Dinner')
+        for title in ['Pancakes', 'Porridge']:
+            recipe = Recipe.objects.create(
+                title=title, time_minutes=5, price=Decimal('5.00'),
+                user=self.user,
+            )
+            recipe.tags.add(tag1)
+
+        res = self.client.get(TAGS_URL, {'recipe_count': 1})
+
+        self.assertEqual(
+            [(tag['name'], tag['recipe_count']) for tag in res.data],
+            [('Dinner', 0), ('Breakfast', 2)],
+        )
+        # sin el parametro no se incluye
+        res = self.client.get(TAGS_URL)
+        self.assertNotIn('recipe_count', res.data[0])
+
+    def test_tags_recipe_count_invalid(self):
+        '''Test a recipe_count that is not a flag returns an error'''
+        Tag.objects.create(user=self.user, name='Dinner')
+
+        res = self.client.get(TAGS_URL, {'recipe_count': 'yes'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,16 +1,101 @@
 '''
 Views for the recipe API
 '''
+from decimal import Decimal, InvalidOperation
 from typing import Any
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.http import StreamingHttpResponse
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from core.models import Recipe, RecipeCard, Tag, Ingredient
+from recipe import importer, serializers
+from recipe.batch import run_batch
+from recipe.cache import CachedListMixin
+from recipe.cards import CARD_RELATIONS, cards_enabled
+from recipe.conditional import ConditionalGetMixin, ConditionalRetrieveMixin
+from recipe.export import EXPORT_FORMATS, export_lines
+from recipe.fast import FastListMixin
+from user.authentication import CachedTokenAuthentication
+from recipe.autocomplete import filter_autocomplete
+from recipe.pagination import AutocompletePagination, RecipeCursorPagination
+from recipe.search import filter_search
+
+# valores que aceptan los parametros que activan una opcion
+BOOLEAN_PARAMS = {'0': False, '1': True, 'false': False, 'true': True}
+
+
+def _param_to_bool(params, name):
+    '''Return the on/off query parameter name, off when it is missing'''
+    value = params.get(name, '0').strip().lower()
+    if value not in BOOLEAN_PARAMS:
+        raise ValidationError({name: 'Must be one of 0, 1, true or false.'})
+    return BOOLEAN_PARAMS[value]
+
+
+# parametros de filtrado comunes al listado y la exportacion
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        'tags',
+        OpenApiTypes.STR,
+        description='Comma separated list of tags IDs to filter',
+    ),
+    OpenApiParameter(
+        'ingredients',
+        OpenApiTypes.STR,
+        description='Comma separated list of ingredients IDs to filter',
+    ),
+    OpenApiParameter(
+        'search',
+        OpenApiTypes.STR,
+        description=(
+            'Words to find in the title, description, tags or ingredients'
+        ),
+    ),
+    OpenApiParameter(
+        'time_minutes__gte',
+        OpenApiTypes.INT,
+        description='Minimum preparation time in minutes',
+    ),
+    OpenApiParameter(
+        'time_minutes__lte',
+        OpenApiTypes.INT,
+        description='Maximum preparation time in minutes',
+    ),
+    OpenApiParameter(
+        'price__gte',
+        OpenApiTypes.DECIMAL,
+        description='Minimum price',
+    ),
+    OpenApiParameter(
+        'price__lte',
+        OpenApiTypes.DECIMAL,
+        description='Maximum price',
+    ),
+    OpenApiParameter(
+        'tags_mode',
+        OpenApiTypes.STR,
+        enum=['any', 'all'],
+        description='Match recipes with any (default) or all of the tags',
+    ),
+    OpenApiParameter(
+        'ingredients_mode',
+        OpenApiTypes.STR,
+        enum=['any', 'all'],
+        description=(
+            'Match recipes with any (default) or all of the ingredients'
+        ),
+    ),
+]
 
 # usando el decorador @extend_schema_view podemos extender la funcionalidad de la documentacion
 # de drf_spectacular para agregar el filtrado, esto es solo para la documentacion, la aplicacion
@@ -21,21 +106,85 @@ from recipe import serializers
     # se especifica que queremos extender el esquema para el endpoint list
     list=extend_schema(
         # definimos los parametros de filtrado que agregamos a la peticion
-        parameters=[
+        parameters=RECIPE_FILTER_PARAMETERS + [
             OpenApiParameter(
-                'tags',
+                'thumbnail',
+                OpenApiTypes.INT,
+                description='Include the image thumbnail URL (1) or not (0)',
+            ),
+            OpenApiParameter(
+                'fields',
                 OpenApiTypes.STR,
-                description='Comma separated list of tags IDs to filter',
+                description='Comma separated list of fields to return',
             ),
             OpenApiParameter(
-                'ingredients',
+                'expand',
                 OpenApiTypes.STR,
-                description='Comma separated list of ingredients IDs to filter',
+                description=(
+                    'Comma separated list of nested relations to include '
+                    '(tags, ingredients)'
+                ),
+            ),
+            OpenApiParameter(
+                'compact',
+                OpenApiTypes.INT,
+                description=(
+                    'Return only the id and title of the recipes (1) '
+                    'or not (0)'
+                ),
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=[
+                    f'{direction}{field}'
+                    for field in ('id', 'time_minutes', 'price')
+                    for direction in ('', '-')
+                ],
+                description='Sort by this field, descending with a leading -',
             ),
         ]
-    )
+    ),
+    export=extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS + [
+            OpenApiParameter(
+                'export_format',
+                OpenApiTypes.STR,
+                enum=list(EXPORT_FORMATS),
+                description='Export as NDJSON (default) or CSV',
+            ),
+        ],
+        responses={200: OpenApiTypes.STR},
+    ),
+    batch=extend_schema(responses={200: OpenApiTypes.OBJECT}),
+    retrieve_many=extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'ids',
+                OpenApiTypes.STR,
+                required=True,
+                description=(
+                    'Comma separated list of recipe ids or ranges of ids '
+                    '(5-9)'
+                ),
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    ),
+    import_recipes=extend_schema(
+        request={
+            content_type: OpenApiTypes.STR
+            for content_type in importer.IMPORT_FORMATS
+        },
+        responses={200: OpenApiTypes.STR},
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    FastListMixin,
+    ConditionalRetrieveMixin,
+    CachedListMixin,
+    viewsets.ModelViewSet,
+):
     '''View for manage recipe API'''
     # definimos el serializador, se pone el RecipeDetailSerializer porque se usa por
     # Create, Update and Delete mientras que el serializador RecipeSerializer solo
@@ -44,9 +193,18 @@ class RecipeViewSet(viewsets.ModelViewSet):
     # definimos la consulta
     queryset = Recipe.objects.all()
     # establecemos el tipo de autenticacion por tokens
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     # definimos que el usuario debe estar autenticado
     permission_classes = [IsAuthenticated]
+    # el listado se devuelve por paginas usando un cursor sobre el id
+    pagination_class = RecipeCursorPagination
+    # campos por los que el cliente puede ordenar, cada uno tiene un indice
+    # compuesto con el usuario
+    ordering_fields = ['id', 'time_minutes', 'price']
+    # campos que se pueden filtrar por rango y el tipo de sus valores
+    range_filter_fields = {'time_minutes': int, 'price': Decimal}
+    # relaciones que el listado devuelve anidadas, se pueden omitir con expand
+    expandable_fields = ['tags', 'ingredients']
 
     # *configuracion del viewset
     # recibe una cadena de texto que contiene numeros separados por comas
@@ -55,36 +213,238 @@ class RecipeViewSet(viewsets.ModelViewSet):
         '''Convert a list of strings to integers'''
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _params_to_names(self, qs):
+        '''Convert a comma separated string to a list of names'''
+        return [name.strip() for name in qs.split(',') if name.strip()]
+
+    # recibe ids separados por comas o rangos como 5-9 y devuelve la lista
+    # de ids sin repetir en el orden pedido
+    def _params_to_id_list(self, qs):
+        '''Convert a comma separated list of ids and ranges to integers'''
+        limit = settings.RECIPE_RETRIEVE_MANY_MAX_IDS
+        ids = {}
+        for part in self._params_to_names(qs):
+            first, _, last = part.partition('-')
+            try:
+                first = int(first)
+                last = int(last) if last else first
+            except ValueError:
+                raise ValidationError(
+                    {'ids': f'Invalid id or range: {part}.'})
+            if first > last:
+                raise ValidationError(
+                    {'ids': f'Invalid id or range: {part}.'})
+            # se comprueba el tamano del rango antes de recorrerlo
+            if last - first >= limit:
+                raise ValidationError({
+                    'ids': f'Ensure this field has no more than {limit} ids.'
+                })
+            ids.update(dict.fromkeys(range(first, last + 1)))
+            if len(ids) > limit:
+                raise ValidationError({
+                    'ids': f'Ensure this field has no more than {limit} ids.'
+                })
+        if not ids:
+            raise ValidationError({'ids': 'This field is required.'})
+        return list(ids)
+
+    # filtra las recetas relacionadas con los ids usando subconsultas sobre la
+    # tabla intermedia en lugar de un join, asi no hacen falta filas repetidas
+    # ni distinct sobre toda la fila de la receta
+    def _filter_by_relation(self, queryset, field, column, ids, mode):
+        '''Filter recipes linked to any or all of ids through field'''
+        if mode not in ('any', 'all'):
+            raise ValidationError(
+                {f'{field}_mode': 'Must be one of: any, all.'})
+        if queryset.model is RecipeCard and connection.vendor == 'postgresql':
+            # las tarjetas guardan los id en un array jsonb con indice GIN,
+            # el filtro no sale de la tabla
+            lookup = f'{CARD_RELATIONS[field]}__contains'
+            if mode == 'all':
+                return queryset.filter(**{lookup: ids})
+            return queryset.filter(
+                reduce(or_, [Q(**{lookup: [obj_id]}) for obj_id in ids]))
+        # tabla intermedia de la relacion many to many
+        through = Recipe._meta.get_field(field).remote_field.through
+        links = through.objects.filter(**{f'{column}__in': ids})
+        if mode == 'all':
+            # agrupamos por receta y nos quedamos con las que tienen todos
+            # los ids
+            matching = (
+                links.values('recipe_id')
+                .annotate(matches=Count(column))
+                .filter(matches=len(set(ids)))
+                .values('recipe_id')
+            )
+            return queryset.filter(id__in=matching)
+        # EXISTS se detiene en la primera relacion que encuentra
+        return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
+
+    # filtra por los parametros campo__gte y campo__lte recibidos
+    def _filter_by_range(self, queryset, params):
+        '''Filter recipes by the minimum and maximum values in params'''
+        for field, convert in self.range_filter_fields.items():
+            for lookup in ('gte', 'lte'):
+                name = f'{field}__{lookup}'
+                if name not in params:
+                    continue
+                try:
+                    value = convert(params[name])
+                except (ValueError, InvalidOperation):
+                    raise ValidationError({name: 'Must be a number.'})
+                # Decimal acepta NaN e Infinity, que no sirven como limite
+                if isinstance(value, Decimal) and not value.is_finite():
+                    raise ValidationError({name: 'Must be a number.'})
+                queryset = queryset.filter(**{name: value})
+        return queryset
+
     # este metodo hace que cada usuario solo vea sus propias recetas
     def get_queryset(self):
         '''Retrieve recipes for authenticated user'''
         # tomamos los parametros de la peticion
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
+        params = self.request.query_params
+        tags = params.get('tags')
+        ingredients = params.get('ingredients')
         # redefinimos la queryset
         queryset = self.queryset
+        if self.use_cards():
+            # el listado lee las tarjetas, una sola tabla con los tags e
+            # ingredientes ya agregados, id es el de la receta
+            queryset = RecipeCard.objects.annotate(id=F('recipe_id'))
         # chequeamos si hay filtros en la peticion
         if tags:
-            # obtenemos los id de las tags
-            tags_ids = self._params_to_ints(tags)
-            # usamos el orm de Django para hacer la consulta a la base de datos, en el orm se explica la
-            # sintaxis para el filtrado de campos relacionados tags__id__in en este caso
-            queryset = queryset.filter(tags__id__in=tags_ids)
+            # obtenemos los id de las tags y filtramos las recetas que tengan
+            # alguna de ellas o todas si tags_mode es all
+            queryset = self._filter_by_relation(
+                queryset, 'tags', 'tag_id', self._params_to_ints(tags),
+                params.get('tags_mode', 'any'),
+            )
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            queryset = self._filter_by_relation(
+                queryset, 'ingredients', 'ingredient_id',
+                self._params_to_ints(ingredients),
+                params.get('ingredients_mode', 'any'),
+            )
+        queryset = self._filter_by_range(queryset, params)
+        # busqueda de texto, en Postgres los resultados se ordenan por
+        # relevancia
+        self.ranked = False
+        search = params.get('search', '').strip()
+        if search:
+            queryset, self.ranked = filter_search(queryset, search)
         # notese que no se pone self.queryset sino solo queryset para que tome la propiedad modificada
-        # por nosotros, agregamos un filtro para que cada usuario solo pueda ver sus recetas. Se agrega distinct
-        # porque puedes tener resultados duplicados si una receta comparte el tag y el ingrediente que se busca
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+        # por nosotros, agregamos un filtro para que cada usuario solo pueda
+        # ver sus recetas. Como los filtros usan subconsultas no hay
+        # resultados duplicados y no hace falta distinct.
+        # prefetch_related carga los tags e ingredientes de todas las recetas
+        # en una consulta por relacion, asi los nested serializers no hacen
+        # una consulta por cada receta (problema N+1)
+        queryset = queryset.filter(user=self.request.user).order_by(
+            *self.get_ordering())
+        if self.action == 'list':
+            return self._project(queryset)
+        return queryset.prefetch_related('tags', 'ingredients')
+
+    def use_cards(self):
+        '''Return if the list reads from the recipe cards'''
+        # la busqueda de texto usa el vector guardado en la receta
+        return (
+            cards_enabled() and self.use_fast_list()
+            and not self.request.query_params.get('search', '').strip()
+        )
+
+    # los campos que devuelve el listado, por defecto los del serializador
+    def get_list_fields(self):
+        '''Return the recipe fields requested for the list'''
+        params = self.request.query_params
+        if _param_to_bool(params, 'compact'):
+            return ['id', 'title']
+        available = self.get_serializer_class().Meta.fields
+        fields = list(available)
+        if 'fields' in params:
+            requested = self._params_to_names(params['fields'])
+            unknown = [name for name in requested if name not in available]
+            if unknown:
+                raise ValidationError(
+                    {'fields': f'Unknown fields: {", ".join(unknown)}.'})
+            # se mantiene el orden de los campos del serializador
+            fields = [name for name in available if name in requested]
+        if 'expand' in params:
+            expand = self._params_to_names(params['expand'])
+            unknown = [
+                name for name in expand if name not in self.expandable_fields]
+            if unknown:
+                raise ValidationError(
+                    {'expand': f'Unknown relations: {", ".join(unknown)}.'})
+            fields = [
+                name for name in fields
+                if name not in self.expandable_fields or name in expand
+            ]
+        return fields
+
+    # carga solo las columnas y relaciones de los campos pedidos
+    def _project(self, queryset):
+        '''Restrict the list queryset to the requested fields'''
+        fields = self.get_list_fields()
+        # en las tarjetas los tags e ingredientes tambien son columnas
+        columns = {
+            field.name for field in queryset.model._meta.concrete_fields}
+        relations = [name for name in fields if name in self.expandable_fields]
+        # el id y los campos del orden se cargan siempre, la paginacion los
+        # necesita para el cursor aunque no se devuelvan
+        ordering = [name.lstrip('-') for name in self.get_ordering()]
+        selected = ['id'] + [name for name in fields if name in columns]
+        if 'thumbnail' in fields:
+            selected.append('image')
+        if self.use_fast_list() or (
+                not relations and 'thumbnail' not in fields):
+            # sin relaciones ni imagen, o con el serializador rapido que
+            # carga las relaciones por su cuenta, no hacen falta instancias
+            # del modelo, values devuelve diccionarios con las columnas
+            # pedidas y el rank de la busqueda si lo hay
+            return queryset.values(*dict.fromkeys(selected + ordering))
+        selected += [name for name in ordering if name in columns]
+        return queryset.only(*dict.fromkeys(selected)).prefetch_related(
+            *relations)
+
+    # orden de las recetas, tambien lo usa la paginacion para el cursor
+    def get_ordering(self):
+        '''Return the ordering of the recipes'''
+        ordering = self.request.query_params.get('ordering')
+        if ordering:
+            field = ordering[1:] if ordering.startswith('-') else ordering
+            if field not in self.ordering_fields:
+                raise ValidationError({'ordering': (
+                    f'Must be one of: {", ".join(self.ordering_fields)}, '
+                    f'optionally preceded by -.'
+                )})
+            if field == 'id':
+                return [ordering]
+            # el id desempata en el mismo sentido, asi el orden es estable
+            # para el cursor y coincide con el indice (user, campo, id)
+            return [ordering, '-id' if ordering.startswith('-') else 'id']
+        if getattr(self, 'ranked', False):
+            return ['-rank', '-id']
+        return ['-id']
+
+    # el listado solo serializa los campos pedidos
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'list':
+            kwargs.setdefault('fields', self.get_list_fields())
+        return super().get_serializer(*args, **kwargs)
 
     # este metodo cambia el serializer_class en dependencia de la accion
     def get_serializer_class(self):
         '''Return the serializer class for request'''
         if self.action == 'list':
+            # la miniatura de la imagen solo se incluye si se pide
+            if _param_to_bool(self.request.query_params, 'thumbnail'):
+                return serializers.RecipeThumbnailSerializer
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'batch':
+            return serializers.RecipeBatchSerializer
         return self.serializer_class
 
     # metodo para creacion
@@ -93,6 +453,83 @@ class RecipeViewSet(viewsets.ModelViewSet):
         # se le pasa el usuario
         serializer.save(user=self.request.user)
 
+    # exporta todas las recetas del usuario, la respuesta se genera mientras
+    # se envia en lugar de construir la lista completa en memoria
+    @action(methods=['GET'], detail=False, url_path='export')
+    def export(self, request):
+        '''Stream the recipes of the user as NDJSON or CSV'''
+        # no se usa el parametro format porque DRF lo reserva para elegir
+        # el renderer
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            raise ValidationError(
+                {'export_format': 'Must be one of: ndjson, csv.'})
+        queryset = self.get_queryset().order_by('id')
+        response = StreamingHttpResponse(
+            export_lines(queryset, export_format),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"')
+        return response
+
+    # importa recetas en NDJSON o CSV segun el Content-Type, la respuesta
+    # tiene una linea con el resultado de cada fila
+    @action(methods=['POST'], detail=False, url_path='import')
+    def import_recipes(self, request):
+        '''Create recipes in bulk from an NDJSON or CSV body'''
+        import_format = importer.import_format(request.content_type)
+        if import_format is None:
+            raise UnsupportedMediaType(request.content_type)
+        lines = importer.spool_lines(request.stream)
+        results = importer.import_recipes(
+            request.user, importer.parse_rows(lines, import_format))
+        return StreamingHttpResponse(
+            importer.result_lines(results),
+            content_type='application/x-ndjson',
+        )
+
+    # aplica varias operaciones en una sola peticion y transaccion, si alguna
+    # no es valida no se aplica ninguna
+    @action(methods=['POST'], detail=False, url_path='batch')
+    def batch(self, request):
+        '''Create, update and delete recipes in one request'''
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results, applied = run_batch(
+            request, serializer.validated_data['operations'])
+        return Response(
+            {'results': results},
+            status=status.HTTP_200_OK if applied
+            else status.HTTP_400_BAD_REQUEST,
+        )
+
+    # devuelve el detalle de varias recetas en una peticion, en lugar de una
+    # peticion por receta: una consulta filtrada por usuario e ids mas una
+    # por relacion. Los ids que no existen o son de otro usuario se
+    # devuelven en missing, igual que el 404 del detalle no los distingue
+    @action(methods=['GET'], detail=False, url_path='many')
+    def retrieve_many(self, request):
+        '''Retrieve the detail of several recipes by id'''
+        ids = self._params_to_id_list(request.query_params.get('ids', ''))
+        queryset = self.queryset.filter(
+            user=request.user, id__in=ids,
+        ).prefetch_related('tags', 'ingredients')
+
+        def view():
+            recipes = {recipe.id: recipe for recipe in queryset}
+            serializer = self.get_serializer(
+                [recipes[i] for i in ids if i in recipes], many=True)
+            return Response({
+                'results': serializer.data,
+                'missing': [i for i in ids if i not in recipes],
+            })
+
+        return self.conditional_response(
+            request, queryset, f'{self.basename}-many', view,
+            use_last_modified=True,
+        )
+
     # metodo para la actualizacion de una imagen, adicionamos una accion,
     # se define para el metodo 'POST', para una vista detalle, se define
     # el url para la accion: 'upload-image'
@@ -105,8 +542,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(recipe, data=request.data)
         # chequeamos que el serializador es valido
         if serializer.is_valid():
+            # la imagen queda en cola, un worker la procesa en segundo plano
             serializer.save()
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
         # devolvemos el bad_request si no es valido
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -121,13 +559,39 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT,
                 description='Filter by items assigned to recipes',
             ),
+            OpenApiParameter(
+                'q',
+                OpenApiTypes.STR,
+                description=(
+                    'Return the names starting with, containing or similar '
+                    'to this text'
+                ),
+            ),
+            OpenApiParameter(
+                'recipe_count',
+                OpenApiTypes.INT,
+                description=(
+                    'Include the number of recipes using each item (1) '
+                    'or not (0)'
+                ),
+            ),
         ]
     )
 )
-class BaseRecipeAttrViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+class BaseRecipeAttrViewSet(
+    FastListMixin,
+    ConditionalGetMixin,
+    CachedListMixin,
+    mixins.ListModelMixin,
+    mixins.UpdateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
     '''Base viewset for recipes attributes'''
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    # con el parametro q se devuelven solo los primeros resultados
+    pagination_class = AutocompletePagination
 
     def get_queryset(self):
         '''Filter queryset to authenticated user'''
@@ -139,20 +603,50 @@ class BaseRecipeAttrViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, mixi
         )
         # creamos una variable para nuestra queryset modificada
         queryset = self.queryset
-        # si assigned_only es true, o sea recibe 1
+        # si assigned_only es true, o sea recibe 1, el contador de recetas
+        # evita el join con la tabla intermedia y el distinct
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        # agregamos distinct para garantizar no tener resultados duplicados
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+            queryset = queryset.filter(recipe_count__gt=0)
+        return queryset.filter(user=self.request.user).order_by('-name')
+
+    def get_serializer_class(self):
+        '''Return the serializer class for request'''
+        # el numero de recetas solo se incluye si se pide
+        if self.action == 'list' and _param_to_bool(
+                self.request.query_params, 'recipe_count'):
+            return self.count_serializer_class
+        return self.serializer_class
+
+    def filter_queryset(self, queryset):
+        '''Filter by the autocomplete text, best matches first'''
+        queryset = super().filter_queryset(queryset)
+        term = self.request.query_params.get('q', '').strip()
+        if term:
+            assigned_only = self.request.query_params.get('assigned_only', 0)
+            queryset = filter_autocomplete(
+                queryset,
+                term,
+                self.paginator.get_limit(self.request),
+                self.request.user.id,
+                # el indice en memoria depende tambien del filtro assigned_only
+                f'{self.basename}:{assigned_only}',
+            )
+        if self.use_fast_list():
+            # el listado se serializa directamente desde las columnas
+            fields = self.get_serializer_class().Meta.fields
+            queryset = queryset.values(*fields)
+        return queryset
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     '''Manage tags in the database'''
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
     queryset = Tag.objects.all()
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     '''Manage ingredients in the database'''
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
     queryset = Ingredient.objects.all()
@@ -0,0 +1,96 @@
+'''
+Cached token authentication for the API
+'''
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import SAFE_METHODS
+
+from core.lru import LRUCache
+
+
+class SharedTokenCache:
+    '''Token cache stored in one of the CACHES backends'''
+    key_prefix = 'auth-token:'
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, value):
+        self.cache.set(self.key_prefix + key, value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self.key_prefix + key)
+
+
+def build_token_cache():
+    '''Create the token cache defined in settings.TOKEN_AUTH_CACHE'''
+    config = settings.TOKEN_AUTH_CACHE
+    # si se define un alias de CACHES todos los workers comparten la cache
+    # y la invalidacion les llega a todos, si no cada worker tiene la suya y
+    # en los demas workers la entrada invalidada dura como maximo el TTL
+    if config.get('BACKEND'):
+        return SharedTokenCache(config['BACKEND'], config['TTL'])
+    return LRUCache(config['MAX_SIZE'], config['TTL'])
+
+
+token_cache = build_token_cache()
+
+
+def invalidate_token(key):
+    '''Remove a token from the authentication cache'''
+    token_cache.delete(key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''Token authentication caching the token to user resolution
+
+    Reads are authenticated from the cache. Writes reload the user from the
+    database, with the in-process cache another worker may hold a stale
+    copy of a deactivated user or of an old password hash, and that copy
+    must never be saved back.
+    '''
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None or request.method in SAFE_METHODS:
+            return result
+        user, token = result
+        fresh = get_user_model().objects.filter(pk=user.pk).first()
+        if fresh is None or not fresh.is_active:
+            invalidate_token(token.key)
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.'))
+        # la copia de la cache puede estar desactualizada, se reemplaza por
+        # la que se acaba de leer
+        token_cache.set(token.key, (fresh, copy.copy(token)))
+        token.user = copy.copy(fresh)
+        return (token.user, token)
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            # la primera vez se valida el token contra la base de datos,
+            # esto tambien comprueba que el usuario este activo
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached)
+        user, token = cached
+        # devolvemos copias para que cambios en request.user durante una
+        # peticion no modifiquen el objeto guardado en la cache
+        user = copy.copy(user)
+        token = copy.copy(token)
+        token.user = user
+        return (user, token)
@@ -28,15 +28,20 @@ class UserSerializer(serializers.ModelSerializer):
         # el password por el proceso de hashing, por tanto debemos hacerlo manualmente
         # porque sino el password se actualiza como texto plano
         password = validated_data.pop('password', None)
-        # invocamos el metodo update de Django para que haga el trabajo
-        user = super().update(instance, validated_data)
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        update_fields = list(validated_data)
         # chequeamos si hay un password
         if password:
-            # si el usuario envio el password, lo pasamos por el hash y lo guardamos
-            user.set_password(password)
-            user.save()
+            # si el usuario envio el password, lo pasamos por el hash
+            instance.set_password(password)
+            update_fields.append('password')
+        # solo se guardan las columnas modificadas, asi una copia antigua del
+        # usuario no puede revertir otros cambios como is_active
+        if update_fields:
+            instance.save(update_fields=update_fields)
         # retornamos el usuario actualizado
-        return user
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
@@ -0,0 +1,28 @@
+'''
+Signal handlers for the user app
+'''
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    '''Remove a deleted token from the authentication cache'''
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    '''Remove the tokens of a changed user from the authentication cache'''
+    # un usuario nuevo todavia no tiene tokens
+    if created:
+        return
+    # cualquier cambio (desactivacion, password, datos) invalida la cache
+    # para que la siguiente peticion lea el usuario actualizado
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        invalidate_token(key)
@@ -0,0 +1,100 @@
+'''
+Tests for the cached token authentication
+'''
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import token_cache
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    '''Test authenticating requests with cached tokens'''
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='testpass123',
+            name='Test Name',
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tearDown(self):
+        token_cache.delete(self.token.key)
+
+    def test_token_resolved_from_cache(self):
+        '''Test a cached token is authenticated without queries'''
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_deleted_token_invalidated(self):
+        '''Test a deleted token is rejected'''
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        '''Test the token of a deactivated user is rejected'''
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        '''Test changing the password reloads the cached user'''
+        self.client.get(ME_URL)
+        payload = {'name': 'Updated name', 'password': 'newpassword123'}
+        self.client.patch(ME_URL, payload)
+
+        # la siguiente peticion vuelve a consultar el usuario
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], payload['name'])
+
+    def test_write_rejects_stale_active_user(self):
+        '''Test a write checks the user is still active in the database'''
+        self.client.get(ME_URL)
+        # otro worker desactiva al usuario, la cache de este no se entera
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            is_active=False)
+
+        res = self.client.patch(ME_URL, {'name': 'Other name'})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        self.assertEqual(self.user.name, 'Test Name')
+
+    def test_write_does_not_revert_password(self):
+        '''Test a write does not save the cached password hash back'''
+        self.client.get(ME_URL)
+        self.user.set_password('otherpass123')
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=self.user.password)
+
+        res = self.client.patch(ME_URL, {'name': 'Other name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('otherpass123'))
+        self.assertEqual(self.user.name, 'Other name')
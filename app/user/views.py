@@ -1,9 +1,10 @@
 '''
 Views for the user API
 '''
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -21,9 +22,11 @@ class CreateTokenView(ObtainAuthToken):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     '''Manage the authenticated user'''
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         '''Retrieve and return the authenticated user'''
+        # en las escrituras CachedTokenAuthentication ya leyo el usuario de
+        # la base de datos, nunca se guarda la copia de la cache
         return self.request.user
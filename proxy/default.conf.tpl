@@ -5,6 +5,19 @@ server {
         alias /vol/static;
     }
 
+    # las imagenes guardadas por contenido nunca cambian con el mismo nombre
+    location /static/media/uploads/blobs {
+        alias /vol/static/media/uploads/blobs;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+
+    # las importaciones de recetas pueden ser archivos grandes
+    location /api/recipe/recipes/import/ {
+        uwsgi_pass           ${APP_HOST}:${APP_PORT};
+        include              /etc/nginx/uwsgi_params;
+        client_max_body_size 100M;
+    }
+
     location / {
         uwsgi_pass           ${APP_HOST}:${APP_PORT};
         include              /etc/nginx/uwsgi_params;